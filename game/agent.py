@@ -1,9 +1,19 @@
 import random
+import time
+from gamestate import SearchState, piles_to_mask
+from search import MAX_SEARCH_DEPTH, SearchTimeout, TranspositionTable, iterative_deepening, search_value
+from solution_cache import SolutionCache
+
+DEFAULT_NUM_DETERMINIZATIONS = 8
 
 class GameAgent:
     def choose_action(self, current_state):
         raise NotImplementedException("You must implement the choose_action method in a subclass of GameAgent!")
 
+    def close(self):
+        # release any resources held by the agent (e.g. flush a persistent cache)
+        pass
+
 
 class RandomGameAgent(GameAgent):
     def choose_action(self, current_state):
@@ -24,3 +34,150 @@ class GreedyGameAgent(GameAgent):
                 best_action = action
 
         return best_action
+
+
+class SearchGameAgent(GameAgent):
+    """
+    Chooses the action with the highest total reward over the next `depth`
+    actions (a depth of 1 is the same as the greedy agent). The hidden cards
+    are unknown to the agent, so each action is searched in
+    num_determinizations copies of the state with resampled hidden cards (see
+    GameState.determinize), and its value is the mean over the copies. With
+    num_determinizations=0, the actual hidden cards are searched instead: a
+    perfect-information mode for analysis (e.g. an upper bound on what search
+    can gain), not a fair player.
+
+    Search results are saved in a transposition table keyed by the whole
+    searched state, hidden cards included (see GameState.search_key), since a
+    value found in one determinization only holds for its order of the hidden
+    cards; each determinization is a separate sample of the average. The
+    table is persistent across runs if a cache_path is given (see
+    solution_cache.py), or can be any table with the same probe/store
+    interface (e.g. shared_table.SharedTranspositionTable). Endgame positions
+    are looked up in the tablebase if one is given (see endgame.py).
+
+    The determinizations are drawn from random.Random(seed), so a seed makes
+    the agent's choices reproducible.
+
+    If a time_limit (in seconds) is given, the search of each move stops when
+    it runs out: the values are averaged over the determinizations that were
+    finished, and an action without a value gets its reward (so with none
+    finished, the agent chooses the greedy action).
+    """
+    def __init__(self, depth=2, num_determinizations=DEFAULT_NUM_DETERMINIZATIONS, cache_path=None, table=None,
+                 tablebase=None, seed=None, time_limit=None):
+        self.depth = depth
+        self.num_determinizations = num_determinizations
+        self.time_limit = time_limit
+        self.tablebase = tablebase
+        self.rand_gen = random.Random(seed)
+        if table is not None:
+            self.table = table
+        elif cache_path is not None:
+            self.table = SolutionCache(cache_path)
+        else:
+            self.table = TranspositionTable()
+
+    def evaluate_action(self, action, deadline=None):
+        # the value of an action from state.actions(), searched with the hidden
+        # cards of its next state (raises search.SearchTimeout once the
+        # deadline, a time.perf_counter() value, has passed)
+        piles, next_state, reward = action
+        return reward + search_value(next_state, self.depth - 1, self.table, deadline=deadline,
+                                     tablebase=self.tablebase)[0]
+
+    def move_values(self, state, deadline=None):
+        """
+        Returns: a dict from the pile mask of each action to its value,
+        searched with the state's own hidden cards (raises search.SearchTimeout
+        once the deadline, a time.perf_counter() value, has passed)
+        """
+        search_state = SearchState(state)
+        values = {}
+        for mask, reward in search_state.moves():
+            token = search_state.do_move(mask)
+            try:
+                values[mask] = reward + search_value(search_state, self.depth - 1, self.table, deadline=deadline,
+                                                     tablebase=self.tablebase)[0]
+            finally:
+                search_state.undo_move(token)
+        return values
+
+    def action_values(self, state):
+        """
+        Returns: a dict from the pile mask of each action to its mean value
+        over the determinizations of the state (or its value with the actual
+        hidden cards, if num_determinizations is 0), only for the actions that
+        were evaluated within the time limit
+        """
+        deadline = None if self.time_limit is None else time.perf_counter() + self.time_limit
+        value_totals = {}
+        num_evaluated = 0
+        try:
+            if self.num_determinizations == 0:
+                return self.move_values(state, deadline=deadline)
+            for _ in range(self.num_determinizations):
+                for mask, value in self.move_values(state.determinize(self.rand_gen), deadline=deadline).items():
+                    value_totals[mask] = value_totals.get(mask, 0) + value
+                num_evaluated += 1
+        except SearchTimeout:
+            pass
+        return {mask: total / num_evaluated for mask, total in value_totals.items()}
+
+    def choose_action(self, current_state):
+        action_values = self.action_values(current_state)
+        max_value = -1
+        best_action = None
+        for action in current_state.actions():
+            value = action_values.get(piles_to_mask(action[0]), action[2])
+            if value > max_value:
+                max_value = value
+                best_action = action
+
+        return best_action
+
+    def close(self):
+        if isinstance(self.table, SolutionCache):
+            self.table.close()
+
+
+class IterativeDeepeningGameAgent(GameAgent):
+    """
+    Searches deeper and deeper (see search.iterative_deepening) until the time
+    limit (in seconds) for the move runs out, then chooses the best action of
+    the deepest completed search. The transposition table is kept across moves,
+    and endgame positions are looked up in the tablebase if one is given.
+
+    The agent doesn't look at the hidden cards: each move is searched in a
+    copy of the state with resampled hidden cards (see GameState.determinize),
+    drawn like SearchGameAgent's. The table is keyed by the whole searched
+    state (see GameState.search_key), so a value found in one copy is only
+    reused for the same order of the hidden cards.
+    """
+    def __init__(self, time_limit=1.0, max_depth=MAX_SEARCH_DEPTH, table=None, tablebase=None, seed=None):
+        self.time_limit = time_limit
+        self.tablebase = tablebase
+        self.max_depth = max_depth
+        self.table = table if table is not None else TranspositionTable()
+        self.rand_gen = random.Random(seed)
+        self.last_depth = None
+
+    def choose_action(self, current_state):
+        deadline = time.perf_counter() + self.time_limit
+        value, best_mask, depth = iterative_deepening(
+            current_state.determinize(self.rand_gen), deadline, self.table, self.max_depth, tablebase=self.tablebase
+        )
+        self.last_depth = depth
+        for action in current_state.actions():
+            if piles_to_mask(action[0]) == best_mask:
+                return action
+        return None
+
+
+# agent types that can be selected by name (e.g. from the command line)
+AGENT_TYPES = {
+    "random": RandomGameAgent,
+    "greedy": GreedyGameAgent,
+    "search": SearchGameAgent,
+    "iterative": IterativeDeepeningGameAgent,
+}
@@ -0,0 +1,289 @@
+import random
+import time
+
+import numpy as np
+from batch_rollout import batch_rollouts, spawn_tiles
+from bitboard import DIRS, ROW_MASK, empty_cells, move_tiles, moves_available, to_board, transpose
+from ntuple import NTupleNetwork
+
+# heuristic weights for a board (the sum over its rows and columns)
+LOST_PENALTY = 200000.0
+MONOTONICITY_POWER = 4.0
+MONOTONICITY_WEIGHT = 47.0
+SUM_POWER = 3.5
+SUM_WEIGHT = 11.0
+MERGES_WEIGHT = 700.0
+EMPTY_WEIGHT = 270.0
+
+DEFAULT_PROB_CUTOFF = 1e-4
+# check the clock every this many nodes
+DEADLINE_CHECK_INTERVAL = 256
+
+
+def _row_heuristic(row):
+    cells = [(row >> (4 * j)) & 0xF for j in range(4)]
+    tile_sum = sum([cell ** SUM_POWER for cell in cells])
+    empty = cells.count(0)
+
+    merges = 0
+    prev = 0
+    counter = 0
+    for cell in cells:
+        if cell == 0:
+            continue
+        if prev == cell:
+            counter += 1
+        elif counter > 0:
+            merges += 1 + counter
+            counter = 0
+        prev = cell
+    if counter > 0:
+        merges += 1 + counter
+
+    monotonicity_left = 0
+    monotonicity_right = 0
+    for j in range(1, 4):
+        if cells[j - 1] > cells[j]:
+            monotonicity_left += cells[j - 1] ** MONOTONICITY_POWER - cells[j] ** MONOTONICITY_POWER
+        else:
+            monotonicity_right += cells[j] ** MONOTONICITY_POWER - cells[j - 1] ** MONOTONICITY_POWER
+
+    return (
+        LOST_PENALTY + EMPTY_WEIGHT * empty + MERGES_WEIGHT * merges
+        - MONOTONICITY_WEIGHT * min(monotonicity_left, monotonicity_right) - SUM_WEIGHT * tile_sum
+    )
+
+
+# heuristic value of each of the 65,536 rows (the same table works for columns)
+ROW_HEURISTIC = [_row_heuristic(row) for row in range(1 << 16)]
+
+
+def heuristic(board):
+    columns = transpose(board)
+    value = 0.0
+    for shift in (0, 16, 32, 48):
+        value += ROW_HEURISTIC[(board >> shift) & ROW_MASK] + ROW_HEURISTIC[(columns >> shift) & ROW_MASK]
+    return value
+
+
+def _state_board(state):
+    # a bitboard.BitboardState or a game_engine.GameState
+    if hasattr(state, "board"):
+        return state.board
+    return to_board(state.tiles)
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class Agent2048:
+    def new_game(self, seed=None):
+        # called before each game, e.g. to seed the agent's own random choices
+        pass
+
+    def choose_action(self, state):
+        """
+        Returns: the direction to move in ("Up", "Down", "Left" or "Right"),
+        or None if no move is available
+        """
+        raise NotImplementedError("You must implement the choose_action method in a subclass of Agent2048!")
+
+    def close(self):
+        pass
+
+
+class RandomAgent2048(Agent2048):
+    def __init__(self, seed=None):
+        self.rand_gen = random.Random(seed)
+
+    def new_game(self, seed=None):
+        self.rand_gen = random.Random(seed)
+
+    def choose_action(self, state):
+        dirs = moves_available(_state_board(state))
+        if not dirs:
+            return None
+        return self.rand_gen.choice(sorted(dirs))
+
+
+class GreedyAgent2048(Agent2048):
+    # chooses the move with the highest immediate reward (the first of DIRS on ties)
+    def choose_action(self, state):
+        board = _state_board(state)
+        best_dir = None
+        best_reward = -1
+        for dir in DIRS:
+            new_board, reward = move_tiles(board, dir)
+            if new_board != board and reward > best_reward:
+                best_reward = reward
+                best_dir = dir
+        return best_dir
+
+
+class ExpectimaxAgent(Agent2048):
+    """
+    Expectimax search over moves and tile spawns, with the board heuristic at
+    the leaves. A spawn branch is cut off (and evaluated with the heuristic)
+    once the probability of reaching it falls below prob_cutoff, and the
+    search depth adapts to the number of empty cells (boards with few empty
+    cells are both more dangerous and cheaper to search). Values are cached
+    in a transposition table of board -> (depth, value), and the search
+    deepens iteratively until the depth for the board or the per-move time
+    limit is reached. The leaves are evaluated with the heuristic, or with
+    evaluator(board) if given (e.g. NTupleNetwork.value).
+    """
+    def __init__(self, time_limit=0.1, prob_cutoff=DEFAULT_PROB_CUTOFF, min_depth=1, max_depth=3,
+                 prob_two_tile=0.9, evaluator=None):
+        self.evaluator = evaluator if evaluator is not None else heuristic
+        self.time_limit = time_limit
+        self.prob_cutoff = prob_cutoff
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.prob_two_tile = prob_two_tile
+        self.table = {}
+        self.num_nodes = 0
+        self.last_depth = 0
+        self.deadline = None
+
+    def depth_for_board(self, board):
+        num_empty = len(empty_cells(board))
+        if num_empty >= 8:
+            depth = 1
+        elif num_empty >= 4:
+            depth = 2
+        else:
+            depth = 3
+        return max(self.min_depth, min(self.max_depth, depth))
+
+    def _check_deadline(self):
+        self.num_nodes += 1
+        if (self.deadline is not None and self.num_nodes % DEADLINE_CHECK_INTERVAL == 0
+                and time.perf_counter() > self.deadline):
+            raise SearchTimeout()
+
+    def _chance_value(self, board, depth, prob):
+        # value of the board after a move, before the tile spawns
+        self._check_deadline()
+        if depth <= 0 or prob < self.prob_cutoff:
+            return self.evaluator(board)
+        cached = self.table.get(board)
+        if cached is not None and cached[0] >= depth:
+            return cached[1]
+
+        cells = empty_cells(board)
+        num_cells = len(cells)
+        two_prob = prob * self.prob_two_tile / num_cells
+        four_prob = prob * (1.0 - self.prob_two_tile) / num_cells
+        total = 0.0
+        for cell_idx in cells:
+            shift = 4 * cell_idx
+            total += self.prob_two_tile * self._max_value(board | (1 << shift), depth, two_prob)
+            if self.prob_two_tile < 1.0:
+                total += (1.0 - self.prob_two_tile) * self._max_value(board | (2 << shift), depth, four_prob)
+        value = total / num_cells
+
+        self.table[board] = (depth, value)
+        return value
+
+    def _max_value(self, board, depth, prob):
+        # value of the board before a move (0 if the game is over)
+        best_value = 0.0
+        for dir in DIRS:
+            new_board, _ = move_tiles(board, dir)
+            if new_board != board:
+                value = self._chance_value(new_board, depth - 1, prob)
+                if value > best_value:
+                    best_value = value
+        return best_value
+
+    def _search_root(self, board, depth):
+        best_dir = None
+        best_value = -1.0
+        for dir in DIRS:
+            new_board, _ = move_tiles(board, dir)
+            if new_board != board:
+                value = self._chance_value(new_board, depth - 1, 1.0)
+                if value > best_value:
+                    best_value = value
+                    best_dir = dir
+        return best_dir
+
+    def choose_action(self, state):
+        board = _state_board(state)
+        # the table only holds boards reachable from this move
+        self.table = {}
+        self.deadline = time.perf_counter() + self.time_limit if self.time_limit is not None else None
+        best_dir = None
+        self.last_depth = 0
+        try:
+            for depth in range(1, self.depth_for_board(board) + 1):
+                best_dir = self._search_root(board, depth)
+                self.last_depth = depth
+        except SearchTimeout:
+            pass
+        if best_dir is None and self.last_depth == 0:
+            # not even the shallowest search finished, so just use the heuristic
+            self.deadline = None
+            best_dir = self._search_root(board, 1)
+        return best_dir
+
+
+class NTupleAgent(Agent2048):
+    """
+    Chooses the move with the highest reward plus n-tuple network value of
+    the board after the move (see ntuple.py). The network is either given or
+    loaded (memory-mapped) from network_path.
+    """
+    def __init__(self, network_path=None, network=None):
+        if network is None:
+            assert network_path is not None, "NTupleAgent needs a network or a network path"
+            network = NTupleNetwork.load(network_path)
+        self.network = network
+
+    def choose_action(self, state):
+        return self.network.best_move(_state_board(state))[0]
+
+
+class MonteCarloAgent(Agent2048):
+    """
+    Pure Monte Carlo agent: each valid move is scored by its reward plus the
+    mean score of num_rollouts random rollouts (of at most max_rollout_moves
+    moves) from the board after it, all played at once by the vectorized
+    engine in batch_rollout.py.
+    """
+    def __init__(self, num_rollouts=1000, max_rollout_moves=None, seed=None):
+        self.num_rollouts = num_rollouts
+        self.max_rollout_moves = max_rollout_moves
+        self.rng = np.random.default_rng(seed)
+
+    def new_game(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def choose_action(self, state):
+        board = _state_board(state)
+        dirs = []
+        afterstates = []
+        rewards = []
+        for dir in DIRS:
+            new_board, reward = move_tiles(board, dir)
+            if new_board != board:
+                dirs.append(dir)
+                afterstates.append(new_board)
+                rewards.append(reward)
+        if len(dirs) <= 1:
+            return dirs[0] if dirs else None
+
+        boards = spawn_tiles(np.repeat(np.array(afterstates, dtype=np.uint64), self.num_rollouts), self.rng)
+        scores, _ = batch_rollouts(boards, self.rng, max_moves=self.max_rollout_moves)
+        values = np.array(rewards) + scores.reshape(len(dirs), self.num_rollouts).mean(axis=1)
+        return dirs[int(np.argmax(values))]
+
+
+AGENT_TYPES = {
+    "random": RandomAgent2048,
+    "greedy": GreedyAgent2048,
+    "expectimax": ExpectimaxAgent,
+    "ntuple": NTupleAgent,
+    "montecarlo": MonteCarloAgent,
+}
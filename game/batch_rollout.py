@@ -0,0 +1,119 @@
+import numpy as np
+from bitboard import COL_DOWN, COL_UP, DIRS, ROW_LEFT, ROW_RIGHT, SCORE_LEFT, SCORE_RIGHT
+
+# Vectorized 2048 engine: K boards, packed as in bitboard.py, in a uint64
+# array, moved all at once with the bitboard lookup tables.
+
+ROW_MASK = np.uint64(0xFFFF)
+NIBBLE_MASK = np.uint64(0xF)
+ROW_SHIFTS = [np.uint64(shift) for shift in (0, 16, 32, 48)]
+COL_SHIFTS = [np.uint64(shift) for shift in (0, 4, 8, 12)]
+CELL_SHIFTS = np.arange(0, 64, 4, dtype=np.uint64)
+
+ROW_LEFT_TABLE = np.array(ROW_LEFT, dtype=np.uint64)
+ROW_RIGHT_TABLE = np.array(ROW_RIGHT, dtype=np.uint64)
+COL_UP_TABLE = np.array(COL_UP, dtype=np.uint64)
+COL_DOWN_TABLE = np.array(COL_DOWN, dtype=np.uint64)
+SCORE_LEFT_TABLE = np.array(SCORE_LEFT, dtype=np.int64)
+SCORE_RIGHT_TABLE = np.array(SCORE_RIGHT, dtype=np.int64)
+DIR_TABLES = {
+    "Up": (COL_UP_TABLE, SCORE_LEFT_TABLE),
+    "Down": (COL_DOWN_TABLE, SCORE_RIGHT_TABLE),
+    "Left": (ROW_LEFT_TABLE, SCORE_LEFT_TABLE),
+    "Right": (ROW_RIGHT_TABLE, SCORE_RIGHT_TABLE),
+}
+
+
+def transpose(boards):
+    # bitboard.transpose for an array of boards
+    a1 = boards & np.uint64(0xF0F00F0FF0F00F0F)
+    a2 = boards & np.uint64(0x0000F0F00000F0F0)
+    a3 = boards & np.uint64(0x0F0F00000F0F0000)
+    a = a1 | (a2 << np.uint64(12)) | (a3 >> np.uint64(12))
+    b1 = a & np.uint64(0xFF00FF0000FF00FF)
+    b2 = a & np.uint64(0x00FF00FF00000000)
+    b3 = a & np.uint64(0x00000000FF00FF00)
+    return b1 | (b2 >> np.uint64(24)) | (b3 << np.uint64(24))
+
+
+def move_boards(boards, dir):
+    """
+    Moves every board in the direction (like bitboard.move_tiles).
+
+    Returns: (new_boards, rewards) - a board moved if it differs from new_boards
+    """
+    table, score_table = DIR_TABLES[dir]
+    new_boards = boards.copy()
+    rewards = np.zeros(len(boards), dtype=np.int64)
+    if dir == "Left" or dir == "Right":
+        for shift in ROW_SHIFTS:
+            rows = ((boards >> shift) & ROW_MASK).astype(np.intp)
+            new_boards ^= table[rows] << shift
+            rewards += score_table[rows]
+    else:
+        columns = transpose(boards)
+        for row_shift, col_shift in zip(ROW_SHIFTS, COL_SHIFTS):
+            cols = ((columns >> row_shift) & ROW_MASK).astype(np.intp)
+            new_boards ^= table[cols] << col_shift
+            rewards += score_table[cols]
+    return (new_boards, rewards)
+
+
+def all_moves(boards):
+    """
+    Returns: (moved_boards, rewards, valid) - K x 4 arrays of the boards after
+    each move of DIRS, their rewards, and whether the move is valid
+    """
+    moved_boards = np.empty((len(boards), len(DIRS)), dtype=np.uint64)
+    rewards = np.empty((len(boards), len(DIRS)), dtype=np.int64)
+    for dir_idx, dir in enumerate(DIRS):
+        moved_boards[:, dir_idx], rewards[:, dir_idx] = move_boards(boards, dir)
+    return (moved_boards, rewards, moved_boards != boards[:, None])
+
+
+def spawn_tiles(boards, rng, prob_two_tile=0.9):
+    """
+    Spawns a tile in a random empty cell of every board that has one (a 2-tile,
+    or a 4-tile with probability 1 - prob_two_tile), drawing from rng, a
+    numpy.random.Generator.
+
+    Returns: the new boards
+    """
+    empty = ((boards[:, None] >> CELL_SHIFTS) & NIBBLE_MASK) == 0
+    num_empty = empty.sum(axis=1)
+    # the spawn goes in the k-th empty cell
+    k = np.floor(rng.random(len(boards)) * num_empty).astype(np.int64)
+    cell_idxs = np.argmax(np.cumsum(empty, axis=1) > k[:, None], axis=1).astype(np.uint64)
+    tiles = np.where(rng.random(len(boards)) < prob_two_tile, 1, 2).astype(np.uint64)
+    return np.where(num_empty > 0, boards | (tiles << (np.uint64(4) * cell_idxs)), boards)
+
+
+def batch_rollouts(boards, rng, max_moves=None, prob_two_tile=0.9):
+    """
+    Plays random moves on all the boards at once, spawning a tile after each
+    move, until every game is over (or max_moves moves have been played).
+
+    Returns: (scores, num_moves) - the total reward and number of moves of
+    each rollout
+    """
+    boards = boards.copy()
+    scores = np.zeros(len(boards), dtype=np.int64)
+    num_moves = np.zeros(len(boards), dtype=np.int64)
+    alive = np.ones(len(boards), dtype=bool)
+    move_idx = 0
+    while alive.any() and (max_moves is None or move_idx < max_moves):
+        alive_idxs = np.flatnonzero(alive)
+        moved_boards, rewards, valid = all_moves(boards[alive_idxs])
+        has_move = valid.any(axis=1)
+        alive[alive_idxs[~has_move]] = False
+
+        # a random valid move for each board that has one
+        priorities = np.where(valid, rng.random(valid.shape), -1.0)
+        dir_idxs = np.argmax(priorities, axis=1)
+        rows = np.arange(len(alive_idxs))
+        playing = alive_idxs[has_move]
+        scores[playing] += rewards[rows, dir_idxs][has_move]
+        num_moves[playing] += 1
+        boards[playing] = spawn_tiles(moved_boards[rows, dir_idxs][has_move], rng, prob_two_tile=prob_two_tile)
+        move_idx += 1
+    return (scores, num_moves)
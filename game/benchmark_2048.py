@@ -0,0 +1,62 @@
+import random
+import time
+
+import click
+from game_engine import Game
+
+# Times the move-legality and game-over checks of game_engine.GameState: the
+# row/column scan against the packed-board table lookups.
+
+
+def sample_states(num_games, seed=None):
+    """
+    Returns: the game states of num_games random games (so mostly crowded
+    boards, like the ones the game-over check sees late in a game)
+    """
+    rand_gen = random.Random(seed)
+    states = []
+    for game_idx in range(num_games):
+        game = Game(verbose=False)
+        game.new_game(random_seed=rand_gen.randrange(1 << 30), save_game=False)
+        while not game.state.game_over:
+            states.append(game.state.copy())
+            game.move(rand_gen.choice(sorted(game.state.moves_available())))
+        states.append(game.state.copy())
+    return states
+
+
+def time_calls(fn, states, repeats):
+    # seconds per call
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for state in states:
+            fn(state)
+    return (time.perf_counter() - start) / (repeats * len(states))
+
+
+@click.command()
+@click.option("--num-games", "-n", type=int, default=20)
+@click.option("--repeats", "-r", type=int, default=10)
+@click.option("--seed", type=int, default=0)
+def main(num_games: int, repeats: int, seed: int):
+    states = sample_states(num_games, seed=seed)
+    for state in states:
+        assert state.moves_available() == state.scan_moves_available()
+    print(f"{len(states)} states from {num_games} games")
+
+    timings = [
+        ("moves_available (scan)", lambda state: state.scan_moves_available()),
+        ("moves_available (tables)", lambda state: state.moves_available()),
+        ("game over (scan)", lambda state: not state.scan_moves_available()),
+        ("game over (tables)", lambda state: state.is_game_over()),
+    ]
+    results = {}
+    for name, fn in timings:
+        results[name] = time_calls(fn, states, repeats)
+        print(f"{name}: {results[name] * 1e6:.2f} us per call")
+    for check in ("moves_available", "game over"):
+        print(f"{check} speedup: {results[f'{check} (scan)'] / results[f'{check} (tables)']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
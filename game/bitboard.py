@@ -0,0 +1,294 @@
+# A 4x4 2048 board packed into a 64-bit int: the tile at (i, j) is stored as
+# its log2 value (0 for an empty cell, like game_engine.GameState.tiles) in the
+# nibble at bit 4 * (4 * i + j), so row i is the 16 bits at 16 * i. Moves are
+# looked up per row (or per column, after a transpose) in tables over all
+# 65,536 rows. Tiles can't go above 2^15 (two 32768 tiles don't merge).
+
+NUM_ROWS = 4
+NUM_COLS = 4
+NUM_CELLS = NUM_ROWS * NUM_COLS
+MAX_TILE = 15
+ROW_MASK = 0xFFFF
+DIRS = ["Up", "Down", "Left", "Right"]
+
+
+def _move_row_left(cells):
+    # cells is a list of 4 log2 tile values, moved towards index 0
+    tiles = [cell for cell in cells if cell > 0]
+    result = []
+    score = 0
+    idx = 0
+    while idx < len(tiles):
+        if idx + 1 < len(tiles) and tiles[idx] == tiles[idx + 1] and tiles[idx] < MAX_TILE:
+            result.append(tiles[idx] + 1)
+            score += 1 << (tiles[idx] + 1)
+            idx += 2
+        else:
+            result.append(tiles[idx])
+            idx += 1
+    return (result + [0] * (NUM_COLS - len(result)), score)
+
+
+def _pack_row(cells):
+    return sum([cell << (4 * j) for j, cell in enumerate(cells)])
+
+
+def _unpack_row(row):
+    return [(row >> (4 * j)) & 0xF for j in range(NUM_COLS)]
+
+
+def _row_to_column(row):
+    # spreads the nibbles of a row into a column (nibble j goes to row j of column 0)
+    return sum([((row >> (4 * j)) & 0xF) << (16 * j) for j in range(NUM_COLS)])
+
+
+def _build_tables():
+    # XOR deltas, so a move is board ^= delta for each row or column, and the
+    # moves each row can make (CAN_MOVE_LEFT | CAN_MOVE_RIGHT bits, which are
+    # also the up/down bits of a column packed as a row)
+    row_left = [0] * (1 << 16)
+    row_right = [0] * (1 << 16)
+    col_up = [0] * (1 << 16)
+    col_down = [0] * (1 << 16)
+    score_left = [0] * (1 << 16)
+    score_right = [0] * (1 << 16)
+    row_moves = [0] * (1 << 16)
+    for row in range(1 << 16):
+        cells = _unpack_row(row)
+        left_cells, left_score = _move_row_left(cells)
+        right_cells, right_score = _move_row_left(cells[::-1])
+        left_row = _pack_row(left_cells)
+        right_row = _pack_row(right_cells[::-1])
+        row_left[row] = row ^ left_row
+        row_right[row] = row ^ right_row
+        col_up[row] = _row_to_column(row) ^ _row_to_column(left_row)
+        col_down[row] = _row_to_column(row) ^ _row_to_column(right_row)
+        score_left[row] = left_score
+        score_right[row] = right_score
+        row_moves[row] = (CAN_MOVE_LEFT if left_row != row else 0) | (CAN_MOVE_RIGHT if right_row != row else 0)
+    return (row_left, row_right, col_up, col_down, score_left, score_right, row_moves)
+
+
+CAN_MOVE_LEFT = 1
+CAN_MOVE_RIGHT = 2
+ROW_LEFT, ROW_RIGHT, COL_UP, COL_DOWN, SCORE_LEFT, SCORE_RIGHT, ROW_MOVES = _build_tables()
+# directions for each combination of ((up/down bits) << 2) | (left/right bits)
+MOVE_SETS = [
+    frozenset([
+        dir for dir, bit in (("Left", CAN_MOVE_LEFT), ("Right", CAN_MOVE_RIGHT),
+                             ("Up", CAN_MOVE_LEFT << 2), ("Down", CAN_MOVE_RIGHT << 2))
+        if bits & bit
+    ])
+    for bits in range(16)
+]
+
+
+def pack_tiles(tiles):
+    # to_board without checking the tile values (unrolled, since it's on the
+    # path of game_engine.GameState.moves_available)
+    row0, row1, row2, row3 = tiles
+    return (
+        row0[0] | (row0[1] << 4) | (row0[2] << 8) | (row0[3] << 12)
+        | (row1[0] << 16) | (row1[1] << 20) | (row1[2] << 24) | (row1[3] << 28)
+        | (row2[0] << 32) | (row2[1] << 36) | (row2[2] << 40) | (row2[3] << 44)
+        | (row3[0] << 48) | (row3[1] << 52) | (row3[2] << 56) | (row3[3] << 60)
+    )
+
+
+def unpack_tiles(board):
+    # to_tiles unrolled, since it's on the path of game_engine.GameState.move_tiles
+    return [
+        [board & 0xF, (board >> 4) & 0xF, (board >> 8) & 0xF, (board >> 12) & 0xF],
+        [(board >> 16) & 0xF, (board >> 20) & 0xF, (board >> 24) & 0xF, (board >> 28) & 0xF],
+        [(board >> 32) & 0xF, (board >> 36) & 0xF, (board >> 40) & 0xF, (board >> 44) & 0xF],
+        [(board >> 48) & 0xF, (board >> 52) & 0xF, (board >> 56) & 0xF, board >> 60],
+    ]
+
+
+def to_board(tiles):
+    """
+    Returns: the packed board of a 4x4 list of log2 tile values
+
+    Raises a ValueError if a tile is above 2^MAX_TILE (e.g. a 65536 tile, which
+    game_engine.GameState allows), since it doesn't fit in a nibble.
+    """
+    assert len(tiles) == NUM_ROWS and all([len(row) == NUM_COLS and 0 <= min(row) for row in tiles])
+    max_tile = max(map(max, tiles))
+    if max_tile > MAX_TILE:
+        raise ValueError(f"A tile of 2^{max_tile} doesn't fit in a bitboard (the largest is 2^{MAX_TILE})")
+    return pack_tiles(tiles)
+
+
+def to_tiles(board):
+    """
+    Returns: the 4x4 list of log2 tile values of a packed board
+    """
+    return [_unpack_row((board >> (16 * i)) & ROW_MASK) for i in range(NUM_ROWS)]
+
+
+def transpose(board):
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def move_tiles(board, dir):
+    """
+    Moves the tiles in the direction ("Up", "Down", "Left" or "Right"), like
+    game_engine.GameState.move_tiles.
+
+    Returns: (new_board, reward) - the tiles moved if new_board != board
+    """
+    reward = 0
+    if dir == "Left" or dir == "Right":
+        row_table, score_table = (ROW_LEFT, SCORE_LEFT) if dir == "Left" else (ROW_RIGHT, SCORE_RIGHT)
+        for shift in (0, 16, 32, 48):
+            row = (board >> shift) & ROW_MASK
+            board ^= row_table[row] << shift
+            reward += score_table[row]
+    elif dir == "Up" or dir == "Down":
+        col_table, score_table = (COL_UP, SCORE_LEFT) if dir == "Up" else (COL_DOWN, SCORE_RIGHT)
+        columns = transpose(board)
+        for j in range(NUM_COLS):
+            col = (columns >> (16 * j)) & ROW_MASK
+            board ^= col_table[col] << (4 * j)
+            reward += score_table[col]
+    else:
+        raise ValueError(f"Invalid direction {dir}!")
+    return (board, reward)
+
+
+def move_bits(board):
+    """
+    Returns: the moves that the board can make, as CAN_MOVE_LEFT/RIGHT bits
+    for the rows, plus the same bits shifted left by 2 for Up/Down
+    """
+    columns = transpose(board)
+    row_bits = (ROW_MOVES[board & ROW_MASK] | ROW_MOVES[(board >> 16) & ROW_MASK]
+                | ROW_MOVES[(board >> 32) & ROW_MASK] | ROW_MOVES[board >> 48])
+    col_bits = (ROW_MOVES[columns & ROW_MASK] | ROW_MOVES[(columns >> 16) & ROW_MASK]
+                | ROW_MOVES[(columns >> 32) & ROW_MASK] | ROW_MOVES[columns >> 48])
+    return row_bits | (col_bits << 2)
+
+
+def moves_available(board):
+    """
+    Returns: the set of directions that move at least one tile
+    """
+    return set(MOVE_SETS[move_bits(board)])
+
+
+def is_game_over(board):
+    return move_bits(board) == 0
+
+
+def empty_cells(board):
+    """
+    Returns: the indexes (4 * i + j) of the empty cells, in row-major order
+    """
+    return [cell_idx for cell_idx in range(NUM_CELLS) if (board >> (4 * cell_idx)) & 0xF == 0]
+
+
+def num_empty_cells(board):
+    return len(empty_cells(board))
+
+
+def spawn_tile(board, rand_gen, prob_two_tile=0.9):
+    """
+    Spawns a 2-tile (or a 4-tile, with probability 1 - prob_two_tile) in a
+    random empty cell, drawing from rand_gen in the same order as
+    game_engine.GameState.spawn_tile (so the same seed gives the same game).
+
+    Returns: the new board
+    """
+    cells = empty_cells(board)
+    idx = rand_gen.randrange(len(cells))
+    sample = rand_gen.random()
+    new_tile = 1 if sample < prob_two_tile else 2
+    return board | (new_tile << (4 * cells[idx]))
+
+
+def successor_states(board, move_dir, prob_two_tile=0.9):
+    """
+    Returns: a list of (probability, board, reward) for every spawn after the
+    move, in the same order as game_engine.GameState.successor_states
+    """
+    new_board, reward = move_tiles(board, move_dir)
+    assert new_board != board
+    cells = empty_cells(new_board)
+    transition_prob = 1.0 / len(cells)
+    successors = []
+    for cell_idx in cells:
+        shift = 4 * cell_idx
+        successors.append((transition_prob * prob_two_tile, new_board | (1 << shift), reward))
+        if prob_two_tile < 1.0:
+            successors.append((transition_prob * (1.0 - prob_two_tile), new_board | (2 << shift), reward))
+    return successors
+
+
+class BitboardState:
+    """
+    A 2048 game state backed by a packed board, with the same interface as
+    game_engine.GameState for playing (move_tiles, moves_available,
+    spawn_tile and successor_states).
+    """
+    def __init__(self, board=0, score=0, game_over=False):
+        self.nrows = NUM_ROWS
+        self.ncols = NUM_COLS
+        self.board = board
+        self.score = score
+        self.game_over = game_over
+
+    @classmethod
+    def from_tiles(cls, tiles, score=0, game_over=False):
+        return cls(board=to_board(tiles), score=score, game_over=game_over)
+
+    @property
+    def tiles(self):
+        return to_tiles(self.board)
+
+    def copy(self):
+        return BitboardState(board=self.board, score=self.score, game_over=self.game_over)
+
+    def __eq__(self, other):
+        if not isinstance(other, BitboardState):
+            return False
+        return self.board == other.board and self.score == other.score and self.game_over == other.game_over
+
+    def max_tile_value(self):
+        return 1 << max([(self.board >> (4 * cell_idx)) & 0xF for cell_idx in range(NUM_CELLS)])
+
+    def num_empty_tiles(self):
+        return num_empty_cells(self.board)
+
+    def reset_state(self):
+        self.board = 0
+        self.score = 0
+        self.game_over = False
+
+    def move_tiles(self, dir):
+        if self.game_over:
+            print("Game is over! No more moves allowed")
+            return
+        new_board, reward = move_tiles(self.board, dir)
+        moved_any = new_board != self.board
+        self.board = new_board
+        self.score += reward
+        return moved_any
+
+    def moves_available(self):
+        return moves_available(self.board)
+
+    def spawn_tile(self, rand_gen, prob_two_tile=0.9):
+        self.board = spawn_tile(self.board, rand_gen, prob_two_tile=prob_two_tile)
+
+    def successor_states(self, move_dir, prob_two_tile=0.9):
+        return [
+            (prob, BitboardState(board=board, score=self.score + reward), reward)
+            for prob, board, reward in successor_states(self.board, move_dir, prob_two_tile=prob_two_tile)
+        ]
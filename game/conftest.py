@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the modules import each other by their flat names (e.g. "from deck import
+# Card"), as when they're run from this directory, so running pytest from the
+# repo root needs this directory on the path too
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -48,6 +48,15 @@ def int_to_card(card_num: int):
     rank_idx = int(card_num % len(RANKS))
     return Card(rank=RANKS[rank_idx], suit=SUITS[suit_idx])
 
+
+def str_to_card(card_str: str):
+    # inverse of str(card), e.g. "Ks" -> Card("K", "s")
+    if card_str is None:
+        return None
+
+    assert len(card_str) == 2
+    return Card(rank=card_str[0], suit=card_str[1])
+
 class Deck:
     def __init__(self, seed=None, cards=None):
         if cards is not None:
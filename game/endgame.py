@@ -0,0 +1,228 @@
+import array
+import hashlib
+import itertools
+import random
+
+import click
+import numpy as np
+from agent import AGENT_TYPES
+from deck import RANKS, SUITS
+from gamestate import MASK_BITS, NUM_PILES, GameState, SearchState
+
+DEFAULT_MAX_CARDS = 10
+
+
+def hidden_slots(state):
+    """
+    Returns: the indices into state.cards (of a SearchState) of the hidden
+    cards, i.e. every card of every pile except the upcards
+    """
+    slots = []
+    for pile_idx in range(NUM_PILES):
+        slots.extend(range(state.pile_tops[pile_idx] + 1, state.pile_ends[pile_idx]))
+    return slots
+
+
+def canonical_key(state):
+    """
+    Returns a 64-bit key for the part of the state that a player can see and
+    that determines its value: the upcard and size of each pile, the pile
+    clear bonuses of the non-empty piles, the number of discards remaining,
+    which cards are of the lucky suit, and the set of unseen cards (the hidden
+    cards, which in a game are the cards that aren't dead). Which unseen card
+    is in which pile doesn't matter, so the key is the same for every
+    determinization of the state. The state is a GameState or a SearchState.
+
+    States that are the same up to a permutation of the piles within a row, a
+    permutation of the rows, or a relabeling of the non-lucky suits have the
+    same key, since hands are only constrained by whether the piles are all in
+    one row.
+    """
+    if not isinstance(state, SearchState):
+        state = SearchState(state)
+    piles = []
+    for pile_idx in range(NUM_PILES):
+        pile_size = state.pile_ends[pile_idx] - state.pile_tops[pile_idx]
+        if pile_size > 0:
+            piles.append((
+                pile_idx // 3, state.pile_bonuses[pile_idx], pile_size, state.cards[state.pile_tops[pile_idx]]
+            ))
+    unseen_card_nums = [state.cards[slot] for slot in hidden_slots(state)]
+
+    other_suit_idxs = [suit_idx for suit_idx in range(len(SUITS)) if suit_idx != state.lucky_suit_idx]
+    best_encoding = None
+    for suit_perm in itertools.permutations(other_suit_idxs):
+        # the lucky suit is always relabeled to 0
+        suit_map = [0] * len(SUITS)
+        for new_suit_idx, suit_idx in enumerate(suit_perm):
+            suit_map[suit_idx] = new_suit_idx + 1
+
+        rows = [[], [], []]
+        for r, bonus, pile_size, upcard_num in piles:
+            rows[r].append((
+                bonus, pile_size, suit_map[upcard_num // len(RANKS)] * len(RANKS) + upcard_num % len(RANKS)
+            ))
+        unseen = sorted([
+            suit_map[card_num // len(RANKS)] * len(RANKS) + card_num % len(RANKS)
+            for card_num in unseen_card_nums
+        ])
+        encoding = (tuple(sorted([tuple(sorted(row)) for row in rows])), unseen)
+        if best_encoding is None or encoding < best_encoding:
+            best_encoding = encoding
+
+    rows, unseen = best_encoding
+    key_nums = [state.discards_remaining]
+    for row in rows:
+        key_nums.append(len(row))
+        for bonus, pile_size, upcard_num in row:
+            key_nums.extend([int(bonus), pile_size, upcard_num])
+    key_nums.append(len(unseen))
+    key_nums.extend(unseen)
+    digest = hashlib.blake2b(array.array("i", key_nums).tobytes(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def solve(state, values):
+    """
+    Expected value of the state (the best expected total reward from here
+    until the game is over) for a player who sees only the upcards: each card
+    revealed by a move is equally likely to be any of the unseen cards, and
+    the best action is chosen after seeing it. Every position solved along the
+    way is saved in values, a dict from canonical_key to value. Only practical
+    when few cards are left.
+    """
+    return _solve(SearchState(state), values)
+
+
+def _solve(state, values):
+    key = canonical_key(state)
+    if key in values:
+        return values[key]
+
+    best_value = 0
+    for mask, reward in state.moves():
+        # the slots of the cards that the move reveals
+        reveal_slots = []
+        for pile_bit in MASK_BITS[mask]:
+            pile_idx = pile_bit.bit_length() - 1
+            if state.pile_ends[pile_idx] - state.pile_tops[pile_idx] > 1:
+                reveal_slots.append(state.pile_tops[pile_idx] + 1)
+        value = reward + _solve_reveals(state, mask, reveal_slots, hidden_slots(state), values)
+        if value > best_value:
+            best_value = value
+
+    values[key] = best_value
+    return best_value
+
+
+def _solve_reveals(state, mask, reveal_slots, slots, values):
+    # the average value after the move over every choice of the unseen cards
+    # revealed in reveal_slots: each one in turn is swapped with any of the
+    # unseen cards still in slots (the hidden cards aren't part of any mask of
+    # the SearchState or of its state_key, so they can be swapped freely; the
+    # solver doesn't use the search_key, which undo_move restores)
+    if len(reveal_slots) == 0:
+        token = state.do_move(mask)
+        try:
+            return _solve(state, values)
+        finally:
+            state.undo_move(token)
+
+    cards = state.cards
+    reveal_slot = reveal_slots[0]
+    other_slots = [slot for slot in slots if slot != reveal_slot]
+    total_value = 0
+    for slot in slots:
+        cards[reveal_slot], cards[slot] = cards[slot], cards[reveal_slot]
+        try:
+            total_value += _solve_reveals(state, mask, reveal_slots[1:], other_slots, values)
+        finally:
+            cards[reveal_slot], cards[slot] = cards[slot], cards[reveal_slot]
+    return total_value / len(slots)
+
+
+class EndgameTablebase:
+    """
+    Expected values (see solve) of endgame positions (with at most max_cards
+    cards left), stored as a sorted array of canonical keys and an array of
+    values.
+    """
+    def __init__(self, keys, values, max_cards=DEFAULT_MAX_CARDS):
+        self.keys = keys
+        self.values = values
+        self.max_cards = max_cards
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_dict(cls, values, max_cards=DEFAULT_MAX_CARDS):
+        keys = np.array(sorted(values), dtype=np.uint64)
+        value_array = np.array([values[int(key)] for key in keys], dtype=np.float32)
+        return cls(keys, value_array, max_cards=max_cards)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["keys"], data["values"], max_cards=int(data["max_cards"]))
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, keys=self.keys, values=self.values, max_cards=self.max_cards)
+
+    def lookup(self, state):
+        """
+        Returns: the expected value of the state (a GameState or a
+        SearchState), or None if it isn't in the tablebase
+        """
+        if state.num_cards() > self.max_cards or len(self.keys) == 0:
+            return None
+        key = np.uint64(canonical_key(state))
+        idx = np.searchsorted(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
+            return float(self.values[idx])
+        return None
+
+
+def generate_tablebase(num_games, max_cards=DEFAULT_MAX_CARDS, agent_type="greedy", seed=None):
+    """
+    Plays num_games games with the given agent type and solves every position
+    that has at most max_cards cards left (and all the positions that can be
+    reached from it, whatever the unseen cards turn out to be).
+
+    Returns: tablebase - an EndgameTablebase with all the solved positions
+    """
+    rand_gen = random.Random(seed)
+    agent = AGENT_TYPES[agent_type]()
+    values = {}
+    for i in range(num_games):
+        state = GameState()
+        state.start_new_game_from_deck(seed=rand_gen.getrandbits(32))
+        while not state.is_game_over():
+            if state.num_cards() <= max_cards:
+                solve(state, values)
+            state = agent.choose_action(state)[1]
+    agent.close()
+    return EndgameTablebase.from_dict(values, max_cards=max_cards)
+
+
+@click.command()
+@click.option("--num-games", "-n", type=int, default=1000)
+@click.option(
+    "--max-cards", "-m", type=int, default=DEFAULT_MAX_CARDS,
+    help="Solve the positions with at most this many cards left"
+)
+@click.option(
+    "--agent-type", "-a", type=click.Choice(list(AGENT_TYPES)), default="greedy",
+    help="Type of agent that plays the games to reach the endgame positions"
+)
+@click.option("--seed", type=int, default=None)
+@click.option("--output", "-o", type=str, required=True, help="File name of the tablebase (.npz)")
+def main(num_games: int, max_cards: int, agent_type: str, seed: int, output: str):
+    tablebase = generate_tablebase(num_games, max_cards=max_cards, agent_type=agent_type, seed=seed)
+    tablebase.save(output)
+    print(f"Saved {len(tablebase)} endgame positions to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,22 @@
 from datetime import datetime
 import random
 import os
+import struct
+import bitboard
+from bitboard import DIRS, MAX_TILE, pack_tiles, to_board, unpack_tiles
 
 NUM_ROWS = 4
 NUM_COLS = 4
 GAME_FILES_DIR = 'games'
 
+# binary game files: a header, then a record per turn with the packed board
+# (see bitboard.py), the score, the direction moved from it (NO_MOVE for the
+# last turn) and whether the game is over
+BINARY_HEADER = b"2048GAME\x01\x00\x00\x00"
+BINARY_RECORD = struct.Struct("<QIBB")
+NO_MOVE = 255
+DEFAULT_FLUSH_INTERVAL = 100
+
 class GameState:
     def __init__(self, nrows=NUM_ROWS, ncols=NUM_COLS, tiles=[[0] * NUM_COLS for i in range(NUM_ROWS)], score=0, game_over=False):
         assert len(tiles) == nrows
@@ -99,6 +110,21 @@ class GameState:
         # dir is either "Up", "Down", "Left", or "Right"
         assert dir in ["Up", "Down", "Left", "Right"]
 
+        # the tiles are moved with the row and column tables of the packed board
+        if self._packable():
+            board = pack_tiles(self.tiles)
+            new_board, reward = bitboard.move_tiles(board, dir)
+            if new_board == board:
+                return False
+            for row, new_row in zip(self.tiles, unpack_tiles(new_board)):
+                row[:] = new_row
+            self.score += reward
+            return True
+        return self.scan_move_tiles(dir)
+
+    def scan_move_tiles(self, dir):
+        # move_tiles by walking the cells of every row or column (works for any board size)
+
         # contains coordinates from rows or columns, ordered based on direction (e.g. if
         # dir is Up, then the groups contains the columns ordered from top-to-bottom)
         groups = []
@@ -165,8 +191,26 @@ class GameState:
                             last_tile_idx = idx
         return moved_any
 
+    def _packable(self):
+        # whether the tiles fit in a bitboard (a 32768 tile is excluded too,
+        # since the bitboard tables don't merge two of them)
+        return self.nrows == NUM_ROWS and self.ncols == NUM_COLS and max(map(max, self.tiles)) < MAX_TILE
+
     def moves_available(self):
-        # returns a list containing the valid movement directions from ["Up", "Down", "Left", "Right"]
+        # returns a set containing the valid movement directions from ["Up", "Down", "Left", "Right"],
+        # looked up per row and column of the packed board
+        if self._packable():
+            return bitboard.moves_available(pack_tiles(self.tiles))
+        return self.scan_moves_available()
+
+    def is_game_over(self):
+        # whether no move is available
+        if self._packable():
+            return bitboard.is_game_over(pack_tiles(self.tiles))
+        return not self.scan_moves_available()
+
+    def scan_moves_available(self):
+        # moves_available by scanning every row and column (works for any board size)
         dirs = set([])
         up = False
         down = False
@@ -240,35 +284,150 @@ class GameState:
         i, j = empty_tile_locs[idx]
         self.tiles[i][j] = new_tile
 
-    def successor_states(self, move_dir, prob_two_tile=0.9):
-        successors = []
+    def after_move(self, move_dir):
+        # returns the state after the move, before a tile spawns, and the move's reward
         new_state = self.copy()
         moved_any = new_state.move_tiles(move_dir)
         assert moved_any
-        reward = new_state.score - self.score
-        num_empty_tiles = new_state.num_empty_tiles()
-        for i in range(new_state.nrows):
-            for j in range(new_state.ncols):
-                if new_state.tiles[i][j] == 0:
-                    successor = new_state.copy()
-                    successor.tiles[i][j] = 1
-                    # print(f"before spawning: {new_state.tiles}")
-                    # print(f"after spawning: {successor.tiles}")
-                    transition_prob = 1.0 / num_empty_tiles
-                    successors.append((transition_prob * prob_two_tile, successor, reward))
+        return new_state, new_state.score - self.score
 
+    def spawn_outcomes(self, prob_two_tile=0.9):
+        # yields (probability, (i, j), tile) for each tile that can spawn on this state, without copying it
+        # (nothing for a full board)
+        num_empty_tiles = self.num_empty_tiles()
+        if num_empty_tiles == 0:
+            return
+        transition_prob = 1.0 / num_empty_tiles
+        for i in range(self.nrows):
+            for j in range(self.ncols):
+                if self.tiles[i][j] == 0:
+                    yield (transition_prob * prob_two_tile, (i, j), 1)
                     if prob_two_tile < 1.0:
-                        successor2 = new_state.copy()
-                        successor2.tiles[i][j] = 2
-                        successors.append((transition_prob * (1.0 - prob_two_tile), successor2, reward))
-        return successors
+                        yield (transition_prob * (1.0 - prob_two_tile), (i, j), 2)
+
+    def with_spawn(self, loc, tile):
+        # returns a copy of the state with the tile spawned at loc
+        successor = self.copy()
+        i, j = loc
+        successor.tiles[i][j] = tile
+        return successor
+
+    def expected_spawn_value(self, evaluate, prob_two_tile=0.9):
+        # expected value of evaluate(state) over the spawns, placing each tile on this state in turn
+        # (instead of copying it once per spawn)
+        expected_value = 0.0
+        for prob, (i, j), tile in self.spawn_outcomes(prob_two_tile):
+            self.tiles[i][j] = tile
+            try:
+                expected_value += prob * evaluate(self)
+            finally:
+                self.tiles[i][j] = 0
+        return expected_value
+
+    def iter_successor_states(self, move_dir, prob_two_tile=0.9):
+        # yields (probability, successor, reward) lazily, in the same order as successor_states
+        new_state, reward = self.after_move(move_dir)
+        for prob, loc, tile in new_state.spawn_outcomes(prob_two_tile):
+            yield (prob, new_state.with_spawn(loc, tile), reward)
+
+    def successor_states(self, move_dir, prob_two_tile=0.9):
+        return list(self.iter_successor_states(move_dir, prob_two_tile=prob_two_tile))
+
+class CsvGameWriter:
+    """
+    Writes a game to a CSV file (one line per turn, as read by
+    GameState.from_csv_line) through one buffered file handle, kept open for
+    the whole game and flushed every flush_interval moves.
+    """
+    extension = ".csv"
+
+    def __init__(self, filename, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.game_file = open(filename, 'w')
+        self.flush_interval = flush_interval
+        self.num_moves = 0
+
+    def write_state(self, state):
+        tile_strs = [str(tile) for row in state.tiles for tile in row]
+        self.game_file.write(f"{state.game_over},{state.score},{','.join(tile_strs)},")
+
+    def write_action(self, dir):
+        self.game_file.write(f"{dir}\n")
+        self.num_moves += 1
+        if self.num_moves % self.flush_interval == 0:
+            self.flush()
+
+    def flush(self):
+        self.game_file.flush()
+
+    def close(self):
+        self.game_file.close()
+
+
+class BinaryGameWriter:
+    """
+    Writes a game to a binary file of fixed-size records (BINARY_RECORD), with
+    the same buffering as CsvGameWriter. A turn's record is written once its
+    action is known.
+    """
+    extension = ".bin"
+
+    def __init__(self, filename, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.game_file = open(filename, 'wb')
+        self.game_file.write(BINARY_HEADER)
+        self.flush_interval = flush_interval
+        self.num_moves = 0
+        self.pending_state = None
+
+    def _write_record(self, dir_idx):
+        board, score, game_over = self.pending_state
+        self.game_file.write(BINARY_RECORD.pack(board, score, dir_idx, game_over))
+        self.pending_state = None
+
+    def write_state(self, state):
+        if max(map(max, state.tiles)) > MAX_TILE:
+            raise ValueError(
+                f"Can't write a tile of 2^{max(map(max, state.tiles))} to a binary game file "
+                f"(the largest is 2^{MAX_TILE}), use the csv format for this game"
+            )
+        if self.pending_state is not None:
+            self._write_record(NO_MOVE)
+        self.pending_state = (to_board(state.tiles), state.score, state.game_over)
+
+    def write_action(self, dir):
+        self._write_record(DIRS.index(dir))
+        self.num_moves += 1
+        if self.num_moves % self.flush_interval == 0:
+            self.flush()
+
+    def flush(self):
+        if self.pending_state is not None and self.pending_state[2]:
+            # the game is over, so no action will follow
+            self._write_record(NO_MOVE)
+        self.game_file.flush()
+
+    def close(self):
+        if self.pending_state is not None:
+            self._write_record(NO_MOVE)
+        self.game_file.close()
+
+
+GAME_WRITERS = {
+    "csv": CsvGameWriter,
+    "binary": BinaryGameWriter,
+}
+
 
 class Game:
-    def __init__(self, game_state=None):
+    def __init__(self, game_state=None, verbose=True):
         if game_state is None:
-            self.state = GameState()
-
-    def new_game(self, random_seed=None, save_game=True, game_dir=GAME_FILES_DIR):
+            game_state = GameState(tiles=[[0] * NUM_COLS for i in range(NUM_ROWS)])
+        self.state = game_state
+        self.verbose = verbose
+        self.game_filename = None
+        self.game_writer = None
+
+    def new_game(self, random_seed=None, save_game=True, game_dir=GAME_FILES_DIR, file_format="csv"):
+        self.close()
         self.state.reset_state()
 
         if random_seed is None:
@@ -280,28 +439,32 @@ class Game:
         self.state.spawn_tile(self.rand_gen)
 
         if save_game:
-            self.game_filename = os.path.join(game_dir, datetime.now().strftime(f"%Y-%m-%d-%H-%M-%S_{random_seed}.csv"))
+            writer_class = GAME_WRITERS[file_format]
+            self.game_filename = os.path.join(
+                game_dir, datetime.now().strftime(f"%Y-%m-%d-%H-%M-%S_{random_seed}{writer_class.extension}")
+            )
             if not os.path.isdir(game_dir):
                 os.mkdir(game_dir)
+            self.game_writer = writer_class(self.game_filename)
             self.append_game_state()
-            print(f"Started a new game! Saving to {self.game_filename}")
+            if self.verbose:
+                print(f"Started a new game! Saving to {self.game_filename}")
         else:
             self.game_filename = None
-            print("Started a new game! Not saving the game to a file...")
+            if self.verbose:
+                print("Started a new game! Not saving the game to a file...")
 
     def append_game_state(self):
-        with open(self.game_filename, 'a') as game_file:
-            game_file.write(f"{self.state.game_over},{self.state.score},")
-            for i in range(self.state.nrows):
-                for j in range(self.state.ncols):
-                    # if i == self.state.nrows - 1 and j == self.state.ncols - 1:
-                    #     game_file.write(f"{self.state.tiles[i][j]}\n")
-                    # else:
-                    game_file.write(f"{self.state.tiles[i][j]},")
+        self.game_writer.write_state(self.state)
 
     def append_game_action(self, dir):
-        with open(self.game_filename, 'a') as game_file:
-            game_file.write(f"{dir}\n")
+        self.game_writer.write_action(dir)
+
+    def close(self):
+        # closes the game file (if the game is being saved)
+        if self.game_writer is not None:
+            self.game_writer.close()
+            self.game_writer = None
 
     def move(self, dir):
         available_moves = self.state.moves_available()
@@ -309,12 +472,16 @@ class Game:
 
         if moved_any:
             assert dir in available_moves
-            self.append_game_action(dir)
+            if self.game_writer is not None:
+                self.append_game_action(dir)
 
             self.state.spawn_tile(self.rand_gen)
 
             # if there are no valid moves left, then game is over
-            if not self.state.moves_available():
+            if self.state.is_game_over():
                 self.state.game_over = True
 
-            self.append_game_state()
+            if self.game_writer is not None:
+                self.append_game_state()
+                if self.state.game_over:
+                    self.game_writer.flush()
@@ -1,6 +1,14 @@
+import queue
+import threading
 import tkinter as tk
 from tkinter import filedialog
-from game_engine import Game, GameState
+
+import click
+from agent_2048 import AGENT_TYPES
+from game_engine import Game
+from game_loader import GameFile
+
+DEFAULT_FPS = 30
 
 tile_bkgrd_color = {
     0: "#cdc1b4",
@@ -50,41 +58,106 @@ class GameTiles(tk.Frame):
         for i in range(4):
             for j in range(4):
                 self.tiles[i][j].grid(row=i, column=j, sticky=tk.N+tk.S+tk.W+tk.E)
+        # the tile values the labels show, so only changed labels are redrawn
+        self.drawn_tiles = [[None] * 4 for i in range(4)]
         # self.grid()
 
-    def draw_tiles(self, game):
+    def draw_tiles(self, state):
         for i in range(4):
             for j in range(4):
-                if game.state.tiles[i][j] > 0:
-                    value = 1 << game.state.tiles[i][j]
+                tile = state.tiles[i][j]
+                if tile == self.drawn_tiles[i][j]:
+                    continue
+                self.drawn_tiles[i][j] = tile
+
+                if tile > 0:
+                    value = 1 << tile
                     text = f"{value}"
                 else:
                     text = ""
 
                 # different tile background/text color for different valued tiles
-                if game.state.tiles[i][j] > 12:
+                if tile > 12:
                     bg_color = '#3c3a32'
                 else:
-                    bg_color = tile_bkgrd_color[game.state.tiles[i][j]]
+                    bg_color = tile_bkgrd_color[tile]
 
-                if game.state.tiles[i][j] > 2:
+                if tile > 2:
                     text_color = "#f9f6f2"
                 else:
                     text_color = "#776e65"
 
-                self.tiles[i][j]['text'] = text
-                self.tiles[i][j]['bg'] = bg_color
-                self.tiles[i][j]['fg'] = text_color
+                self.tiles[i][j].configure(text=text, bg=bg_color, fg=text_color)
+
+class AutoPlayer:
+    """
+    Plays the game with an agent on a worker thread, so the agent's search
+    doesn't block the tkinter main loop (and isn't slowed down by drawing).
+    A copy of the state after each move is put on a queue, which the GUI
+    drains at its own frame rate. The game belongs to the worker thread
+    until stop() returns or the game is over.
+    """
+    def __init__(self, game, agent):
+        self.game = game
+        self.agent = agent
+        self.states = queue.Queue()
+        self.stop_event = threading.Event()
+        self.finished = False
+        self.thread = threading.Thread(target=self._play, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def _play(self):
+        try:
+            while not self.stop_event.is_set() and not self.game.state.game_over:
+                dir = self.agent.choose_action(self.game.state)
+                if dir is None:
+                    break
+                self.game.move(dir)
+                self.states.put(self.game.state.copy())
+        finally:
+            # marks the end of the game (or of the autoplay)
+            self.states.put(None)
+
+    def latest_state(self):
+        """
+        Returns: the most recent state that the worker has played to (skipping
+        the states in between), or None if it hasn't moved since the last call
+        """
+        latest = None
+        while True:
+            try:
+                state = self.states.get_nowait()
+            except queue.Empty:
+                return latest
+            if state is None:
+                self.finished = True
+            else:
+                latest = state
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
 
 class GameWindow(tk.Frame):
-    def __init__(self, master=None):
+    def __init__(self, master=None, agent=None, fps=DEFAULT_FPS):
         super().__init__(master)
         self.master = master
+        self.agent = agent
+        self.frame_ms = max(1, int(1000 / fps))
+        self.autoplayer = None
         self.grid()
         self.create_widgets()
+        # closing the window quits the same way as the Quit button (so the
+        # game file is closed)
+        self.master.protocol("WM_DELETE_WINDOW", self.quit_game)
 
     def create_widgets(self):
         self.game = Game()
+        self.game_file = None
+        # whether self.game is a game in progress (rather than a loaded game)
+        self.playing = False
         self.game_tiles = GameTiles(master=self)
         self.draw_game_tiles()
         self.game_tiles.grid()
@@ -100,51 +173,114 @@ class GameWindow(tk.Frame):
         self.load_game_button = tk.Button(self, text="Load Game", command=self.load_game)
         self.load_game_button.grid()
 
-        self.quit = tk.Button(self, text="Quit", fg="red", command=self.master.destroy)
+        if self.agent is not None:
+            self.autoplay_button = tk.Button(self, text="Autoplay", command=self.toggle_autoplay)
+            self.autoplay_button.grid()
+
+        self.quit = tk.Button(self, text="Quit", fg="red", command=self.quit_game)
         self.quit.grid()
 
-    def draw_game_tiles(self):
-        self.game_tiles.draw_tiles(self.game)
+    def quit_game(self):
+        self.stop_autoplay()
+        # close the game file, so everything buffered is written
+        self.game.close()
+        self.master.destroy()
 
-    def draw_score(self):
-        self.score_strvar.set(f"Score: {self.game.state.score}")
+    def draw_game_tiles(self, state=None):
+        self.game_tiles.draw_tiles(self.game.state if state is None else state)
 
-    def new_game(self):
+    def draw_score(self, state=None):
+        self.score_strvar.set(f"Score: {(self.game.state if state is None else state).score}")
+
+    def bind_move_keys(self):
         self.master.bind('<Up>', self.move)
         self.master.bind('<Down>', self.move)
         self.master.bind('<Left>', self.move)
         self.master.bind('<Right>', self.move)
 
+    def unbind_move_keys(self):
+        for key in ('<Up>', '<Down>', '<Left>', '<Right>'):
+            self.master.unbind(key)
+
+    def new_game(self):
+        self.stop_autoplay()
+        self.bind_move_keys()
+
         self.game.new_game()
+        self.playing = True
+        self.draw_game_tiles()
+        self.draw_score()
+
+    def toggle_autoplay(self):
+        if self.autoplayer is not None:
+            self.stop_autoplay()
+            return
+        # the agent continues the game in progress, or plays a new one
+        if not self.playing or self.game.state.game_over:
+            self.new_game()
+        self.unbind_move_keys()
+        self.autoplay_button['text'] = "Stop Autoplay"
+        self.agent.new_game()
+        self.autoplayer = AutoPlayer(self.game, self.agent)
+        self.autoplayer.start()
+        self.after(self.frame_ms, self.poll_autoplay)
+
+    def poll_autoplay(self):
+        # draws the latest state from the agent once per frame
+        if self.autoplayer is None:
+            return
+        state = self.autoplayer.latest_state()
+        if state is not None:
+            self.draw_game_tiles(state)
+            self.draw_score(state)
+        if self.autoplayer.finished:
+            self.stop_autoplay()
+            if self.game.state.game_over:
+                print("Game over! no moves available")
+        else:
+            self.after(self.frame_ms, self.poll_autoplay)
+
+    def stop_autoplay(self):
+        if self.autoplayer is None:
+            return
+        self.autoplayer.stop()
+        self.autoplayer = None
+        self.autoplay_button['text'] = "Autoplay"
+        # the game is back on the main thread
         self.draw_game_tiles()
         self.draw_score()
+        if self.playing:
+            self.bind_move_keys()
 
     def load_game(self):
-        fname = filedialog.askopenfilename(filetypes=(("CSV files", "*.csv"),))
+        fname = filedialog.askopenfilename(
+            filetypes=(("Game files", "*.csv *.bin"), ("CSV files", "*.csv"), ("Binary files", "*.bin"))
+        )
         if fname:
+            self.stop_autoplay()
+            self.playing = False
             # TODO add instructions to the GUI?
             self.master.unbind('<Up>')
             self.master.unbind('<Down>')
             self.master.bind('<Left>', self.decrement_turn_number)
             self.master.bind('<Right>', self.increment_turn_number)
             print(f"Loading game from {fname}!")
-            with open(fname, 'r') as game_file:
-                self.game_states = game_file.readlines()
-                self.turn_number = 0
+            if self.game_file is not None:
+                self.game_file.close()
+            self.game_file = GameFile(fname)
+            self.turn_number = 0
             self.load_game_state()
 
     def load_game_state(self):
         print(f"turn number = {self.turn_number}")
-        self.game.state = GameState.from_csv_line(self.game_states[self.turn_number])
-
-        next_action = self.game_states[self.turn_number].split(',')[-1].strip()
+        self.game.state, next_action = self.game_file[self.turn_number]
         print(f"action from this state: {next_action}")
 
         self.draw_game_tiles()
         self.draw_score()
 
     def increment_turn_number(self, event):
-        if self.turn_number < len(self.game_states) - 1:
+        if self.turn_number < len(self.game_file) - 1:
             self.turn_number += 1
             self.load_game_state()
 
@@ -164,8 +300,38 @@ class GameWindow(tk.Frame):
         # else:
             # print(f"moves available: {self.game.state.moves_available()}")
 
-root = tk.Tk()
-root.geometry("500x600")
+@click.command()
+@click.option(
+    "--agent-type", "-a", type=click.Choice(list(AGENT_TYPES)), default=None,
+    help="Agent for the Autoplay button (no autoplay if not given)"
+)
+@click.option("--fps", type=float, default=DEFAULT_FPS, help="Frame rate at which autoplay moves are drawn")
+@click.option(
+    "--time-limit", type=float, default=None,
+    help="Time limit per move in seconds (only for the expectimax agent)"
+)
+@click.option(
+    "--network-path", type=str, default=None,
+    help="Directory of an n-tuple network trained by ntuple.py (only for the ntuple agent)"
+)
+def main(agent_type: str, fps: float, time_limit: float, network_path: str):
+    agent_kwargs = {}
+    if time_limit is not None:
+        if agent_type != "expectimax":
+            raise Exception("Only the expectimax agent has a time limit! See command documentation")
+        agent_kwargs["time_limit"] = time_limit
+    if network_path is not None:
+        if agent_type != "ntuple":
+            raise Exception("Only the ntuple agent uses a network! See command documentation")
+        agent_kwargs["network_path"] = network_path
+    agent = AGENT_TYPES[agent_type](**agent_kwargs) if agent_type is not None else None
+
+    root = tk.Tk()
+    root.geometry("500x650")
+
+    app = GameWindow(master=root, agent=agent, fps=fps)
+    app.mainloop()
+
 
-app = GameWindow(master=root)
-app.mainloop()
+if __name__ == "__main__":
+    main()
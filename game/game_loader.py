@@ -0,0 +1,115 @@
+import mmap
+import os
+
+import numpy as np
+from bitboard import DIRS, to_tiles
+from game_engine import BINARY_HEADER, BINARY_RECORD, NO_MOVE, GameState
+
+BINARY_DTYPE = np.dtype([("board", "<u8"), ("score", "<u4"), ("dir", "u1"), ("game_over", "u1")])
+assert BINARY_DTYPE.itemsize == BINARY_RECORD.size
+CELL_SHIFTS = 4 * np.arange(16, dtype=np.uint64)
+
+
+def _is_binary(data):
+    return data[:len(BINARY_HEADER)] == BINARY_HEADER
+
+
+class GameFile:
+    """
+    Random access to the turns of a 2048 game file (CSV or binary, as written
+    by game_engine.Game) through a memory map: game_file[turn] returns the
+    turn's (GameState, action) without reading the rest of the file. A CSV
+    file is indexed by the offsets of its lines when it's opened, while binary
+    records are at fixed offsets.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, "rb")
+        if os.fstat(self.file.fileno()).st_size == 0:
+            # (an empty file can't be memory mapped)
+            self.file.close()
+            raise ValueError(f"Game file {filename} is empty")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.binary = _is_binary(self.data)
+        if self.binary:
+            self.num_turns = (len(self.data) - len(BINARY_HEADER)) // BINARY_RECORD.size
+            self.line_starts = None
+        else:
+            newlines = np.flatnonzero(np.frombuffer(self.data, dtype=np.uint8) == ord("\n"))
+            self.line_starts = np.concatenate([[0], newlines + 1])
+            # the last line (the game over state) has no newline
+            if self.line_starts[-1] == len(self.data):
+                self.line_starts = self.line_starts[:-1]
+            self.num_turns = len(self.line_starts)
+
+    def __len__(self):
+        return self.num_turns
+
+    def __getitem__(self, turn):
+        """
+        Returns: (state, action) - the game state at the turn, and the direction
+        moved from it (None after the last turn)
+        """
+        if turn < 0:
+            turn += self.num_turns
+        if not 0 <= turn < self.num_turns:
+            raise IndexError(f"Turn {turn} is out of range ({self.num_turns} turns)")
+
+        if self.binary:
+            offset = len(BINARY_HEADER) + turn * BINARY_RECORD.size
+            board, score, dir_idx, game_over = BINARY_RECORD.unpack_from(self.data, offset)
+            action = None if dir_idx == NO_MOVE else DIRS[dir_idx]
+            return (GameState(tiles=to_tiles(board), score=score, game_over=bool(game_over)), action)
+
+        start = int(self.line_starts[turn])
+        end = int(self.line_starts[turn + 1]) if turn + 1 < self.num_turns else len(self.data)
+        line = self.data[start:end].decode()
+        action = line.split(',')[-1].strip()
+        return (GameState.from_csv_line(line), action if action else None)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def load_game_arrays(filename):
+    """
+    Loads a whole game file into NumPy arrays, for analysis.
+
+    Returns: a dict with "tiles" (a turns x 16 array of log2 tile values, in
+    row-major order), "score", "game_over" and "action" (the index in
+    bitboard.DIRS of the direction moved, or NO_MOVE after the last turn)
+    """
+    with open(filename, "rb") as game_file:
+        data = game_file.read()
+    if len(data) == 0:
+        raise ValueError(f"Game file {filename} is empty")
+
+    if _is_binary(data):
+        # a partly written last record (e.g. if the game is still being
+        # written) is ignored, like in GameFile
+        num_records = (len(data) - len(BINARY_HEADER)) // BINARY_RECORD.size
+        records = np.frombuffer(data, dtype=BINARY_DTYPE, count=num_records, offset=len(BINARY_HEADER))
+        tiles = ((records["board"][:, None] >> CELL_SHIFTS) & 0xF).astype(np.int8)
+        return {
+            "tiles": tiles,
+            "score": records["score"].astype(np.int64),
+            "game_over": records["game_over"].astype(bool),
+            "action": records["dir"].copy(),
+        }
+
+    lines = data.decode().splitlines()
+    tokens = [line.split(",") for line in lines]
+    dir_idxs = {dir: dir_idx for dir_idx, dir in enumerate(DIRS)}
+    return {
+        "tiles": np.array([line_tokens[2:18] for line_tokens in tokens], dtype=np.int8).reshape(len(lines), 16),
+        "score": np.array([line_tokens[1] for line_tokens in tokens], dtype=np.int64),
+        "game_over": np.array([line_tokens[0] == "True" for line_tokens in tokens], dtype=bool),
+        "action": np.array([dir_idxs.get(line_tokens[18].strip(), NO_MOVE) for line_tokens in tokens], dtype=np.uint8),
+    }
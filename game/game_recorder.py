@@ -1,9 +1,13 @@
 import os
-import uuid
+import random
 import click
-from agent import GameAgent, RandomGameAgent, GreedyGameAgent
+from agent import AGENT_TYPES, GameAgent
 from deck import int_to_card
+from endgame import EndgameTablebase
 from gamestate import GameState
+from record_sink import BatchedRecordSink, DirectoryRecordSink
+from run_manifest import RunManifest
+from sim_metrics import ProgressReporter
 
 def short_repr_gamestate(gamestate: GameState) -> str:
     board_repr = ""
@@ -24,36 +28,65 @@ def short_repr_gamestate(gamestate: GameState) -> str:
     return board_repr
 
 
-def play_game(record_filename, agent: GameAgent):
+def record_game(agent: GameAgent, seed=None):
+    """
+    Plays a game, building its record in memory.
+
+    Returns: (record_text, score, is_board_cleared, num_moves)
+    """
     gamestate = GameState()
-    gamestate.start_new_game_from_deck()
+    gamestate.start_new_game_from_deck(seed=seed)
     score = 0
 
-    with open(record_filename, "w") as record_file:
-        # record the current gamestate
-        record_file.write(short_repr_gamestate(gamestate))
+    # record the current gamestate
+    record_lines = [short_repr_gamestate(gamestate)]
 
-        turn_num = 1
-        while not gamestate.is_game_over():
-            chosen_action = agent.choose_action(gamestate)
-            # record the chosen action, reward
-            record_file.write(f"\nTurn {turn_num}: {chosen_action[0]}, {chosen_action[2]}\n")
+    turn_num = 1
+    while not gamestate.is_game_over():
+        chosen_action = agent.choose_action(gamestate)
+        # record the chosen action, reward
+        record_lines.append(f"\nTurn {turn_num}: {chosen_action[0]}, {chosen_action[2]}\n")
+
+        # update to new game state based on chosen action
+        gamestate = chosen_action[1]
+
+        # update score
+        score += chosen_action[2]
+
+        # record new gamestate
+        record_lines.append(short_repr_gamestate(gamestate))
+
+        turn_num += 1
 
-            # update to new game state based on chosen action
-            gamestate = chosen_action[1]
+    # once game is over, record game over and total score
+    is_board_cleared = gamestate.is_board_empty()
+    record_lines.append(f"Game over, final score = {score}, table cleared = {is_board_cleared}")
+    return ("".join(record_lines), score, is_board_cleared, turn_num - 1)
 
-            # update score
-            score += chosen_action[2]
 
-            # record new gamestate
-            record_file.write(short_repr_gamestate(gamestate))
+def play_deals(agent: GameAgent, seeds):
+    """
+    Plays a game for each seed, without recording it.
+
+    Returns: a list of (score, is_board_cleared) for each seed
+    """
+    results = []
+    for seed in seeds:
+        gamestate = GameState()
+        gamestate.start_new_game_from_deck(seed=seed)
+        score = 0
+        while not gamestate.is_game_over():
+            _, gamestate, reward = agent.choose_action(gamestate)
+            score += reward
+        results.append((score, gamestate.is_board_empty()))
+    return results
 
-            turn_num += 1
 
-        # once game is over, record game over and total score
-        is_board_cleared = gamestate.is_board_empty()
-        record_file.write(f"Game over, final score = {score}, table cleared = {is_board_cleared}")
-        print(f"final score = {score}, table cleared = {is_board_cleared}")
+def play_game(record_filename, agent: GameAgent, seed=None):
+    record_text, score, is_board_cleared, num_moves = record_game(agent, seed=seed)
+    with open(record_filename, "w") as record_file:
+        record_file.write(record_text)
+    return (score, is_board_cleared, num_moves)
 
 @click.command()
 @click.option("--num-games", "-n", type=int, default=100)
@@ -62,21 +95,108 @@ def play_game(record_filename, agent: GameAgent):
     help="Directory name where the game records will be saved"
 )
 @click.option(
-    "--agent-type", "-a", type=click.Choice(["random", "greedy"]),
+    "--agent-type", "-a", type=click.Choice(list(AGENT_TYPES)),
     help="Type of agent that will play the games, see game/agent.py for details"
 )
-def main(num_games: int, record_directory: str, agent_type: str):
-    if agent_type == "random":
-        agent = RandomGameAgent()
-    elif agent_type == "greedy":
-        agent = GreedyGameAgent()
+@click.option(
+    "--cache-path", type=str, default=None,
+    help="SQLite file where search results are cached across runs (only for the search agent)"
+)
+@click.option(
+    "--tablebase-path", type=str, default=None,
+    help="Endgame tablebase file generated by endgame.py (only for the search and iterative agents)"
+)
+@click.option("--seed", type=int, default=None, help="Base seed of the run (game i is dealt with seed + i)")
+@click.option(
+    "--checkpoint-interval", type=click.IntRange(min=1), default=100,
+    help="Number of games between checkpoints of the run manifest"
+)
+@click.option(
+    "--resume", is_flag=True, default=False,
+    help="Resume the run in the record directory from its last checkpoint (uses the options of the original run)"
+)
+@click.option(
+    "--record-file", type=str, default=None,
+    help="Write all the game records to this file in the record directory (gzip-compressed if it ends with .gz) "
+         "instead of one file per game"
+)
+@click.option(
+    "--progress-interval", type=float, default=2.0,
+    help="Minimum number of seconds between progress reports"
+)
+@click.option(
+    "--metrics-file", type=str, default=None,
+    help="JSON file where the run metrics are written at the end (default: run_metrics.json in the record directory)"
+)
+def main(num_games: int, record_directory: str, agent_type: str, cache_path: str, tablebase_path: str,
+         seed: int, checkpoint_interval: int, resume: bool, record_file: str, progress_interval: float,
+         metrics_file: str):
+    if resume:
+        if not RunManifest.exists(record_directory):
+            raise Exception(f"No run to resume in {record_directory}!")
+        manifest = RunManifest.load(record_directory)
+        agent_type = manifest.config["agent_type"]
+        cache_path = manifest.config["cache_path"]
+        tablebase_path = manifest.config["tablebase_path"]
+        record_file = manifest.config.get("record_file")
+        # a run started with an interval of 0 (before it was rejected) saved its
+        # manifest and then failed on the first game, so it resumes with the
+        # interval given now
+        if manifest.config.get("checkpoint_interval", 0) >= 1:
+            checkpoint_interval = manifest.config["checkpoint_interval"]
+        print(f"resuming run after {manifest.games_completed} of {manifest.num_games} games")
     else:
+        if RunManifest.exists(record_directory):
+            raise Exception(f"There is already a run in {record_directory}! Use --resume to continue it")
+        if seed is None:
+            seed = random.getrandbits(32)
+        if not os.path.isdir(record_directory):
+            os.makedirs(record_directory)
+        config = {
+            "agent_type": agent_type, "cache_path": cache_path, "tablebase_path": tablebase_path,
+            "record_file": record_file, "checkpoint_interval": checkpoint_interval,
+        }
+        manifest = RunManifest(record_directory, config, num_games, seed)
+        manifest.save()
+
+    if agent_type not in AGENT_TYPES:
         raise Exception("Invalid agent type! See command documentation")
-    for i in range(num_games):
-        print(f"playing game {i+1} of {num_games}")
-        random_uuid = uuid.uuid4()
-        record_filename = os.path.join(record_directory, f"{str(random_uuid)}.txt")
-        play_game(record_filename, agent)
+    agent_kwargs = {}
+    if cache_path is not None:
+        if agent_type != "search":
+            raise Exception("Only the search agent can use a cache! See command documentation")
+        agent_kwargs["cache_path"] = cache_path
+    if tablebase_path is not None:
+        if agent_type not in ["search", "iterative"]:
+            raise Exception("Only the search agents can use a tablebase! See command documentation")
+        agent_kwargs["tablebase"] = EndgameTablebase.load(tablebase_path)
+    agent = AGENT_TYPES[agent_type](**agent_kwargs)
+    if record_file is not None:
+        record_sink = BatchedRecordSink(
+            os.path.join(record_directory, record_file), compress=record_file.endswith(".gz"),
+            record_offset=manifest.record_offset
+        )
+    else:
+        record_sink = DirectoryRecordSink(manifest.record_filename)
+
+    reporter = ProgressReporter(manifest.num_games - manifest.games_completed, interval=progress_interval)
+    with record_sink:
+        for i in range(manifest.games_completed, manifest.num_games):
+            record_text, score, is_board_cleared, num_moves = record_game(agent, seed=manifest.seed_for_game(i))
+            record_sink.write(i, record_text)
+            manifest.record_game(score, is_board_cleared)
+            reporter.record_game(score, is_board_cleared, num_moves)
+            if manifest.games_completed % checkpoint_interval == 0:
+                # the records must be saved before the manifest counts them
+                manifest.record_offset = record_sink.checkpoint()
+                manifest.save()
+        manifest.record_offset = record_sink.checkpoint()
+    manifest.save()
+    agent.close()
+
+    if metrics_file is None:
+        metrics_file = os.path.join(record_directory, "run_metrics.json")
+    reporter.finish(metrics_file)
 
 
 if __name__ == "__main__":
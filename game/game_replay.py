@@ -0,0 +1,263 @@
+import ast
+import csv
+import os
+import random
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from gamestate import INITIAL_PILE_SIZES, MAX_DISCARD_REMAINING, GameState, piles_to_mask
+from record_sink import open_records
+
+# line formats written by game_recorder.py
+BOARD_PATTERN = re.compile(r"^(.*) ; Discards = (\d+), Lucky suit = (\w)$")
+TURN_PATTERN = re.compile(r"^Turn (\d+): (.*), (-?[\d.]+)$")
+GAME_OVER_PATTERN = re.compile(r"^Game over, final score = (-?[\d.]+), table cleared = (True|False)$")
+
+# other files in a record directory (e.g. the run manifest) are skipped
+RECORD_EXTENSIONS = (".txt", ".txt.gz")
+
+TURN_FIELDS = ["game", "turn", "board", "pile_sizes", "mask", "reward", "error"]
+
+
+def parse_board(board_str):
+    """
+    Parses a board line written by game_recorder.short_repr_gamestate, e.g.
+    "Ad 5d 2d / 3h 9d 7c / 8h -- 6d ; Discards = 2, Lucky suit = c"
+
+    Returns: (upcards, discards_remaining, lucky_suit) - upcards is a 3x3 list
+    of card strings, with None for the empty piles
+    """
+    match = BOARD_PATTERN.match(board_str.strip())
+    if match is None:
+        raise ValueError(f"Invalid board line: {board_str!r}")
+    rows = match.group(1).split(" / ")
+    assert len(rows) == 3
+    upcards = []
+    for row in rows:
+        row_upcards = [None if card_str == "--" else card_str for card_str in row.split()]
+        assert len(row_upcards) == 3
+        upcards.append(row_upcards)
+    return (upcards, int(match.group(2)), match.group(3))
+
+
+def parse_records(lines):
+    """
+    Streaming parser for game records: lines can come from one record file or
+    from many records written one after another.
+
+    Yields: a dict for each complete game, with the initial "board" (as
+    returned by parse_board), a list of "turns" as (turn_num, piles, reward,
+    board) tuples, the "final_score" and whether the table was "cleared"
+    """
+    game = None
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        turn_match = TURN_PATTERN.match(line)
+        game_over_match = GAME_OVER_PATTERN.match(line)
+        if turn_match is not None:
+            assert game is not None, f"Turn without a board: {line!r}"
+            piles = ast.literal_eval(turn_match.group(2))
+            game["turns"].append([int(turn_match.group(1)), piles, float(turn_match.group(3)), None])
+        elif game_over_match is not None:
+            assert game is not None, f"Game over without a board: {line!r}"
+            game["final_score"] = float(game_over_match.group(1))
+            game["cleared"] = game_over_match.group(2) == "True"
+            game["turns"] = [tuple(turn) for turn in game["turns"]]
+            yield game
+            game = None
+        else:
+            board = parse_board(line)
+            if game is None:
+                game = {"board": board, "turns": []}
+            else:
+                # the board after the last turn
+                game["turns"][-1][3] = board
+
+
+def _board_to_state(board, pile_sizes, dead_cards):
+    upcards, discards_remaining, lucky_suit = board
+    # the hidden cards don't matter for which moves are valid or their rewards
+    return GameState.from_board(
+        upcards=upcards, pile_sizes=pile_sizes, dead_cards=dead_cards, lucky_suit=lucky_suit,
+        discards_remaining=discards_remaining, rand_gen=random.Random(0)
+    )
+
+
+def verify_turn(board, pile_sizes, dead_cards, piles, reward, next_board):
+    """
+    Checks one turn of a game record against the game rules: the action must
+    be valid on the board, its reward must match, and the next board must only
+    differ in the piles of the action.
+
+    Returns: error - a description of the first problem found, or None
+    """
+    upcards, discards_remaining, lucky_suit = board
+    next_upcards, next_discards_remaining, next_lucky_suit = next_board
+    state = _board_to_state(board, pile_sizes, dead_cards)
+
+    mask = piles_to_mask(piles)
+    move_rewards = [move_reward for move_mask, move_reward in state.moves() if move_mask == mask]
+    if not move_rewards:
+        return f"invalid action {sorted(piles)}"
+    if reward not in move_rewards:
+        return f"reward {reward} doesn't match the action (expected one of {move_rewards})"
+
+    if len(piles) == 1:
+        expected_discards_remaining = discards_remaining - 1
+    else:
+        expected_discards_remaining = min(discards_remaining + 1, MAX_DISCARD_REMAINING)
+    if next_discards_remaining != expected_discards_remaining:
+        return f"discards remaining is {next_discards_remaining}, expected {expected_discards_remaining}"
+    if next_lucky_suit != lucky_suit:
+        return "lucky suit changed"
+
+    for r in range(3):
+        for c in range(3):
+            if (r, c) in piles:
+                if (pile_sizes[r][c] == 1) != (next_upcards[r][c] is None):
+                    return f"pile {(r, c)} should be {'empty' if pile_sizes[r][c] == 1 else 'non-empty'}"
+            elif next_upcards[r][c] != upcards[r][c]:
+                return f"pile {(r, c)} changed but isn't part of the action"
+    return None
+
+
+def replay_game(game, game_name=""):
+    """
+    Replays a parsed game record (see parse_records), verifying every turn.
+
+    Returns: (turn_rows, errors) - a dict (with the TURN_FIELDS keys) for each
+    turn, and a list of all the problems found
+    """
+    board = game["board"]
+    pile_sizes = [list(row) for row in INITIAL_PILE_SIZES]
+    dead_cards = set([])
+    score = 0
+    turn_rows = []
+    errors = []
+    for turn_num, piles, reward, next_board in game["turns"]:
+        dead_cards.update([card for row in board[0] for card in row if card is not None])
+        if next_board is None:
+            error = "missing board after the turn"
+        else:
+            error = verify_turn(board, pile_sizes, dead_cards, piles, reward, next_board)
+        if error is not None:
+            errors.append(f"{game_name} turn {turn_num}: {error}")
+        turn_rows.append({
+            "game": game_name,
+            "turn": turn_num,
+            "board": board,
+            "pile_sizes": [list(row) for row in pile_sizes],
+            "mask": piles_to_mask(piles),
+            "reward": reward,
+            "error": error,
+        })
+        if next_board is None:
+            break
+
+        score += reward
+        for r, c in piles:
+            pile_sizes[r][c] -= 1
+        board = next_board
+
+    if score != game["final_score"]:
+        errors.append(f"{game_name}: final score is {game['final_score']}, but the rewards add up to {score}")
+    cleared = all([pile_size == 0 for row in pile_sizes for pile_size in row])
+    if cleared != game["cleared"]:
+        errors.append(f"{game_name}: table cleared is {game['cleared']}, expected {cleared}")
+    elif not _board_to_state(board, pile_sizes, dead_cards).is_game_over():
+        errors.append(f"{game_name}: the game isn't over after the last turn")
+    return (turn_rows, errors)
+
+
+def replay_file(record_path, with_turns=False):
+    """
+    Replays and verifies every game in a record file (with one game per file,
+    or all the games of a run, optionally gzip-compressed).
+
+    Returns: a dict with the file's "scores", "clears", "num_turns" and
+    "errors", plus its per-turn data in "turns" if with_turns is True. If the
+    file can't be read to the end (e.g. it's truncated or malformed), "failed"
+    is True and the reason is in the errors, after the games before it
+    """
+    result = {"scores": [], "clears": [], "num_turns": 0, "errors": [], "turns": [], "failed": False}
+    try:
+        with open_records(record_path) as record_file:
+            for game_idx, game in enumerate(parse_records(record_file)):
+                game_name = f"{os.path.basename(record_path)}#{game_idx}"
+                turn_rows, errors = replay_game(game, game_name)
+                result["scores"].append(game["final_score"])
+                result["clears"].append(game["cleared"])
+                result["num_turns"] += len(turn_rows)
+                result["errors"].extend(errors)
+                if with_turns:
+                    result["turns"].extend(turn_rows)
+    except (ValueError, AssertionError, SyntaxError, OSError, EOFError) as e:
+        # (a truncated gzip file raises an EOFError, a corrupt one an OSError)
+        result["failed"] = True
+        result["errors"].append(f"{os.path.basename(record_path)}: can't read the records: {e!r}")
+    return result
+
+
+def replay_directory(record_directory, max_workers=None, with_turns=False):
+    """
+    Replays every record file in the directory in a process pool.
+
+    Yields: the result of replay_file for each file, in order
+    """
+    record_paths = sorted([
+        os.path.join(record_directory, f) for f in os.listdir(record_directory)
+        if os.path.isfile(os.path.join(record_directory, f)) and f.endswith(RECORD_EXTENSIONS)
+    ])
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    chunksize = max(1, len(record_paths) // (4 * max_workers))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(replay_file, record_paths, [with_turns] * len(record_paths), chunksize=chunksize)
+
+
+@click.command()
+@click.option(
+    "--record-directory", "-d", type=str, required=True,
+    help="Directory name where the game records have been saved"
+)
+@click.option("--workers", "-w", type=int, default=None, help="Number of worker processes")
+@click.option(
+    "--turns-output", "-o", type=str, default=None,
+    help="CSV file where the per-turn data of every game is written"
+)
+def main(record_directory: str, workers: int, turns_output: str):
+    num_games = 0
+    num_turns = 0
+    total_score = 0
+    num_errors = 0
+    num_failed = 0
+    turns_file = open(turns_output, "w", newline="") if turns_output else None
+    try:
+        if turns_file is not None:
+            turns_writer = csv.DictWriter(turns_file, fieldnames=TURN_FIELDS)
+            turns_writer.writeheader()
+        for result in replay_directory(record_directory, max_workers=workers, with_turns=turns_file is not None):
+            num_games += len(result["scores"])
+            num_turns += result["num_turns"]
+            total_score += sum(result["scores"])
+            num_errors += len(result["errors"])
+            num_failed += int(result["failed"])
+            for error in result["errors"]:
+                print(error)
+            if turns_file is not None:
+                turns_writer.writerows(result["turns"])
+    finally:
+        if turns_file is not None:
+            turns_file.close()
+
+    print(f"Replayed {num_games} games ({num_turns} turns), {num_errors} errors, {num_failed} unreadable files")
+    if num_games > 0:
+        print(f"Average Score = {total_score / num_games}")
+
+
+if __name__ == "__main__":
+    main()
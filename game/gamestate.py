@@ -1,8 +1,10 @@
+import array
+import hashlib
 import itertools
 import random
 from pprint import pprint
 
-from deck import SUITS, RANKS, Deck, card_to_int, int_to_card
+from deck import SUITS, RANKS, Deck, card_to_int, int_to_card, str_to_card
 import numpy as np
 
 INITAL_DISCARD_REMAINING = 2
@@ -19,6 +21,172 @@ QUAD_REWARD = 100
 STRAIGHT_FLUSH_REWARD = 150
 LUCKY_SUIT_MULTIPLIER = 2.0
 
+
+def piles_to_mask(piles):
+    # encodes a set of (r, c) pile locations as a 9-bit mask, with bit 3 * r + c
+    # set for each pile (a single pile is a discard, two or more piles are a hand)
+    mask = 0
+    for r, c in piles:
+        mask |= 1 << (3 * r + c)
+    return mask
+
+
+def mask_to_piles(mask):
+    return set([(pile_idx // 3, pile_idx % 3) for pile_idx in range(9) if mask & (1 << pile_idx)])
+
+
+# Tables over 9-bit pile masks, for finding the hands on a board from the masks
+# of the piles whose upcard has each rank and each suit, without creating any
+# Card objects or sets of pile locations.
+
+NUM_PILES = 9
+NUM_MASKS = 1 << NUM_PILES
+
+CARD_RANKS = [card_num % len(RANKS) for card_num in range(len(SUITS) * len(RANKS))]
+CARD_SUITS = [card_num // len(RANKS) for card_num in range(len(SUITS) * len(RANKS))]
+
+# the rank indexes in each straight (an ace can be low or high, but a straight can't wrap around)
+THREE_STRAIGHTS = [[(low + i) % len(RANKS) for i in range(3)] for low in range(len(RANKS) - 1)]
+FIVE_STRAIGHTS = [[(low + i) % len(RANKS) for i in range(5)] for low in range(len(RANKS) - 3)]
+
+POPCOUNT = [bin(mask).count("1") for mask in range(NUM_MASKS)]
+# the single-pile masks in each mask
+MASK_BITS = [[1 << pile_idx for pile_idx in range(NUM_PILES) if mask & (1 << pile_idx)] for mask in range(NUM_MASKS)]
+# a hand is valid if its piles are not all on the same row
+ROW_MASKS = [0b111, 0b111 << 3, 0b111 << 6]
+VALID_HAND = [
+    POPCOUNT[mask] > 1 and all([mask & ~row_mask != 0 for row_mask in ROW_MASKS])
+    for mask in range(NUM_MASKS)
+]
+
+
+def _submasks_of_size(mask, size):
+    return [submask for submask in range(NUM_MASKS) if submask & ~mask == 0 and POPCOUNT[submask] == size]
+
+
+# SUBMASKS[mask][size] lists the submasks of the mask with that many piles
+# (only needed up to 5 piles, since no hand has more than 5 cards)
+SUBMASKS = [[_submasks_of_size(mask, size) for size in range(6)] for mask in range(NUM_MASKS)]
+VALID_SUBMASKS = [[[submask for submask in submasks if VALID_HAND[submask]] for submasks in SUBMASKS[mask]]
+                  for mask in range(NUM_MASKS)]
+N_OF_A_KIND_REWARDS = {2: PAIR_REWARD, 3: TRIP_REWARD, 4: QUAD_REWARD}
+
+# Zobrist keys of the visible parts of a state (see SearchState.state_key),
+# from a fixed seed so that they are the same in every process and run
+_zobrist_rand_gen = random.Random(20240518)
+ZOBRIST_UPCARD = [[_zobrist_rand_gen.getrandbits(64) for card_num in range(len(CARD_RANKS))]
+                  for pile_idx in range(NUM_PILES)]
+ZOBRIST_PILE_SIZE = [[_zobrist_rand_gen.getrandbits(64) for pile_size in range(len(CARD_RANKS) + 1)]
+                     for pile_idx in range(NUM_PILES)]
+ZOBRIST_DEAD = [_zobrist_rand_gen.getrandbits(64) for card_num in range(len(CARD_RANKS))]
+ZOBRIST_DISCARDS = [_zobrist_rand_gen.getrandbits(64) for discards in range(MAX_DISCARD_REMAINING + 1)]
+ZOBRIST_LUCKY_SUIT = [_zobrist_rand_gen.getrandbits(64) for suit_idx in range(len(SUITS))]
+# keys of the cards in each pile, by their position from the bottom of the pile
+# (so the hidden cards too, see SearchState.search_key)
+ZOBRIST_CARD = [[[_zobrist_rand_gen.getrandbits(64) for card_num in range(len(CARD_RANKS))]
+                 for position in range(len(CARD_RANKS))] for pile_idx in range(NUM_PILES)]
+
+
+def _bonus_key(pile_bonuses):
+    key_nums = array.array("i", [int(bonus) for bonus in pile_bonuses])
+    digest = hashlib.blake2b(key_nums.tobytes(), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+_mask_bonus_cache = {}
+
+
+def mask_bonuses(pile_bonuses):
+    # mask_bonus[mask] = the total clear bonus of the piles in the mask (the
+    # tables are shared, since the bonuses are almost always the same)
+    pile_bonuses = tuple(pile_bonuses)
+    if pile_bonuses not in _mask_bonus_cache:
+        mask_bonus = [0] * NUM_MASKS
+        for mask in range(1, NUM_MASKS):
+            low_bit = mask & -mask
+            mask_bonus[mask] = mask_bonus[mask ^ low_bit] + pile_bonuses[low_bit.bit_length() - 1]
+        _mask_bonus_cache[pile_bonuses] = mask_bonus
+    return _mask_bonus_cache[pile_bonuses]
+
+
+def hand_moves(rank_masks, suit_masks, single_mask, lucky_suit_idx, mask_bonus, best_only):
+    """
+    Finds the hands that can be made from the upcards, given the mask of the
+    piles whose upcard has each rank and each suit, and the mask of the piles
+    with one card left (which are cleared by a hand).
+
+    Returns: if best_only, [(mask, reward)] for the first hand with the highest
+    reward (or [] if there are no hands), otherwise (mask, reward) for every hand
+    """
+    lucky_mask = suit_masks[lucky_suit_idx]
+    hands = []
+    best_reward = -1
+
+    def add_hand(mask, base_reward):
+        nonlocal best_reward
+        reward = base_reward
+        if mask & lucky_mask:
+            reward *= LUCKY_SUIT_MULTIPLIER
+        reward += mask_bonus[mask & single_mask]
+        if not best_only:
+            hands.append((mask, reward))
+        elif reward > best_reward:
+            best_reward = reward
+            hands[:] = [(mask, reward)]
+
+    # pairs, trips and quads
+    multiple_rank_masks = [rank_mask for rank_mask in rank_masks if POPCOUNT[rank_mask] > 1]
+    for rank_mask in multiple_rank_masks:
+        for size in range(2, POPCOUNT[rank_mask] + 1):
+            for mask in VALID_SUBMASKS[rank_mask][size]:
+                add_hand(mask, N_OF_A_KIND_REWARDS[size])
+
+    # full houses
+    for trip_rank_mask in multiple_rank_masks:
+        if POPCOUNT[trip_rank_mask] < 3:
+            continue
+        for pair_rank_mask in multiple_rank_masks:
+            if pair_rank_mask == trip_rank_mask:
+                continue
+            for trip_mask in SUBMASKS[trip_rank_mask][3]:
+                for pair_mask in SUBMASKS[pair_rank_mask][2]:
+                    if VALID_HAND[trip_mask | pair_mask]:
+                        add_hand(trip_mask | pair_mask, FULL_HOUSE_REWARD)
+
+    # 3-straights
+    for rank_a, rank_b, rank_c in THREE_STRAIGHTS:
+        if rank_masks[rank_a] and rank_masks[rank_b] and rank_masks[rank_c]:
+            for bit_a in MASK_BITS[rank_masks[rank_a]]:
+                for bit_b in MASK_BITS[rank_masks[rank_b]]:
+                    for bit_c in MASK_BITS[rank_masks[rank_c]]:
+                        mask = bit_a | bit_b | bit_c
+                        if VALID_HAND[mask]:
+                            add_hand(mask, THREE_STRAIGHT_REWARD)
+
+    # 5-straights and straight flushes (there are always at least two rows in
+    # a 5-card hand, so they are all valid)
+    for straight in FIVE_STRAIGHTS:
+        straight_rank_masks = [rank_masks[rank] for rank in straight]
+        if not all(straight_rank_masks):
+            continue
+        for bit_a in MASK_BITS[straight_rank_masks[0]]:
+            for bit_b in MASK_BITS[straight_rank_masks[1]]:
+                for bit_c in MASK_BITS[straight_rank_masks[2]]:
+                    for bit_d in MASK_BITS[straight_rank_masks[3]]:
+                        for bit_e in MASK_BITS[straight_rank_masks[4]]:
+                            mask = bit_a | bit_b | bit_c | bit_d | bit_e
+                            add_hand(mask, FIVE_STRAIGHT_REWARD)
+                            if any([suit_mask & mask == mask for suit_mask in suit_masks]):
+                                add_hand(mask, STRAIGHT_FLUSH_REWARD)
+
+    # flushes
+    for suit_mask in suit_masks:
+        if POPCOUNT[suit_mask] >= 5:
+            for mask in SUBMASKS[suit_mask][5]:
+                add_hand(mask, FLUSH_REWARD)
+
+    return hands
+
 class GameState:
     def __init__(self):
         self.card_num_piles = [[[] for c in range(3)] for r in range(3)]
@@ -68,6 +236,51 @@ class GameState:
         self.dead_card_nums = set([card_to_int(lucky_card)])
         self.dead_card_nums.update(upcard_nums)
 
+    @classmethod
+    def from_board(cls, upcards, pile_sizes, dead_cards, lucky_suit, discards_remaining,
+                   pile_clear_bonus=None, rand_gen=None):
+        """
+        Builds a game state from what a player can see on the table: the upcard
+        and size of each pile, the dead cards, the lucky suit and the number of
+        discards remaining. Cards are given as strings (e.g. "Ks"), with None
+        for the upcard of an empty pile.
+
+        The hidden cards in each pile are unknown, so they are sampled (using
+        rand_gen, a random.Random) from the cards that are not dead.
+
+        Returns: state - the new game state
+        """
+        if rand_gen is None:
+            rand_gen = random.Random()
+        if pile_clear_bonus is None:
+            pile_clear_bonus = PILE_CLEAR_BONUSES
+
+        state = cls()
+        state.lucky_suit_idx = SUITS.index(lucky_suit)
+        state.lucky_suit = lucky_suit
+        state.discards_remaining = discards_remaining
+        state.pile_clear_bonus = [[pile_clear_bonus[r][c] for c in range(3)] for r in range(3)]
+
+        state.dead_card_nums = set([card_to_int(str_to_card(card)) for card in dead_cards])
+        for r in range(3):
+            for c in range(3):
+                if pile_sizes[r][c] > 0:
+                    assert upcards[r][c] is not None
+                    state.dead_card_nums.add(card_to_int(str_to_card(upcards[r][c])))
+
+        unseen_card_nums = [card_num for card_num in range(len(SUITS) * len(RANKS))
+                            if card_num not in state.dead_card_nums]
+        rand_gen.shuffle(unseen_card_nums)
+        for r in range(3):
+            for c in range(3):
+                if pile_sizes[r][c] > 0:
+                    num_hidden = pile_sizes[r][c] - 1
+                    assert num_hidden <= len(unseen_card_nums)
+                    upcard_num = card_to_int(str_to_card(upcards[r][c]))
+                    state.card_num_piles[r][c] = [upcard_num] + unseen_card_nums[:num_hidden]
+                    unseen_card_nums = unseen_card_nums[num_hidden:]
+        return state
+
     def __eq__(self, other):
         return (
             self.card_num_piles == other.card_num_piles and
@@ -93,6 +306,27 @@ class GameState:
             frozenset(self.dead_card_nums)
         ))
 
+    def state_key(self):
+        """
+        Returns a 64-bit key of what a player can see of the game state: the
+        upcard and size of each pile, the pile clear bonuses, the lucky suit,
+        the number of discards remaining and the dead cards. The hidden cards
+        are not part of the key, so all the states in an information set
+        (e.g. the determinizations of a state) have the same key. Unlike
+        __hash__, the key is stable across processes and runs, for use in
+        persistent or shared tables.
+        """
+        return SearchState(self).state_key()
+
+    def search_key(self):
+        """
+        Returns a 64-bit key of the whole game state, like state_key but with
+        the order of the cards in every pile (including the hidden cards). The
+        search tables are keyed by it, since a search of a determinization
+        finds the value of that one order of the hidden cards.
+        """
+        return SearchState(self).search_key()
+
     def is_game_over(self):
         if self.discards_remaining > 0:
             for r in range(3):
@@ -114,7 +348,7 @@ class GameState:
             return True
 
         # check whether there are any actions available
-        return len(self.actions()) == 0
+        return len(self.moves()) == 0
 
     def pile_sizes(self):
         sizes = np.zeros((3, 3))
@@ -126,6 +360,10 @@ class GameState:
     def is_pile_empty(self, r, c):
         return len(self.card_num_piles[r][c]) == 0
 
+    def num_cards(self):
+        # number of cards left in all the piles
+        return sum([len(self.card_num_piles[r][c]) for r in range(3) for c in range(3)])
+
     def is_board_empty(self):
         for r in range(3):
             for c in range(3):
@@ -203,6 +441,24 @@ class GameState:
         new_state.dead_card_nums = set(list(self.dead_card_nums))
         return new_state
 
+    def determinize(self, rand_gen):
+        """
+        Returns a copy of the state where the hidden cards (all but the upcard
+        of each pile) are resampled, using rand_gen (a random.Random), from the
+        cards that are not dead. A player can't tell the copy from this state.
+        """
+        new_state = self.copy()
+        unseen_card_nums = [card_num for card_num in range(len(SUITS) * len(RANKS))
+                            if card_num not in self.dead_card_nums]
+        rand_gen.shuffle(unseen_card_nums)
+        for r in range(3):
+            for c in range(3):
+                num_hidden = len(self.card_num_piles[r][c]) - 1
+                if num_hidden > 0:
+                    new_state.card_num_piles[r][c][1:] = unseen_card_nums[:num_hidden]
+                    unseen_card_nums = unseen_card_nums[num_hidden:]
+        return new_state
+
     def discard_from_pile(self, r, c):
         """
         One of the possible actions: discards a card from the chosen pile.
@@ -582,86 +838,195 @@ class GameState:
 
     def actions(self):
         action_state_rewards = []
-        if self.discards_remaining > 0:
-            # can discard from each pile with at least one card in it
-            for r in range(3):
-                for c in range(3):
-                    if not self.is_pile_empty(r, c):
-                        new_state, reward = self.discard_from_pile(r, c)
-                        action_state_rewards.append((set([(r, c)]), new_state, reward))
+        # the moves are found with the pile mask tables, so that actions() and
+        # moves() list them in the same order
+        for mask, reward in self.moves():
+            piles = mask_to_piles(mask)
+            if POPCOUNT[mask] == 1:
+                # a discard from the pile
+                r, c = next(iter(piles))
+                new_state, _ = self.discard_from_pile(r, c)
+            else:
+                new_state = self.make_hand(piles)
+            action_state_rewards.append((piles, new_state, reward))
 
-        # if the only non-empty piles are all in one row, there are no valid hands
-        non_empty_rows = set([])
-        for r in range(3):
-            for c in range(3):
-                if len(self.card_num_piles[r][c]) > 0:
-                    non_empty_rows.add(r)
-        if len(non_empty_rows) == 1:
-            return action_state_rewards
+        return action_state_rewards
 
-        # TODO is it more efficient to just brute force check different combinations of 1, 2, 3, 4, or 5 piles?
-        # probably only if the number of piles is low and if there's only two rows with non-empty piles
+    def moves(self):
+        """
+        The same actions as actions(), in the same order, but without creating
+        the successor states (see SearchState to make moves in place).
 
-        # generate filters for upcard ranks & suits
-        upcard_nums = self.upcard_nums()
-        # upcard_rank_idxs = np.zeros((3, 3)) - 1
-        # upcard_suit_idxs = np.zeros((3, 3)) - 1
-        # for r in range(3):
-        #     for c in range(3):
-        #         upcard = int_to_card(upcard_nums[r][c])
-        #         if upcard is not None:
-        #             upcard_rank_idxs[r, c] = upcard.rank_idx()
-        #             upcard_suit_idxs[r, c] = upcard.suit_idx()
-
-        # generate a list of possible hands given the current board state
-        # and for each hand, generate the (hand locations, successor state, reward) tuple
-
-        pair_hands = self._get_pair_hands()
-        for hand_piles in pair_hands:
-            new_state = self.make_hand(hand_piles)
-            reward = self._get_hand_reward(hand_piles, PAIR_REWARD)
-            action_state_rewards.append((hand_piles, new_state, reward))
-
-        trip_hands = self._get_trip_hands()
-        for hand_piles in trip_hands:
-            new_state = self.make_hand(hand_piles)
-            reward = self._get_hand_reward(hand_piles, TRIP_REWARD)
-            action_state_rewards.append((hand_piles, new_state, reward))
-
-        quad_hands = self._get_quad_hands()
-        for hand_piles in quad_hands:
-            new_state = self.make_hand(hand_piles)
-            reward = self._get_hand_reward(hand_piles, QUAD_REWARD)
-            action_state_rewards.append((hand_piles, new_state, reward))
-
-        full_house_hands = self._get_full_house_hands()
-        for hand_piles in full_house_hands:
-            new_state = self.make_hand(hand_piles)
-            reward = self._get_hand_reward(hand_piles, FULL_HOUSE_REWARD)
-            action_state_rewards.append((hand_piles, new_state, reward))
-
-        sm_straight_hands = self._get_sm_straight_hands()
-        for hand_piles in sm_straight_hands:
-            new_state = self.make_hand(hand_piles)
-            reward = self._get_hand_reward(hand_piles, THREE_STRAIGHT_REWARD)
-            action_state_rewards.append((hand_piles, new_state, reward))
+        Returns: a list of (mask, reward) tuples, where mask is the pile mask of
+        the action (see piles_to_mask)
+        """
+        return SearchState(self).moves()
+
+
+class SearchState:
+    """
+    A copy of a game state for searching by making and unmaking moves in place
+    (see do_move and undo_move), which doesn't allocate any cards, sets or
+    states per move.
+
+    The cards of all the piles are kept in one fixed list, where pile i holds
+    cards[pile_tops[i]:pile_ends[i]] (upcard first), so taking a card off a pile
+    only moves its top index. The hands are found with the pile mask tables
+    from the masks of the piles whose upcard has each rank and suit, which are
+    updated as the upcards change, and the dead cards are a 52-bit mask.
+    """
+    def __init__(self, state):
+        self.cards = []
+        self.pile_tops = [0] * NUM_PILES
+        self.pile_ends = [0] * NUM_PILES
+        self.pile_bonuses = [0] * NUM_PILES
+        for pile_idx in range(NUM_PILES):
+            r, c = pile_idx // 3, pile_idx % 3
+            self.pile_tops[pile_idx] = len(self.cards)
+            self.cards.extend(state.card_num_piles[r][c])
+            self.pile_ends[pile_idx] = len(self.cards)
+            self.pile_bonuses[pile_idx] = state.pile_clear_bonus[r][c] or 0
+        self.mask_bonus = mask_bonuses(self.pile_bonuses)
+
+        self.rank_masks = [0] * len(RANKS)
+        self.suit_masks = [0] * len(SUITS)
+        self.non_empty_mask = 0
+        self.single_mask = 0
+        for pile_idx in range(NUM_PILES):
+            pile_size = self.pile_ends[pile_idx] - self.pile_tops[pile_idx]
+            if pile_size > 0:
+                upcard_num = self.cards[self.pile_tops[pile_idx]]
+                self.rank_masks[CARD_RANKS[upcard_num]] |= 1 << pile_idx
+                self.suit_masks[CARD_SUITS[upcard_num]] |= 1 << pile_idx
+                self.non_empty_mask |= 1 << pile_idx
+            if pile_size == 1:
+                self.single_mask |= 1 << pile_idx
+
+        self.lucky_suit_idx = state.lucky_suit_idx
+        self.discards_remaining = state.discards_remaining
+        self.dead_mask = 0
+        for card_num in state.dead_card_nums:
+            self.dead_mask |= 1 << card_num
+        self.cards_left = len(self.cards)
+
+        # the Zobrist key of the visible parts of the state, updated by each move
+        self.key = _bonus_key(self.pile_bonuses) ^ ZOBRIST_LUCKY_SUIT[self.lucky_suit_idx]
+        self.key ^= ZOBRIST_DISCARDS[self.discards_remaining]
+        for pile_idx in range(NUM_PILES):
+            pile_size = self.pile_ends[pile_idx] - self.pile_tops[pile_idx]
+            self.key ^= ZOBRIST_PILE_SIZE[pile_idx][pile_size]
+            if pile_size > 0:
+                self.key ^= ZOBRIST_UPCARD[pile_idx][self.cards[self.pile_tops[pile_idx]]]
+        for card_num in state.dead_card_nums:
+            self.key ^= ZOBRIST_DEAD[card_num]
+        # the Zobrist key of the order of the cards in the piles
+        self.cards_key = 0
+        for pile_idx in range(NUM_PILES):
+            pile_end = self.pile_ends[pile_idx]
+            for idx in range(self.pile_tops[pile_idx], pile_end):
+                self.cards_key ^= ZOBRIST_CARD[pile_idx][pile_end - 1 - idx][self.cards[idx]]
+
+    def num_cards(self):
+        return self.cards_left
+
+    def to_game_state(self):
+        state = GameState()
+        for pile_idx in range(NUM_PILES):
+            r, c = pile_idx // 3, pile_idx % 3
+            state.card_num_piles[r][c] = self.cards[self.pile_tops[pile_idx]:self.pile_ends[pile_idx]]
+            state.pile_clear_bonus[r][c] = self.pile_bonuses[pile_idx]
+        state.lucky_suit_idx = self.lucky_suit_idx
+        state.lucky_suit = SUITS[self.lucky_suit_idx]
+        state.discards_remaining = self.discards_remaining
+        state.dead_card_nums = set([card_num for card_num in range(len(CARD_RANKS)) if self.dead_mask & (1 << card_num)])
+        return state
+
+    def state_key(self):
+        # see GameState.state_key
+        return self.key
+
+    def search_key(self):
+        # see GameState.search_key
+        return self.key ^ self.cards_key
+
+    def moves(self):
+        """
+        Returns: the (mask, reward) of every move, like GameState.moves()
+        """
+        mask_rewards = []
+        if self.discards_remaining > 0:
+            for pile_bit in MASK_BITS[self.non_empty_mask]:
+                mask_rewards.append((pile_bit, self.mask_bonus[pile_bit & self.single_mask]))
+        mask_rewards.extend(hand_moves(
+            self.rank_masks, self.suit_masks, self.single_mask, self.lucky_suit_idx, self.mask_bonus, False
+        ))
+        return mask_rewards
 
-        lg_straight_hands = self._get_lg_straight_hands()
-        for hand_piles in lg_straight_hands:
-            new_state = self.make_hand(hand_piles)
-            reward = self._get_hand_reward(hand_piles, FIVE_STRAIGHT_REWARD)
-            action_state_rewards.append((hand_piles, new_state, reward))
-
-        flush_hands = self._get_flush_hands()
-        for hand_piles in flush_hands:
-            new_state = self.make_hand(hand_piles)
-            reward = self._get_hand_reward(hand_piles, FLUSH_REWARD)
-            action_state_rewards.append((hand_piles, new_state, reward))
-
-        straight_flush_hands = self._get_straight_flush_hands()
-        for hand_piles in straight_flush_hands:
-            new_state = self.make_hand(hand_piles)
-            reward = self._get_hand_reward(hand_piles, STRAIGHT_FLUSH_REWARD)
-            action_state_rewards.append((hand_piles, new_state, reward))
+    def do_move(self, mask):
+        """
+        Makes the move with the given pile mask (a discard if the mask has one
+        pile, otherwise a hand) in place. This function assumes the move is
+        valid, e.g. one of the masks from moves().
 
-        return action_state_rewards
+        Returns: token - pass it to undo_move to restore the state exactly
+        """
+        token = (mask, self.discards_remaining, self.dead_mask, self.key, self.cards_key)
+        key = self.key ^ ZOBRIST_DISCARDS[self.discards_remaining]
+        if POPCOUNT[mask] == 1:
+            self.discards_remaining -= 1
+        else:
+            self.discards_remaining = min(self.discards_remaining + 1, MAX_DISCARD_REMAINING)
+        key ^= ZOBRIST_DISCARDS[self.discards_remaining]
+
+        cards = self.cards
+        for pile_bit in MASK_BITS[mask]:
+            pile_idx = pile_bit.bit_length() - 1
+            top = self.pile_tops[pile_idx]
+            card_num = cards[top]
+            self.rank_masks[CARD_RANKS[card_num]] ^= pile_bit
+            self.suit_masks[CARD_SUITS[card_num]] ^= pile_bit
+            top += 1
+            self.pile_tops[pile_idx] = top
+            pile_size = self.pile_ends[pile_idx] - top
+            key ^= ZOBRIST_UPCARD[pile_idx][card_num]
+            key ^= ZOBRIST_PILE_SIZE[pile_idx][pile_size + 1] ^ ZOBRIST_PILE_SIZE[pile_idx][pile_size]
+            self.cards_key ^= ZOBRIST_CARD[pile_idx][pile_size][card_num]
+            if pile_size == 0:
+                self.non_empty_mask ^= pile_bit
+                self.single_mask ^= pile_bit
+            else:
+                # the revealed upcard is added to the dead cards
+                card_num = cards[top]
+                self.rank_masks[CARD_RANKS[card_num]] |= pile_bit
+                self.suit_masks[CARD_SUITS[card_num]] |= pile_bit
+                key ^= ZOBRIST_UPCARD[pile_idx][card_num]
+                if not self.dead_mask & (1 << card_num):
+                    self.dead_mask |= 1 << card_num
+                    key ^= ZOBRIST_DEAD[card_num]
+                if pile_size == 1:
+                    self.single_mask |= pile_bit
+        self.cards_left -= POPCOUNT[mask]
+        self.key = key
+        return token
+
+    def undo_move(self, token):
+        mask, self.discards_remaining, self.dead_mask, self.key, self.cards_key = token
+        cards = self.cards
+        for pile_bit in MASK_BITS[mask]:
+            pile_idx = pile_bit.bit_length() - 1
+            top = self.pile_tops[pile_idx]
+            if top < self.pile_ends[pile_idx]:
+                card_num = cards[top]
+                self.rank_masks[CARD_RANKS[card_num]] ^= pile_bit
+                self.suit_masks[CARD_SUITS[card_num]] ^= pile_bit
+            top -= 1
+            self.pile_tops[pile_idx] = top
+            card_num = cards[top]
+            self.rank_masks[CARD_RANKS[card_num]] |= pile_bit
+            self.suit_masks[CARD_SUITS[card_num]] |= pile_bit
+            self.non_empty_mask |= pile_bit
+            if self.pile_ends[pile_idx] - top == 1:
+                self.single_mask |= pile_bit
+            else:
+                self.single_mask &= ~pile_bit
+        self.cards_left += POPCOUNT[mask]
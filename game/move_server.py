@@ -0,0 +1,263 @@
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from agent import AGENT_TYPES
+from gamestate import GameState
+
+DEFAULT_SOCKET_PATH = "/tmp/sage-solitaire-bot.sock"
+DEFAULT_DEADLINE = 5.0
+LATENCY_WINDOW = 1000
+# agent types whose search takes a time limit (and a seed)
+TIMED_AGENT_TYPES = set(["search", "iterative"])
+# seconds of a request's deadline that are left for sending the result back
+# from the worker
+DEADLINE_MARGIN = 0.05
+
+
+def recommend_action(agent_type, board, seed=None, end_time=None):
+    """
+    Runs in a worker process: rebuilds the game state from the board and asks
+    an agent of the given type to choose an action. If the request has a
+    deadline (end_time, a time.time() value), the search of a timed agent type
+    is limited to the time left until then.
+
+    The board is a dict with the keys "upcards", "pile_sizes", "dead_cards",
+    "lucky_suit" and "discards_remaining" (see GameState.from_board), and
+    optionally "pile_clear_bonus".
+
+    Returns: a dict with the chosen piles and the reward for the action (or
+    None for the piles if the game is over)
+    """
+    state = GameState.from_board(
+        upcards=board["upcards"],
+        pile_sizes=board["pile_sizes"],
+        dead_cards=board.get("dead_cards", []),
+        lucky_suit=board["lucky_suit"],
+        discards_remaining=board["discards_remaining"],
+        pile_clear_bonus=board.get("pile_clear_bonus"),
+        rand_gen=random.Random(seed),
+    )
+    if state.is_game_over():
+        return {"piles": None, "reward": 0}
+
+    agent_kwargs = {}
+    if agent_type in TIMED_AGENT_TYPES:
+        agent_kwargs["seed"] = seed
+        if end_time is not None:
+            agent_kwargs["time_limit"] = max(0.0, end_time - time.time() - DEADLINE_MARGIN)
+    agent = AGENT_TYPES[agent_type](**agent_kwargs)
+    try:
+        piles, next_state, reward = agent.choose_action(state)
+    finally:
+        agent.close()
+    return {"piles": sorted([list(pile) for pile in piles]), "reward": reward}
+
+
+class LatencyMetrics:
+    """
+    Request counters and a sliding window of the most recent request latencies.
+    """
+    def __init__(self, window=LATENCY_WINDOW):
+        self.num_requests = 0
+        self.num_errors = 0
+        self.num_timeouts = 0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, latency, error=False, timeout=False):
+        self.num_requests += 1
+        if error:
+            self.num_errors += 1
+        if timeout:
+            self.num_timeouts += 1
+        self.latencies.append(latency)
+
+    def snapshot(self):
+        latencies = sorted(self.latencies)
+        snapshot = {
+            "requests": self.num_requests,
+            "errors": self.num_errors,
+            "timeouts": self.num_timeouts,
+        }
+        if latencies:
+            snapshot["mean_ms"] = 1000 * sum(latencies) / len(latencies)
+            for percentile in [50, 95, 99]:
+                idx = min(len(latencies) - 1, int(len(latencies) * percentile / 100))
+                snapshot[f"p{percentile}_ms"] = 1000 * latencies[idx]
+            snapshot["max_ms"] = 1000 * latencies[-1]
+        return snapshot
+
+
+class MoveServer:
+    """
+    Serves move recommendations as line-delimited JSON. Each request is one
+    line, e.g.
+
+        {"id": 1, "agent": "greedy", "deadline": 0.5, "board": {...}}
+
+    and gets a response line with the same id, either {"id", "piles", "reward",
+    "latency_ms"} or {"id", "error"}. A request {"type": "metrics"} returns the
+    latency metrics instead.
+
+    The agents run in a process pool so that the event loop never blocks, and
+    requests on a connection are handled concurrently (responses may be sent
+    out of order, use the id to match them up).
+    """
+    def __init__(self, agent_type="greedy", max_workers=None, deadline=DEFAULT_DEADLINE):
+        assert agent_type in AGENT_TYPES
+        self.agent_type = agent_type
+        self.deadline = deadline
+        self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        self.metrics = LatencyMetrics()
+        self.server = None
+
+    async def start_unix(self, socket_path=DEFAULT_SOCKET_PATH):
+        self.server = await asyncio.start_unix_server(self.handle_connection, path=socket_path)
+        return self.server
+
+    async def start_tcp(self, host="127.0.0.1", port=8765):
+        self.server = await asyncio.start_server(self.handle_connection, host=host, port=port)
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def handle_connection(self, reader, writer):
+        write_lock = asyncio.Lock()
+        tasks = set([])
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self._respond(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+
+    async def _respond(self, line, writer, write_lock):
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            response = {"id": None, "error": f"Invalid JSON: {e}"}
+            self.metrics.record(0.0, error=True)
+        else:
+            response = await self.handle_request(request)
+
+        async with write_lock:
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+
+    def _request_error(self, request):
+        """
+        Returns: why the request can't be served, or None if it's valid
+        """
+        if not isinstance(request, dict):
+            return "Request must be a JSON object"
+        agent_type = request.get("agent", self.agent_type)
+        if not isinstance(agent_type, str) or agent_type not in AGENT_TYPES:
+            return f"Unknown agent type {agent_type}"
+        if not isinstance(request.get("board"), dict):
+            return "Missing board" if "board" not in request else "Board must be a JSON object"
+        deadline = request.get("deadline", self.deadline)
+        if isinstance(deadline, bool) or not isinstance(deadline, (int, float)):
+            return f"Invalid deadline {deadline}"
+        return None
+
+    async def handle_request(self, request):
+        if isinstance(request, dict) and request.get("type") == "metrics":
+            return {"id": request.get("id"), "metrics": self.metrics.snapshot()}
+
+        # every request gets a response and is counted in the metrics, even if
+        # it's invalid or the worker fails
+        response = {"id": request.get("id") if isinstance(request, dict) else None}
+        start_time = time.perf_counter()
+        timed_out = False
+        error = self._request_error(request)
+        if error is not None:
+            response["error"] = error
+        else:
+            agent_type = request.get("agent", self.agent_type)
+            deadline = request.get("deadline", self.deadline)
+            loop = asyncio.get_running_loop()
+            # the deadline is passed to the worker, so that the search stops in
+            # time and doesn't keep the worker busy after the request times out
+            end_time = time.time() + deadline
+            try:
+                result = await asyncio.wait_for(
+                    loop.run_in_executor(
+                        self.executor, recommend_action, agent_type, request["board"], request.get("seed"), end_time
+                    ),
+                    timeout=deadline,
+                )
+                response.update(result)
+            except asyncio.TimeoutError:
+                timed_out = True
+                response["error"] = f"Deadline of {deadline}s exceeded"
+            except (KeyError, AssertionError, ValueError) as e:
+                response["error"] = f"Invalid board: {e!r}"
+            except Exception as e:
+                # e.g. a TypeError or AttributeError from a board with the
+                # wrong types, or a BrokenProcessPool if a worker died
+                response["error"] = f"Failed to recommend an action: {e!r}"
+
+        latency = time.perf_counter() - start_time
+        self.metrics.record(latency, error="error" in response, timeout=timed_out)
+        response["latency_ms"] = 1000 * latency
+        return response
+
+
+async def serve(server, socket_path, port):
+    if port is not None:
+        await server.start_tcp(port=port)
+        print(f"Serving move recommendations on 127.0.0.1:{port}")
+    else:
+        await server.start_unix(socket_path)
+        print(f"Serving move recommendations on {socket_path}")
+    try:
+        await server.server.serve_forever()
+    finally:
+        print(f"Metrics: {server.metrics.snapshot()}")
+        await server.close()
+
+
+@click.command()
+@click.option(
+    "--socket-path", "-s", type=str, default=DEFAULT_SOCKET_PATH,
+    help="Path of the Unix socket to listen on"
+)
+@click.option(
+    "--port", "-p", type=int, default=None,
+    help="Listen on this TCP port on localhost instead of a Unix socket"
+)
+@click.option(
+    "--agent-type", "-a", type=click.Choice(list(AGENT_TYPES)), default="greedy",
+    help="Type of agent used when a request doesn't specify one, see game/agent.py for details"
+)
+@click.option("--workers", "-w", type=int, default=None, help="Number of worker processes")
+@click.option(
+    "--deadline", type=float, default=DEFAULT_DEADLINE,
+    help="Default per-request deadline in seconds"
+)
+def main(socket_path: str, port: int, agent_type: str, workers: int, deadline: float):
+    server = MoveServer(agent_type=agent_type, max_workers=workers, deadline=deadline)
+    try:
+        asyncio.run(serve(server, socket_path, port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import json
+import os
+import random
+
+import click
+import numpy as np
+from bitboard import DIRS, move_tiles, spawn_tile, transpose
+
+# An n-tuple network value function for 2048 boards (packed as in bitboard.py):
+# each tuple of cells has a lookup table with a weight for every combination
+# of the log2 tile values in those cells, and a board's value is the sum of
+# the weights of its tuples, over the 8 rotations/reflections of the board
+# (so the tables are shared by symmetric tuples).
+
+# rows and 2x2 squares (cell index 4 * i + j)
+DEFAULT_TUPLES = [(0, 1, 2, 3), (4, 5, 6, 7), (0, 1, 4, 5), (1, 2, 5, 6), (5, 6, 9, 10)]
+DEFAULT_LEARNING_RATE = 0.1
+WEIGHTS_FILENAME = "weights.npy"
+TUPLES_FILENAME = "tuples.json"
+
+
+def _flip_rows(board):
+    # reverses the cells of each row
+    return (
+        ((board & 0x000F000F000F000F) << 12) | ((board & 0x00F000F000F000F0) << 4)
+        | ((board & 0x0F000F000F000F00) >> 4) | ((board & 0xF000F000F000F000) >> 12)
+    )
+
+
+def _flip_columns(board):
+    # reverses the order of the rows
+    return (
+        ((board & 0xFFFF) << 48) | ((board & 0xFFFF0000) << 16)
+        | ((board >> 16) & 0xFFFF0000) | (board >> 48)
+    )
+
+
+def symmetries(board):
+    """
+    Returns: the 8 rotations/reflections of the board
+    """
+    transposed = transpose(board)
+    boards = []
+    for sym_board in (board, transposed):
+        flipped_rows = _flip_rows(sym_board)
+        boards.extend([sym_board, flipped_rows, _flip_columns(sym_board), _flip_columns(flipped_rows)])
+    return boards
+
+
+def _tuple_runs(cells):
+    # the table index of a tuple is the nibbles of its (sorted) cells, so
+    # runs of adjacent cells can be extracted with one shift and mask each:
+    # returns a list of (right shift, mask) pairs
+    runs = []
+    for pos, cell in enumerate(sorted(cells)):
+        shift = 4 * (cell - pos)
+        if runs and runs[-1][0] == shift:
+            runs[-1] = (shift, runs[-1][1] | (0xF << (4 * pos)))
+        else:
+            runs.append((shift, 0xF << (4 * pos)))
+    return runs
+
+
+class NTupleNetwork:
+    """
+    N-tuple network with a lookup table of 16 ** len(tuple) weights per tuple
+    (all the tuples have the same length, so the tables are one 2D array).
+    """
+    def __init__(self, tuples=DEFAULT_TUPLES, weights=None):
+        self.tuples = [tuple(cells) for cells in tuples]
+        tuple_len = len(self.tuples[0])
+        assert all([len(cells) == tuple_len for cells in self.tuples])
+        if weights is None:
+            weights = np.zeros((len(self.tuples), 16 ** tuple_len), dtype=np.float32)
+        assert weights.shape == (len(self.tuples), 16 ** tuple_len)
+        self.weights = weights
+        self.tuple_runs = [_tuple_runs(cells) for cells in self.tuples]
+        self.num_features = 8 * len(self.tuples)
+
+    def _indexes(self, board):
+        # (tuple index, table index) of each feature of the board
+        indexes = []
+        for sym_board in symmetries(board):
+            for tuple_idx, runs in enumerate(self.tuple_runs):
+                table_idx = 0
+                for shift, mask in runs:
+                    table_idx |= (sym_board >> shift) & mask
+                indexes.append((tuple_idx, table_idx))
+        return indexes
+
+    def value(self, board):
+        weights = self.weights
+        return float(sum([weights[tuple_idx, table_idx] for tuple_idx, table_idx in self._indexes(board)]))
+
+    def update(self, board, delta):
+        # adds delta to the board's value, spread over its features
+        feature_delta = delta / self.num_features
+        for tuple_idx, table_idx in self._indexes(board):
+            self.weights[tuple_idx, table_idx] += feature_delta
+
+    def save(self, path):
+        # a directory with the tuples (JSON) and the weights (.npy, so they can be memory-mapped)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        with open(os.path.join(path, TUPLES_FILENAME), "w") as tuples_file:
+            json.dump(self.tuples, tuples_file)
+        np.save(os.path.join(path, WEIGHTS_FILENAME), self.weights)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Loads a saved network. By default the weights are memory-mapped
+        read-only (enough for playing); use mmap_mode=None to train further.
+        """
+        with open(os.path.join(path, TUPLES_FILENAME), "r") as tuples_file:
+            tuples = json.load(tuples_file)
+        weights = np.load(os.path.join(path, WEIGHTS_FILENAME), mmap_mode=mmap_mode)
+        return cls(tuples=tuples, weights=weights)
+
+    def best_move(self, board):
+        """
+        Returns: (dir, afterstate, reward) - the move with the highest reward
+        plus value of the board after the move (before the tile spawns), or
+        (None, None, 0) if no move is available
+        """
+        best = (None, None, 0)
+        best_value = None
+        for dir in DIRS:
+            afterstate, reward = move_tiles(board, dir)
+            if afterstate != board:
+                value = reward + self.value(afterstate)
+                if best_value is None or value > best_value:
+                    best_value = value
+                    best = (dir, afterstate, reward)
+        return best
+
+
+def train_game(network, rand_gen, learning_rate=DEFAULT_LEARNING_RATE, prob_two_tile=0.9):
+    """
+    Plays a game with the network's greedy policy, learning the values of the
+    afterstates by TD(0) as it goes.
+
+    Returns: (score, max_tile)
+    """
+    board = spawn_tile(0, rand_gen, prob_two_tile=prob_two_tile)
+    board = spawn_tile(board, rand_gen, prob_two_tile=prob_two_tile)
+    score = 0
+    prev_afterstate = None
+    while True:
+        dir, afterstate, reward = network.best_move(board)
+        if dir is None:
+            break
+        if prev_afterstate is not None:
+            target = reward + network.value(afterstate)
+            network.update(prev_afterstate, learning_rate * (target - network.value(prev_afterstate)))
+        prev_afterstate = afterstate
+        score += reward
+        board = spawn_tile(afterstate, rand_gen, prob_two_tile=prob_two_tile)
+    if prev_afterstate is not None:
+        # the game is over after the last afterstate
+        network.update(prev_afterstate, learning_rate * -network.value(prev_afterstate))
+    max_tile = max([(board >> (4 * cell_idx)) & 0xF for cell_idx in range(16)])
+    return (score, 1 << max_tile)
+
+
+def train(network, num_games, seed=None, learning_rate=DEFAULT_LEARNING_RATE, report_interval=100):
+    rand_gen = random.Random(seed)
+    scores = []
+    for game_idx in range(num_games):
+        score, max_tile = train_game(network, rand_gen, learning_rate=learning_rate)
+        scores.append(score)
+        if report_interval and (game_idx + 1) % report_interval == 0:
+            print(f"game {game_idx + 1} of {num_games}: average score of the last {report_interval} games = "
+                  f"{np.mean(scores[-report_interval:])}")
+    return scores
+
+
+@click.command()
+@click.option("--num-games", "-n", type=int, default=1000)
+@click.option("--learning-rate", type=float, default=DEFAULT_LEARNING_RATE)
+@click.option("--seed", type=int, default=None)
+@click.option("--output", "-o", type=str, required=True, help="Directory where the network is saved")
+@click.option("--resume", is_flag=True, default=False, help="Keep training the network saved in the output directory")
+def main(num_games: int, learning_rate: float, seed: int, output: str, resume: bool):
+    if resume:
+        network = NTupleNetwork.load(output, mmap_mode=None)
+    else:
+        network = NTupleNetwork()
+    train(network, num_games, seed=seed, learning_rate=learning_rate)
+    network.save(output)
+    print(f"Saved the network to {output}")
+
+
+if __name__ == "__main__":
+    main()
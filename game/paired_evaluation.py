@@ -0,0 +1,124 @@
+import itertools
+import json
+import math
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+import numpy as np
+from agent import AGENT_TYPES
+from game_recorder import play_deals
+from sim_metrics import Z_95
+
+DEFAULT_CHUNK_SIZE = 50
+
+
+def generate_deals(num_deals, seed=None):
+    """
+    Returns: a corpus of num_deals deals, as the (distinct) seeds that they
+    are dealt with by GameState.start_new_game_from_deck
+    """
+    return random.Random(seed).sample(range(1 << 32), num_deals)
+
+
+def load_deals(path):
+    with open(path, "r") as deals_file:
+        return json.load(deals_file)
+
+
+def save_deals(path, deals):
+    with open(path, "w") as deals_file:
+        json.dump(deals, deals_file)
+
+
+def _play_chunk(agent_type, deals):
+    agent = AGENT_TYPES[agent_type]()
+    try:
+        return [score for score, _ in play_deals(agent, deals)]
+    finally:
+        agent.close()
+
+
+def play_corpus(agent_types, deals, max_workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Plays every agent type on every deal of the corpus, in a process pool
+    (one task per agent type and chunk of deals).
+
+    Returns: a dict from agent type to an array of its score on each deal
+    """
+    chunks = [deals[start:start + chunk_size] for start in range(0, len(deals), chunk_size)]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            agent_type: [executor.submit(_play_chunk, agent_type, chunk) for chunk in chunks]
+            for agent_type in agent_types
+        }
+        return {
+            agent_type: np.array([score for future in agent_futures for score in future.result()], dtype=np.float64)
+            for agent_type, agent_futures in futures.items()
+        }
+
+
+def paired_comparison(scores_a, scores_b):
+    """
+    Compares two agents' scores on the same deals.
+
+    Returns: a dict with the mean paired difference (b - a) and its 95%
+    confidence interval, the number of deals that b wins, loses and ties
+    against a, and the variance reduction from pairing (how many times more
+    deals an unpaired comparison would need for the same precision)
+    """
+    diffs = scores_b - scores_a
+    n = len(diffs)
+    diff_variance = float(np.var(diffs, ddof=1)) if n > 1 else 0.0
+    unpaired_variance = (float(np.var(scores_a, ddof=1)) + float(np.var(scores_b, ddof=1))) if n > 1 else 0.0
+    ci_half_width = Z_95 * math.sqrt(diff_variance / n) if n > 0 else float("inf")
+    return {
+        "num_deals": n,
+        "mean_diff": float(np.mean(diffs)),
+        "mean_diff_ci95": ci_half_width,
+        "wins": int(np.sum(diffs > 0)),
+        "losses": int(np.sum(diffs < 0)),
+        "ties": int(np.sum(diffs == 0)),
+        "variance_reduction": unpaired_variance / diff_variance if diff_variance > 0 else float("inf"),
+    }
+
+
+@click.command()
+@click.option("--num-deals", "-n", type=int, default=1000)
+@click.option(
+    "--agent-type", "-a", "agent_types", type=click.Choice(list(AGENT_TYPES)), multiple=True,
+    help="Agent types to evaluate (can be repeated, default: all of them)"
+)
+@click.option("--seed", type=int, default=None, help="Seed of the deal corpus")
+@click.option(
+    "--deals-file", type=str, default=None,
+    help="JSON file of the deal corpus: loaded if it exists, otherwise the generated corpus is saved to it"
+)
+@click.option("--workers", "-w", type=int, default=None, help="Number of worker processes")
+def main(num_deals: int, agent_types: tuple, seed: int, deals_file: str, workers: int):
+    if not agent_types:
+        agent_types = tuple(AGENT_TYPES)
+    if deals_file is not None and os.path.isfile(deals_file):
+        deals = load_deals(deals_file)
+    else:
+        deals = generate_deals(num_deals, seed=seed)
+        if deals_file is not None:
+            save_deals(deals_file, deals)
+
+    scores = play_corpus(agent_types, deals, max_workers=workers)
+    for agent_type in agent_types:
+        print(f"{agent_type}: Average Score = {np.mean(scores[agent_type])} over {len(deals)} deals")
+    for agent_type_a, agent_type_b in itertools.combinations(agent_types, 2):
+        comparison = paired_comparison(scores[agent_type_a], scores[agent_type_b])
+        print(
+            f"{agent_type_b} - {agent_type_a}: {comparison['mean_diff']:.1f} +/- {comparison['mean_diff_ci95']:.1f}, "
+            f"wins/losses/ties = {comparison['wins']}/{comparison['losses']}/{comparison['ties']}, "
+            f"variance reduction = {comparison['variance_reduction']:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from agent import DEFAULT_NUM_DETERMINIZATIONS, GameAgent, SearchGameAgent
+from gamestate import piles_to_mask
+from search import SearchTimeout
+from shared_table import SharedTranspositionTable
+
+# the agent used by the searches in a worker process, sent once per worker
+# (instead of once per task) by the pool initializer
+_worker_agent = None
+
+
+def _init_worker(agent):
+    global _worker_agent
+    _worker_agent = agent
+
+
+def _search_deadline(end_time):
+    # the deadline is sent as a time.time() value, since time.perf_counter()
+    # values aren't comparable across processes
+    if end_time is None:
+        return None
+    return time.perf_counter() + (end_time - time.time())
+
+
+def _evaluate_action(action, end_time):
+    return _worker_agent.evaluate_action(action, deadline=_search_deadline(end_time))
+
+
+def _evaluate_determinization(state, seed, end_time):
+    return _worker_agent.move_values(state.determinize(random.Random(seed)), deadline=_search_deadline(end_time))
+
+
+class RootParallelExecutor:
+    """
+    Splits the root of a search over a process pool. The agent must have the
+    evaluate_action(action) and move_values(state) methods of SearchGameAgent.
+
+    Each search is given a time budget (in seconds): results that aren't ready
+    when it runs out are ignored, tasks that haven't started are cancelled, and
+    the searches of the tasks that have started stop at the same deadline
+    (with a SearchTimeout), so they don't hold up the next search. Any other
+    exception from a task is raised.
+    """
+    def __init__(self, agent, max_workers=None, time_budget=None):
+        self.agent = agent
+        self.time_budget = time_budget
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers, initializer=_init_worker, initargs=(agent,)
+        )
+
+    def _end_time(self, time_budget):
+        # Returns: (time_budget, end_time) - the time budget of a search and
+        # its deadline as a time.time() value (None if there's no budget)
+        if time_budget is None:
+            time_budget = self.time_budget
+        return (time_budget, None if time_budget is None else time.time() + time_budget)
+
+    def _wait(self, futures, time_budget):
+        done, not_done = wait(futures, timeout=time_budget)
+        for future in not_done:
+            future.cancel()
+        finished = []
+        for future in futures:
+            if future not in done:
+                continue
+            exception = future.exception()
+            if isinstance(exception, SearchTimeout):
+                continue
+            if exception is not None:
+                raise exception
+            finished.append(future)
+        return finished
+
+    def evaluate_actions(self, state, time_budget=None):
+        """
+        Evaluates each action from state.actions() as a separate task, with
+        the actual hidden cards (perfect information).
+
+        Returns: action_values - a dict from the pile mask of each action (see
+        gamestate.piles_to_mask) to its value, only for the actions that were
+        evaluated within the time budget
+        """
+        time_budget, end_time = self._end_time(time_budget)
+        futures = {}
+        for action in state.actions():
+            futures[self.executor.submit(_evaluate_action, action, end_time)] = piles_to_mask(action[0])
+        return {futures[future]: future.result() for future in self._wait(futures, time_budget)}
+
+    def evaluate_determinizations(self, state, num_determinizations, seed=None, time_budget=None):
+        """
+        Evaluates every action in num_determinizations copies of the state with
+        resampled hidden cards (see GameState.determinize), one copy per task.
+
+        Returns: action_values - a dict from the pile mask of each action to its
+        mean value over the determinizations that finished within the time budget
+        """
+        rand_gen = random.Random(seed)
+        time_budget, end_time = self._end_time(time_budget)
+        futures = [
+            self.executor.submit(_evaluate_determinization, state, rand_gen.getrandbits(32), end_time)
+            for _ in range(num_determinizations)
+        ]
+        value_totals = {}
+        value_counts = {}
+        for future in self._wait(futures, time_budget):
+            for mask, value in future.result().items():
+                value_totals[mask] = value_totals.get(mask, 0) + value
+                value_counts[mask] = value_counts.get(mask, 0) + 1
+        return {mask: value_totals[mask] / value_counts[mask] for mask in value_totals}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ParallelSearchGameAgent(GameAgent):
+    """
+    A SearchGameAgent whose determinizations are searched in parallel, with
+    the workers sharing a transposition table in shared memory: the agent
+    doesn't look at the hidden cards, it averages the action values over
+    num_determinizations copies of the state with resampled hidden cards.
+    With num_determinizations=0, each action is searched with the actual
+    hidden cards instead (a perfect-information mode for analysis, like
+    SearchGameAgent's).
+
+    An action that isn't evaluated within the time budget gets its reward as
+    its value (a depth-1 search), so the agent never chooses an action that
+    looks worse than the greedy action, and chooses the greedy action if
+    nothing was evaluated. The determinizations are drawn from
+    random.Random(seed), like SearchGameAgent's.
+    """
+    def __init__(self, depth=3, max_workers=None, time_budget=None,
+                 num_determinizations=DEFAULT_NUM_DETERMINIZATIONS, table_size=1 << 20, tablebase=None, seed=None):
+        self.table = SharedTranspositionTable(num_entries=table_size)
+        self.num_determinizations = num_determinizations
+        self.rand_gen = random.Random(seed)
+        self.executor = RootParallelExecutor(
+            SearchGameAgent(depth=depth, table=self.table, tablebase=tablebase), max_workers=max_workers, time_budget=time_budget
+        )
+
+    def choose_action(self, current_state):
+        if self.num_determinizations > 0:
+            action_values = self.executor.evaluate_determinizations(
+                current_state, self.num_determinizations, seed=self.rand_gen.getrandbits(32)
+            )
+        else:
+            action_values = self.executor.evaluate_actions(current_state)
+
+        max_value = -1
+        best_action = None
+        for action in current_state.actions():
+            piles, next_state, reward = action
+            value = action_values.get(piles_to_mask(piles), reward)
+            if value > max_value:
+                max_value = value
+                best_action = action
+
+        return best_action
+
+    def close(self):
+        self.executor.shutdown()
+        self.table.unlink()
@@ -0,0 +1,165 @@
+import gzip
+import io
+import os
+import queue
+import threading
+
+DEFAULT_BATCH_BYTES = 1 << 20
+DEFAULT_QUEUE_SIZE = 1024
+
+
+def open_records(path):
+    """
+    Opens a record file for reading as text, decompressing it if its name ends
+    with .gz (gzip files with several members, as written by BatchedRecordSink,
+    are read as one stream).
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt")
+    return open(path, "r")
+
+
+class RecordSink:
+    """
+    Destination of the game records of a simulation run. Records are queued by
+    write() and written in large batches by a background thread, so the game
+    loop doesn't wait on file I/O. Subclasses implement _write_batch.
+    """
+    def __init__(self, batch_bytes=DEFAULT_BATCH_BYTES, queue_size=DEFAULT_QUEUE_SIZE):
+        self.batch_bytes = batch_bytes
+        # bounded, so that a slow disk slows the games down instead of using up memory
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            # wait for a record, then take whatever else is queued (up to batch_bytes)
+            num_items = 0
+            batch = []
+            batch_size = 0
+            item = self._queue.get()
+            while True:
+                num_items += 1
+                if item is None:
+                    stopped = True
+                    break
+                batch.append(item)
+                batch_size += len(item[1])
+                if batch_size >= self.batch_bytes:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                if batch and self._error is None:
+                    self._write_batch(batch)
+            except Exception as e:
+                self._error = e
+            finally:
+                # only mark the records as done once they're written, for flush()
+                for _ in range(num_items):
+                    self._queue.task_done()
+
+    def _check_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _write_batch(self, batch):
+        raise NotImplementedError
+
+    def write(self, game_idx, record_text):
+        self._check_error()
+        self._queue.put((game_idx, record_text))
+
+    def flush(self):
+        # wait until every queued record has been written
+        self._queue.join()
+        self._check_error()
+
+    def checkpoint(self):
+        """
+        Makes every record written so far durable.
+
+        Returns: record_offset - the position to resume writing from (see
+        RunManifest), 0 if the sink doesn't need one
+        """
+        self.flush()
+        return 0
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._check_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class DirectoryRecordSink(RecordSink):
+    """
+    Writes each game to its own file, named by record_filename(game_idx).
+    """
+    def __init__(self, record_filename, **kwargs):
+        self.record_filename = record_filename
+        super().__init__(**kwargs)
+
+    def _write_batch(self, batch):
+        for game_idx, record_text in batch:
+            with open(self.record_filename(game_idx), "w") as record_file:
+                record_file.write(record_text)
+
+
+class BatchedRecordSink(RecordSink):
+    """
+    Writes all the games to one file, one record after another, through a
+    single file handle. If compress is True, the file is gzip-compressed, with
+    a new gzip member started at each checkpoint so that a resumed run can cut
+    the file back to its last checkpoint (record_offset) and keep appending.
+    """
+    def __init__(self, path, compress=False, record_offset=0, **kwargs):
+        self.path = path
+        self.compress = compress
+        if record_offset > 0:
+            self._raw_file = open(path, "r+b")
+            self._raw_file.truncate(record_offset)
+            self._raw_file.seek(record_offset)
+        else:
+            self._raw_file = open(path, "wb")
+        # with compression, a gzip member is started by the first write after a checkpoint
+        self._stream = None if compress else self._raw_file
+        super().__init__(**kwargs)
+
+    def _write_batch(self, batch):
+        if self._stream is None:
+            self._stream = gzip.GzipFile(fileobj=self._raw_file, mode="wb")
+        buffer = io.StringIO()
+        for game_idx, record_text in batch:
+            buffer.write(record_text)
+            buffer.write("\n")
+        self._stream.write(buffer.getvalue().encode())
+
+    def checkpoint(self):
+        self.flush()
+        if self.compress and self._stream is not None:
+            # finish the gzip member, so the file is valid up to here
+            self._stream.close()
+            self._stream = None
+        self._raw_file.flush()
+        os.fsync(self._raw_file.fileno())
+        return self._raw_file.tell()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if self.compress and self._stream is not None:
+                self._stream.close()
+            self._raw_file.close()
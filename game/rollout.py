@@ -0,0 +1,53 @@
+import random
+
+from gamestate import MASK_BITS, SearchState, hand_moves
+
+# Fast playouts for Monte Carlo evaluation: a game is played to the end on a
+# gamestate.SearchState, whose moves only change integer arrays and pile masks,
+# without creating any Card objects, GameState copies or sets of pile
+# locations. The greedy policy only looks for the best hand (see
+# gamestate.hand_moves) instead of listing every move.
+
+
+def rollout(state, policy="greedy", rand_gen=None):
+    """
+    Plays the game from the state until it's over, without modifying the state.
+    The policy is either "greedy" (always choose the first action with the
+    highest reward in the order of GameState.actions(), so the same actions as
+    agent.GreedyGameAgent) or "random" (choose uniformly from the actions, like
+    agent.RandomGameAgent, using rand_gen, a random.Random).
+
+    Returns: score - the total reward from the state until the game is over
+    """
+    if rand_gen is None:
+        rand_gen = random
+    greedy = policy == "greedy"
+    assert greedy or policy == "random"
+
+    search_state = SearchState(state)
+    score = 0
+    while True:
+        if greedy:
+            moves = hand_moves(
+                search_state.rank_masks, search_state.suit_masks, search_state.single_mask,
+                search_state.lucky_suit_idx, search_state.mask_bonus, True
+            )
+            if search_state.discards_remaining > 0:
+                mask_bonus = search_state.mask_bonus
+                single_mask = search_state.single_mask
+                best_discard = max(
+                    [(pile_bit, mask_bonus[pile_bit & single_mask])
+                     for pile_bit in MASK_BITS[search_state.non_empty_mask]],
+                    key=lambda move: move[1], default=None
+                )
+                # discards come first in the action order, so they win ties
+                if best_discard is not None and (not moves or best_discard[1] >= moves[0][1]):
+                    moves = [best_discard]
+        else:
+            moves = search_state.moves()
+        if not moves:
+            return score
+
+        mask, reward = moves[0] if greedy else rand_gen.choice(moves)
+        score += reward
+        search_state.do_move(mask)
@@ -0,0 +1,99 @@
+import json
+import math
+import os
+
+MANIFEST_FILENAME = "run_manifest.json"
+
+
+class RunManifest:
+    """
+    Progress of a simulation run, saved as JSON in the run's record directory
+    so that the run can be resumed (and analyzed) after it stops.
+
+    Game i of the run is dealt with seed base_seed + i, so resuming from the
+    last checkpoint replays exactly the games that were lost. The config holds
+    the options the run was started with (e.g. the agent type). If the records
+    are written to one file, record_offset is its size at the last checkpoint.
+    """
+    def __init__(self, record_directory, config, num_games, base_seed, games_completed=0, aggregates=None,
+                 record_offset=0):
+        self.record_directory = record_directory
+        self.config = config
+        self.num_games = num_games
+        self.base_seed = base_seed
+        self.games_completed = games_completed
+        if aggregates is None:
+            aggregates = {"total_score": 0, "total_sq_score": 0, "num_clears": 0, "max_score": None, "min_score": None}
+        self.aggregates = aggregates
+        self.record_offset = record_offset
+
+    @staticmethod
+    def path(record_directory):
+        return os.path.join(record_directory, MANIFEST_FILENAME)
+
+    @classmethod
+    def exists(cls, record_directory):
+        return os.path.isfile(cls.path(record_directory))
+
+    @classmethod
+    def load(cls, record_directory):
+        with open(cls.path(record_directory), "r") as manifest_file:
+            manifest = json.load(manifest_file)
+        return cls(
+            record_directory, manifest["config"], manifest["num_games"], manifest["base_seed"],
+            games_completed=manifest["games_completed"], aggregates=manifest["aggregates"],
+            record_offset=manifest.get("record_offset", 0)
+        )
+
+    def save(self):
+        # write to a temporary file first, so that a crash while saving never
+        # leaves a partially written manifest
+        manifest = {
+            "config": self.config,
+            "num_games": self.num_games,
+            "base_seed": self.base_seed,
+            "games_completed": self.games_completed,
+            "aggregates": self.aggregates,
+            "record_offset": self.record_offset,
+            "summary": self.summary(),
+        }
+        tmp_path = self.path(self.record_directory) + ".tmp"
+        with open(tmp_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+            manifest_file.flush()
+            os.fsync(manifest_file.fileno())
+        os.replace(tmp_path, self.path(self.record_directory))
+
+    def seed_for_game(self, game_idx):
+        return self.base_seed + game_idx
+
+    def record_filename(self, game_idx):
+        return os.path.join(self.record_directory, f"game_{game_idx:07d}.txt")
+
+    def record_game(self, score, is_board_cleared):
+        self.games_completed += 1
+        self.aggregates["total_score"] += score
+        self.aggregates["total_sq_score"] += score * score
+        self.aggregates["num_clears"] += int(is_board_cleared)
+        if self.aggregates["max_score"] is None or score > self.aggregates["max_score"]:
+            self.aggregates["max_score"] = score
+        if self.aggregates["min_score"] is None or score < self.aggregates["min_score"]:
+            self.aggregates["min_score"] = score
+
+    def summary(self):
+        n = self.games_completed
+        if n == 0:
+            return {"games_completed": 0}
+        mean_score = self.aggregates["total_score"] / n
+        # sample variance, like sim_metrics.RunningStats
+        variance = 0.0
+        if n > 1:
+            variance = max(0, (self.aggregates["total_sq_score"] - n * mean_score * mean_score) / (n - 1))
+        return {
+            "games_completed": n,
+            "max_score": self.aggregates["max_score"],
+            "min_score": self.aggregates["min_score"],
+            "avg_score": mean_score,
+            "score_stddev": math.sqrt(variance),
+            "clear_rate": self.aggregates["num_clears"] / n,
+        }
@@ -0,0 +1,195 @@
+import time
+
+from gamestate import SearchState
+
+MAX_TABLE_ENTRIES = 1000000
+MAX_SEARCH_DEPTH = 50
+# the depth stored in the table for exact values (ones that don't depend on
+# the depth of the search), which is deeper than any search; it fits in the
+# depth field of shared_table.SharedTranspositionTable
+EXACT_DEPTH = 255
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class TranspositionTable:
+    """
+    In-memory table of search results, keyed by GameState.search_key(). Each
+    entry is a (depth, value, best_mask) tuple, where value is the best total
+    reward found by a search of the given depth from the state, and best_mask is
+    the pile mask (see gamestate.piles_to_mask) of the best action. Exact values
+    are stored with a depth of EXACT_DEPTH.
+
+    Other tables (e.g. solution_cache.SolutionCache) implement the same probe
+    and store methods, so they can be used by the search interchangeably.
+    """
+    def __init__(self, max_entries=MAX_TABLE_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def probe(self, key):
+        return self.entries.get(key)
+
+    def store(self, key, depth, value, best_mask):
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] > depth:
+            # keep the result of the deeper search
+            return
+        if entry is None and len(self.entries) >= self.max_entries:
+            self.entries.clear()
+        self.entries[key] = (depth, value, best_mask)
+
+
+def search_value(state, depth, table=None, deadline=None, tablebase=None):
+    """
+    Depth-limited search over state.moves(): the value of a state is the
+    maximum over actions of the action's reward plus the value of the next
+    state (searched with one less depth). States at depth 0 or where the game
+    is over have a value of 0. The state is a GameState or a SearchState.
+
+    If a deadline (a time.perf_counter() value) is given, raises SearchTimeout
+    once it has passed. If an endgame tablebase (see endgame.py) is given, the
+    expected values of the endgame positions in it are used instead of
+    searching. These are values of the whole rest of the game, so they're
+    stored in the table as exact, and so is the value of any state whose
+    actions all lead to exact values (e.g. because the game is over within
+    the depth); other values are stored at the depth they were searched to.
+
+    Returns: (value, best_mask) - the value of the state and the pile mask of
+    the best action (None if there are no actions or depth is 0, or if the
+    value came from the tablebase)
+    """
+    if not isinstance(state, SearchState):
+        state = SearchState(state)
+    value, best_mask, _ = _search_value(state, depth, table, deadline, tablebase)
+    return (value, best_mask)
+
+
+def _search_value(state, depth, table, deadline, tablebase):
+    # Returns: (value, best_mask, exact) - like search_value, and whether the
+    # value is exact
+    if depth <= 0:
+        return (0, None, False)
+    if deadline is not None and time.perf_counter() >= deadline:
+        raise SearchTimeout()
+
+    if table is not None:
+        key = state.search_key()
+        entry = table.probe(key)
+        if entry is not None and entry[0] >= depth:
+            return (entry[1], entry[2], entry[0] >= EXACT_DEPTH)
+
+    # the tablebase lookup canonicalizes the state, so it's only tried on the
+    # endgame positions (and once per position, since the value is then in
+    # the table)
+    if tablebase is not None and state.num_cards() <= tablebase.max_cards:
+        value = tablebase.lookup(state)
+        if value is not None:
+            if table is not None:
+                table.store(key, EXACT_DEPTH, value, None)
+            return (value, None, True)
+
+    # moves are made and unmade in place, so the search doesn't copy any states
+    # (the state is restored even if the search times out)
+    best_value = 0
+    best_mask = None
+    exact = True
+    for mask, reward in state.moves():
+        token = state.do_move(mask)
+        try:
+            value, _, child_exact = _search_value(state, depth - 1, table, deadline, tablebase)
+        finally:
+            state.undo_move(token)
+        value += reward
+        exact = exact and child_exact
+        if best_mask is None or value > best_value:
+            best_value = value
+            best_mask = mask
+
+    if table is not None:
+        table.store(key, EXACT_DEPTH if exact else depth, best_value, best_mask)
+    return (best_value, best_mask, exact)
+
+
+def iterative_deepening(state, deadline, table=None, max_depth=MAX_SEARCH_DEPTH, tablebase=None):
+    """
+    Anytime search: runs search_value at depth 1, 2, 3, ... from the state
+    until the deadline (a time.perf_counter() value) passes, and returns the
+    best action of the last completed depth.
+
+    The table is kept across iterations: an iteration reuses the values that
+    the previous one stored two plies down, and the root actions are ordered
+    by the best action found so far. Since the previous best action is
+    searched first, if the deadline passes during an iteration after it was
+    searched, any action that beat it in that iteration is returned instead.
+    The search stops early once the values of all the actions are exact.
+
+    Returns: (value, best_mask, depth) - the value and pile mask of the best
+    action and the depth of the search they came from (best_mask is None if
+    there are no actions)
+    """
+    if table is None:
+        table = TranspositionTable()
+    if not isinstance(state, SearchState):
+        state = SearchState(state)
+
+    moves = state.moves()
+    if len(moves) == 0:
+        return (0, None, 0)
+
+    # every action removes at least one card, so there's no point in searching
+    # deeper than the number of cards left
+    max_depth = min(max_depth, state.num_cards())
+
+    # depth 1 (the greedy action) doesn't need any search
+    best_value = -1
+    best_mask = None
+    for mask, reward in moves:
+        if reward > best_value:
+            best_value = reward
+            best_mask = mask
+    completed_depth = 1
+
+    key = state.search_key()
+    for depth in range(2, max_depth + 1):
+        # search the best action from the table first (this is the best action
+        # of the last completed depth, unless the table has a deeper result)
+        first_mask = best_mask
+        entry = table.probe(key)
+        if entry is not None and entry[2] is not None:
+            first_mask = entry[2]
+        ordered_moves = sorted(moves, key=lambda move: move[0] != first_mask)
+
+        action_values = {}
+        exact = True
+        try:
+            for mask, reward in ordered_moves:
+                token = state.do_move(mask)
+                try:
+                    value, _, child_exact = _search_value(state, depth - 1, table, deadline, tablebase)
+                finally:
+                    state.undo_move(token)
+                action_values[mask] = reward + value
+                exact = exact and child_exact
+        except SearchTimeout:
+            if best_mask in action_values:
+                partial_best_mask = max(action_values, key=action_values.get)
+                if action_values[partial_best_mask] > action_values[best_mask]:
+                    best_mask = partial_best_mask
+                    best_value = action_values[partial_best_mask]
+            break
+
+        best_mask = max(action_values, key=action_values.get)
+        best_value = action_values[best_mask]
+        completed_depth = depth
+        table.store(key, EXACT_DEPTH if exact else depth, best_value, best_mask)
+
+        if exact or (deadline is not None and time.perf_counter() >= deadline):
+            break
+
+    return (best_value, best_mask, completed_depth)
@@ -0,0 +1,164 @@
+import math
+import random
+from statistics import NormalDist
+
+import click
+import numpy as np
+from agent import AGENT_TYPES
+from game_recorder import play_deals
+from statsmodels.stats.weightstats import DescrStatsW
+
+DIFFERENT = "different"
+EQUIVALENT = "equivalent"
+INCONCLUSIVE = "inconclusive"
+
+
+def obrien_fleming_spending(alpha, information_fraction):
+    """
+    Returns: the total type I error that may be spent after seeing the given
+    fraction of the games (an O'Brien-Fleming type spending function, which
+    spends very little at the early looks)
+    """
+    if information_fraction <= 0:
+        return 0.0
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    return min(alpha, 2 * (1 - NormalDist().cdf(z / math.sqrt(information_fraction))))
+
+
+class SequentialPairedTest:
+    """
+    Sequential paired t-test of the score differences of two agents playing
+    the same deals, looked at after each batch of games. The test stops with
+    DIFFERENT as soon as the mean difference is significant, or with EQUIVALENT
+    as soon as it is significantly within (-threshold, threshold) (a TOST
+    equivalence test, only if a threshold is given).
+
+    The type I error of the repeated looks is controlled by alpha spending:
+    each look is tested at the alpha spent since the previous look, so the
+    total over all the looks (up to max_games) is at most alpha.
+    """
+    def __init__(self, max_games, alpha=0.05, threshold=None):
+        if max_games < 2:
+            raise ValueError(f"The test needs at least 2 games, not max_games={max_games}")
+        self.max_games = max_games
+        self.alpha = alpha
+        self.threshold = threshold
+        self.diffs = []
+        self.alpha_spent = 0.0
+        self.decision = None
+
+    def update(self, scores_a, scores_b):
+        """
+        Adds the scores of a batch of deals (scores_a[i] and scores_b[i] are
+        from the same deal) and tests the differences seen so far.
+
+        Returns: the decision (DIFFERENT or EQUIVALENT), or None to keep going
+        (INCONCLUSIVE once max_games have been played)
+        """
+        assert self.decision is None, "The test has already stopped"
+        assert len(scores_a) == len(scores_b)
+        self.diffs.extend([score_b - score_a for score_a, score_b in zip(scores_a, scores_b)])
+        if len(self.diffs) < 2:
+            return self.decision
+
+        alpha_total = obrien_fleming_spending(self.alpha, min(1.0, len(self.diffs) / self.max_games))
+        look_alpha = alpha_total - self.alpha_spent
+        self.alpha_spent = alpha_total
+
+        stats = DescrStatsW(np.array(self.diffs, dtype=np.float64))
+        if stats.std > 0:
+            _, p_different, _ = stats.ttest_mean(0)
+            if p_different < look_alpha:
+                self.decision = DIFFERENT
+            elif self.threshold is not None:
+                p_equivalent, _, _ = stats.ttost_mean(-self.threshold, self.threshold)
+                if p_equivalent < look_alpha:
+                    self.decision = EQUIVALENT
+        elif stats.mean != 0:
+            # every deal has the same nonzero difference, so the mean
+            # difference is certainly not 0 (the t statistic is infinite)
+            self.decision = DIFFERENT
+        elif self.threshold is not None:
+            # every deal has no difference, e.g. two deterministic agents that always agree
+            self.decision = EQUIVALENT
+
+        if self.decision is None and len(self.diffs) >= self.max_games:
+            self.decision = INCONCLUSIVE
+        return self.decision
+
+    def summary(self):
+        stats = DescrStatsW(np.array(self.diffs, dtype=np.float64))
+        return {
+            "decision": self.decision,
+            "num_games": len(self.diffs),
+            "mean_diff": float(stats.mean),
+            "diff_stddev": float(stats.std),
+            "alpha_spent": self.alpha_spent,
+        }
+
+
+def compare_agents(agent_type_a, agent_type_b, batch_size=100, max_games=10000, alpha=0.05, threshold=None,
+                   base_seed=0):
+    """
+    Plays both agents on the same seeded deals (deal i with seed base_seed + i)
+    in batches, until the sequential test stops.
+
+    Returns: the test summary (see SequentialPairedTest.summary), with the
+    mean score of each agent
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, not {batch_size}")
+    if max_games < 2:
+        raise ValueError(f"The test needs at least 2 games, not max_games={max_games}")
+    agent_a = AGENT_TYPES[agent_type_a]()
+    agent_b = AGENT_TYPES[agent_type_b]()
+    test = SequentialPairedTest(max_games, alpha=alpha, threshold=threshold)
+    total_score_a = 0
+    total_score_b = 0
+    try:
+        num_games = 0
+        while test.decision is None:
+            seeds = range(base_seed + num_games, base_seed + min(num_games + batch_size, max_games))
+            scores_a = [score for score, _ in play_deals(agent_a, seeds)]
+            scores_b = [score for score, _ in play_deals(agent_b, seeds)]
+            total_score_a += sum(scores_a)
+            total_score_b += sum(scores_b)
+            num_games += len(seeds)
+            test.update(scores_a, scores_b)
+    finally:
+        agent_a.close()
+        agent_b.close()
+
+    summary = test.summary()
+    summary["mean_score_a"] = total_score_a / summary["num_games"]
+    summary["mean_score_b"] = total_score_b / summary["num_games"]
+    return summary
+
+
+@click.command()
+@click.option("--agent-a", "-a", type=click.Choice(list(AGENT_TYPES)), required=True)
+@click.option("--agent-b", "-b", type=click.Choice(list(AGENT_TYPES)), required=True)
+@click.option("--batch-size", type=click.IntRange(min=1), default=100, help="Number of deals between tests")
+@click.option(
+    "--max-games", "-n", type=click.IntRange(min=2), default=10000, help="Maximum number of deals to play"
+)
+@click.option("--alpha", type=float, default=0.05, help="Total significance level over all the tests")
+@click.option(
+    "--threshold", type=float, default=None,
+    help="Stop early if the difference in mean score is significantly smaller than this"
+)
+@click.option("--seed", type=int, default=None, help="Base seed of the deals (deal i is dealt with seed + i)")
+def main(agent_a: str, agent_b: str, batch_size: int, max_games: int, alpha: float, threshold: float, seed: int):
+    if seed is None:
+        seed = random.getrandbits(32)
+    summary = compare_agents(
+        agent_a, agent_b, batch_size=batch_size, max_games=max_games, alpha=alpha, threshold=threshold,
+        base_seed=seed
+    )
+    print(f"{summary['decision']} after {summary['num_games']} games (base seed {seed})")
+    print(f"Average Score: {agent_a} = {summary['mean_score_a']}, {agent_b} = {summary['mean_score_b']}")
+    print(f"Mean Difference ({agent_b} - {agent_a}) = {summary['mean_diff']} (stddev {summary['diff_stddev']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+from multiprocessing import shared_memory
+import numpy as np
+
+DEFAULT_NUM_ENTRIES = 1 << 20
+
+# layout of the packed 64-bit data word of an entry
+DEPTH_BITS = 8
+MASK_SHIFT = 8
+MASK_BITS = 10
+# set in every stored data word, so that an empty slot (all zeros) is never a hit
+USED_BIT = 1 << (MASK_SHIFT + MASK_BITS)
+
+
+def pack_entry(depth, value, best_mask):
+    """
+    Packs the depth and best mask (stored plus one, so that 0 means None) into
+    a data word, and the value into a second word as the bits of a float64, so
+    that averaged values (e.g. from the endgame tablebase) are stored exactly.
+
+    Returns: (data, value_bits)
+    """
+    value_bits = int(np.array(value, dtype=np.float64).view(np.uint64))
+    mask_bits = 0 if best_mask is None else best_mask + 1
+    return (USED_BIT | min(depth, (1 << DEPTH_BITS) - 1) | (mask_bits << MASK_SHIFT), value_bits)
+
+
+def unpack_entry(data, value_bits):
+    value = float(np.array(value_bits, dtype=np.uint64).view(np.float64))
+    depth = data & ((1 << DEPTH_BITS) - 1)
+    mask_bits = (data >> MASK_SHIFT) & ((1 << MASK_BITS) - 1)
+    return (depth, value, None if mask_bits == 0 else mask_bits - 1)
+
+
+class SharedTranspositionTable:
+    """
+    Fixed-size transposition table in shared memory, so that search workers in
+    different processes can share their results. Implements the same
+    probe/store interface as search.TranspositionTable, with keys from
+    GameState.search_key().
+
+    Each slot holds three 64-bit words: the key XOR'd with the other two, the
+    packed depth and best mask, and the value (see pack_entry). There are no
+    locks: if two processes write the same slot at once, the key check fails on
+    the torn entry and it is treated as a miss. A slot is replaced unless it
+    holds the result of a deeper search.
+
+    The table can be pickled (e.g. sent to a process pool): the unpickled copy
+    attaches to the same shared memory. The process that created the table must
+    call unlink() once it is no longer needed.
+    """
+    def __init__(self, num_entries=DEFAULT_NUM_ENTRIES, name=None):
+        assert num_entries > 0 and num_entries & (num_entries - 1) == 0, "num_entries must be a power of 2"
+        self.num_entries = num_entries
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=num_entries * 3 * 8)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.slots = np.ndarray((num_entries, 3), dtype=np.uint64, buffer=self.shm.buf)
+        if self.owner:
+            self.slots[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __getstate__(self):
+        return {"num_entries": self.num_entries, "name": self.name}
+
+    def __setstate__(self, state):
+        self.__init__(num_entries=state["num_entries"], name=state["name"])
+
+    def __len__(self):
+        # number of occupied slots
+        return int(np.count_nonzero(self.slots[:, 1]))
+
+    def probe(self, key):
+        check, data, value_bits = self.slots[key & (self.num_entries - 1)].tolist()
+        if data == 0 or check ^ data ^ value_bits != key:
+            return None
+        return unpack_entry(data, value_bits)
+
+    def store(self, key, depth, value, best_mask):
+        slot_idx = key & (self.num_entries - 1)
+        data = int(self.slots[slot_idx, 1])
+        if data != 0 and (data & ((1 << DEPTH_BITS) - 1)) > depth:
+            # replace-by-depth: keep the result of the deeper search
+            return
+        data, value_bits = pack_entry(depth, value, best_mask)
+        self.slots[slot_idx] = (key ^ data ^ value_bits, data, value_bits)
+
+    def clear(self):
+        self.slots[:] = 0
+
+    def close(self):
+        self.slots = None
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.unlink()
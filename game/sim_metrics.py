@@ -0,0 +1,146 @@
+import json
+import math
+import sys
+import time
+
+# z-score of a 95% confidence interval
+Z_95 = 1.96
+
+
+class RunningStats:
+    """
+    Running count, mean, variance, min and max of a stream of values
+    (Welford's algorithm), without keeping the values. Statistics of separate
+    parts of a stream can be combined with merge().
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.min = other.min
+            self.max = other.max
+        else:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.mean += delta * other.count / count
+        self.count = count
+
+    def variance(self):
+        # sample variance
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
+    def stddev(self):
+        return math.sqrt(self.variance())
+
+    def ci95(self):
+        # half-width of the 95% confidence interval of the mean (None until
+        # there are two values, so the metrics are still valid JSON)
+        if self.count < 2:
+            return None
+        return Z_95 * self.stddev() / math.sqrt(self.count)
+
+
+def wilson_interval(successes, n, z=Z_95):
+    """
+    Returns: (low, high) - the Wilson score interval of a proportion, which
+    (unlike the normal approximation) is still sensible for rare events like
+    clearing the table
+    """
+    if n == 0:
+        return (0.0, 1.0)
+    p = successes / n
+    denominator = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denominator
+    return (max(0.0, center - half_width), min(1.0, center + half_width))
+
+
+class ProgressReporter:
+    """
+    Tracks the throughput and results of a simulation run, and prints a
+    progress line at most once every `interval` seconds (instead of a line
+    per game).
+    """
+    def __init__(self, total_games, interval=2.0, stream=sys.stdout):
+        self.total_games = total_games
+        self.interval = interval
+        self.stream = stream
+        self.scores = RunningStats()
+        self.num_clears = 0
+        self.num_moves = 0
+        self.start_time = time.perf_counter()
+        self.last_report_time = self.start_time
+
+    def record_game(self, score, is_board_cleared, num_moves):
+        self.scores.add(score)
+        self.num_clears += int(is_board_cleared)
+        self.num_moves += num_moves
+
+        now = time.perf_counter()
+        if now - self.last_report_time >= self.interval:
+            self.last_report_time = now
+            self.report()
+
+    def metrics(self):
+        elapsed = time.perf_counter() - self.start_time
+        clear_rate_low, clear_rate_high = wilson_interval(self.num_clears, self.scores.count)
+        return {
+            "games": self.scores.count,
+            "moves": self.num_moves,
+            "elapsed_sec": elapsed,
+            "games_per_sec": self.scores.count / elapsed if elapsed > 0 else 0.0,
+            "moves_per_sec": self.num_moves / elapsed if elapsed > 0 else 0.0,
+            "mean_score": self.scores.mean,
+            "mean_score_ci95": self.scores.ci95(),
+            "score_stddev": self.scores.stddev(),
+            "clear_rate": self.num_clears / self.scores.count if self.scores.count > 0 else 0.0,
+            "clear_rate_ci95": [clear_rate_low, clear_rate_high],
+        }
+
+    def report(self):
+        metrics = self.metrics()
+        mean_score_ci95 = "?" if metrics["mean_score_ci95"] is None else f"{metrics['mean_score_ci95']:.1f}"
+        self.stream.write(
+            f"games {metrics['games']}/{self.total_games} | "
+            f"{metrics['games_per_sec']:.1f} games/s, {metrics['moves_per_sec']:.1f} moves/s | "
+            f"mean score {metrics['mean_score']:.1f} +/- {mean_score_ci95} | "
+            f"clear rate {100 * metrics['clear_rate']:.2f}% "
+            f"[{100 * metrics['clear_rate_ci95'][0]:.2f}%, {100 * metrics['clear_rate_ci95'][1]:.2f}%]\n"
+        )
+        self.stream.flush()
+
+    def finish(self, metrics_path=None):
+        """
+        Prints the final progress line and writes the metrics as JSON to
+        metrics_path (if given).
+
+        Returns: metrics - the final metrics dict
+        """
+        self.report()
+        metrics = self.metrics()
+        if metrics_path is not None:
+            with open(metrics_path, "w") as metrics_file:
+                json.dump(metrics, metrics_file, indent=2, allow_nan=False)
+        return metrics
@@ -0,0 +1,138 @@
+import os
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+import numpy as np
+from agent_2048 import AGENT_TYPES
+from bitboard import BitboardState
+
+DEFAULT_CHUNK_SIZE = 10
+
+
+def agent_seed(seed):
+    """
+    Returns: the seed for the agent's own random choices in the game with the
+    given seed, derived from it so that the agent's random numbers aren't the
+    same stream as the tile spawns
+    """
+    return random.Random(f"agent {seed}").getrandbits(32)
+
+
+def play_2048_game(agent, seed, prob_two_tile=0.9):
+    """
+    Plays a game of 2048 with the agent, spawning tiles from random.Random(seed)
+    (the same game as game_engine.Game.new_game(random_seed=seed) with the
+    same moves). The agent is seeded with agent_seed(seed).
+
+    Returns: a dict with the game's "seed", "score", "max_tile" and "num_moves"
+    """
+    rand_gen = random.Random(seed)
+    agent.new_game(agent_seed(seed))
+    state = BitboardState()
+    state.spawn_tile(rand_gen, prob_two_tile=prob_two_tile)
+    state.spawn_tile(rand_gen, prob_two_tile=prob_two_tile)
+    num_moves = 0
+    while True:
+        dir = agent.choose_action(state)
+        if dir is None:
+            break
+        moved_any = state.move_tiles(dir)
+        assert moved_any, f"The agent chose an invalid move {dir}"
+        state.spawn_tile(rand_gen, prob_two_tile=prob_two_tile)
+        num_moves += 1
+    return {"seed": seed, "score": state.score, "max_tile": state.max_tile_value(), "num_moves": num_moves}
+
+
+def _play_games(agent_type, agent_kwargs, seeds):
+    agent = AGENT_TYPES[agent_type](**agent_kwargs)
+    try:
+        return [play_2048_game(agent, seed) for seed in seeds]
+    finally:
+        agent.close()
+
+
+def run_games(agent_type, num_games, base_seed=0, max_workers=None, agent_kwargs=None,
+              chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Plays num_games games (game i with seed base_seed + i) in a process pool,
+    or in this process if max_workers is 1.
+
+    Returns: the result of play_2048_game for each game, in order
+    """
+    if agent_kwargs is None:
+        agent_kwargs = {}
+    seeds = list(range(base_seed, base_seed + num_games))
+    if max_workers == 1:
+        return _play_games(agent_type, agent_kwargs, seeds)
+
+    chunks = [seeds[start:start + chunk_size] for start in range(0, len(seeds), chunk_size)]
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_play_games, agent_type, agent_kwargs, chunk) for chunk in chunks]
+        return [result for future in futures for result in future.result()]
+
+
+def summarize(results):
+    """
+    Returns: summary statistics of the games: the mean, standard deviation,
+    min and max score, the mean number of moves, and the fraction of games
+    that reached each max tile
+    """
+    scores = np.array([result["score"] for result in results], dtype=np.float64)
+    max_tile_counts = Counter([result["max_tile"] for result in results])
+    return {
+        "num_games": len(results),
+        "avg_score": float(np.mean(scores)),
+        "score_stddev": float(np.std(scores)),
+        "min_score": float(np.min(scores)),
+        "max_score": float(np.max(scores)),
+        "avg_moves": float(np.mean([result["num_moves"] for result in results])),
+        "max_tile_rates": {
+            max_tile: max_tile_counts[max_tile] / len(results) for max_tile in sorted(max_tile_counts)
+        },
+    }
+
+
+@click.command()
+@click.option("--num-games", "-n", type=int, default=100)
+@click.option("--agent-type", "-a", type=click.Choice(list(AGENT_TYPES)), default="expectimax")
+@click.option("--seed", type=int, default=None, help="Base seed of the run (game i is played with seed + i)")
+@click.option("--workers", "-w", type=int, default=None, help="Number of worker processes")
+@click.option(
+    "--time-limit", type=float, default=None,
+    help="Time limit per move in seconds (only for the expectimax agent)"
+)
+@click.option(
+    "--network-path", type=str, default=None,
+    help="Directory of an n-tuple network trained by ntuple.py (only for the ntuple agent)"
+)
+def main(num_games: int, agent_type: str, seed: int, workers: int, time_limit: float, network_path: str):
+    if seed is None:
+        seed = random.getrandbits(32)
+    agent_kwargs = {}
+    if time_limit is not None:
+        if agent_type != "expectimax":
+            raise Exception("Only the expectimax agent has a time limit! See command documentation")
+        agent_kwargs["time_limit"] = time_limit
+    if network_path is not None:
+        if agent_type != "ntuple":
+            raise Exception("Only the ntuple agent uses a network! See command documentation")
+        agent_kwargs["network_path"] = network_path
+
+    summary = summarize(run_games(agent_type, num_games, base_seed=seed, max_workers=workers,
+                                  agent_kwargs=agent_kwargs))
+    print(f"Played {summary['num_games']} games (base seed {seed})")
+    print(f"Max Score = {summary['max_score']}")
+    print(f"Min Score = {summary['min_score']}")
+    print(f"Average Score = {summary['avg_score']}")
+    print(f"Score Standard Deviation = {summary['score_stddev']}")
+    print(f"Average Moves = {summary['avg_moves']}")
+    for max_tile, rate in summary["max_tile_rates"].items():
+        print(f"Max Tile {max_tile}: {rate:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import sqlite3
+import time
+
+DEFAULT_MAX_ENTRIES = 5000000
+# number of stores (and read hits) buffered in memory before they are written
+# to the database in a single transaction
+FLUSH_INTERVAL = 10000
+
+
+def _to_signed(key):
+    # SQLite integers are signed 64-bit
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+class SolutionCache:
+    """
+    Persistent table of search results, stored in a SQLite database so they can
+    be reused across runs. Implements the same probe/store interface as
+    search.TranspositionTable, with keys from GameState.search_key().
+
+    The database uses write-ahead logging, so many processes can read it
+    concurrently while one of them writes. Writes are buffered and flushed in
+    batches. When the database grows past max_entries, the least recently used
+    entries are evicted.
+    """
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.pending_entries = {}
+        self.pending_hits = set([])
+        self._conn = None
+
+    @property
+    def conn(self):
+        # opened lazily, so that the cache can be pickled and sent to worker processes
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS solutions ("
+                "key INTEGER PRIMARY KEY, depth INTEGER, value REAL, best_mask INTEGER, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used)")
+            self._conn.commit()
+        return self._conn
+
+    def __getstate__(self):
+        self.flush()
+        state = self.__dict__.copy()
+        state["_conn"] = None
+        state["pending_entries"] = {}
+        state["pending_hits"] = set([])
+        return state
+
+    def __len__(self):
+        self.flush()
+        return self.conn.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    def probe(self, key):
+        if key in self.pending_entries:
+            return self.pending_entries[key]
+
+        row = self.conn.execute(
+            "SELECT depth, value, best_mask FROM solutions WHERE key = ?", (_to_signed(key),)
+        ).fetchone()
+        if row is None:
+            return None
+        self.pending_hits.add(key)
+        if len(self.pending_hits) >= self.flush_interval:
+            self.flush()
+        return row
+
+    def store(self, key, depth, value, best_mask):
+        entry = self.pending_entries.get(key)
+        if entry is not None and entry[0] > depth:
+            return
+        self.pending_entries[key] = (depth, value, best_mask)
+        if len(self.pending_entries) >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_entries and not self.pending_hits:
+            return
+
+        now = time.time()
+        with self.conn:
+            # only replace an existing entry with the result of a search that is at least as deep
+            self.conn.executemany(
+                "INSERT INTO solutions (key, depth, value, best_mask, last_used) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET depth = excluded.depth, value = excluded.value, "
+                "best_mask = excluded.best_mask, last_used = excluded.last_used "
+                "WHERE excluded.depth >= solutions.depth",
+                [
+                    (_to_signed(key), depth, value, best_mask, now)
+                    for key, (depth, value, best_mask) in self.pending_entries.items()
+                ],
+            )
+            self.conn.executemany(
+                "UPDATE solutions SET last_used = ? WHERE key = ?",
+                [(now, _to_signed(key)) for key in self.pending_hits],
+            )
+            self._evict()
+        self.pending_entries = {}
+        self.pending_hits = set([])
+
+    def _evict(self):
+        num_entries = self.conn.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+        if num_entries > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM solutions WHERE key IN "
+                "(SELECT key FROM solutions ORDER BY last_used LIMIT ?)",
+                (num_entries - self.max_entries,),
+            )
+
+    def close(self):
+        self.flush()
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
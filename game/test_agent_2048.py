@@ -0,0 +1,63 @@
+import random
+import unittest
+from agent_2048 import ExpectimaxAgent, heuristic
+from bitboard import BitboardState, to_board
+from game_engine import GameState
+
+class TestAgent2048(unittest.TestCase):
+    def test_heuristic(self):
+        monotonic = to_board([[5, 4, 3, 2], [4, 3, 2, 1], [3, 2, 1, 0], [2, 1, 0, 0]])
+        scattered = to_board([[5, 1, 3, 0], [2, 4, 1, 3], [0, 3, 2, 1], [2, 0, 4, 1]])
+        assert heuristic(monotonic) > heuristic(scattered)
+
+    def test_choose_action(self):
+        agent = ExpectimaxAgent(time_limit=None, min_depth=2)
+        state = BitboardState.from_tiles([[1, 2, 3, 4], [0, 0, 0, 5], [0, 0, 0, 0], [0, 0, 0, 0]])
+        move = agent.choose_action(state)
+        assert move in state.moves_available()
+        assert agent.last_depth == agent.depth_for_board(state.board)
+        assert len(agent.table) > 0
+
+        # the agent also plays game_engine states
+        engine_state = GameState(tiles=state.tiles)
+        assert agent.choose_action(engine_state) == move
+
+        game_over_state = BitboardState.from_tiles([[1, 2, 1, 2], [2, 1, 2, 1], [1, 2, 1, 2], [2, 1, 2, 1]])
+        assert agent.choose_action(game_over_state) is None
+
+    def test_adaptive_depth(self):
+        agent = ExpectimaxAgent(max_depth=3)
+        assert agent.depth_for_board(to_board([[1, 0, 0, 0]] + [[0] * 4] * 3)) == 1
+        assert agent.depth_for_board(to_board([[1, 2, 3, 4], [5, 6, 7, 8], [9, 1, 2, 3], [4, 0, 0, 0]])) == 3
+
+    def test_prob_cutoff(self):
+        board = to_board([[1, 2, 3, 0], [0, 0, 2, 0], [1, 0, 0, 0], [0, 0, 1, 0]])
+        agent = ExpectimaxAgent(time_limit=None, min_depth=3, prob_cutoff=0.0)
+        agent.choose_action(BitboardState(board=board))
+        pruned_agent = ExpectimaxAgent(time_limit=None, min_depth=3, prob_cutoff=0.01)
+        pruned_agent.choose_action(BitboardState(board=board))
+        assert pruned_agent.num_nodes < agent.num_nodes
+
+    def test_time_limit(self):
+        agent = ExpectimaxAgent(time_limit=0.0, min_depth=3)
+        state = BitboardState.from_tiles([[1, 2, 3, 0], [0, 0, 2, 0], [1, 0, 0, 0], [0, 0, 1, 0]])
+        assert agent.choose_action(state) in state.moves_available()
+        assert agent.last_depth < 3
+
+    def test_play_game(self):
+        agent = ExpectimaxAgent(time_limit=0.01, max_depth=2)
+        rand_gen = random.Random(0)
+        state = BitboardState()
+        state.spawn_tile(rand_gen)
+        state.spawn_tile(rand_gen)
+        for _ in range(200):
+            move = agent.choose_action(state)
+            if move is None:
+                break
+            assert state.move_tiles(move)
+            state.spawn_tile(rand_gen)
+        assert state.max_tile_value() >= 128
+
+
+if __name__ == '__main__':
+    unittest.main()
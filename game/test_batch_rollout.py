@@ -0,0 +1,76 @@
+import random
+import unittest
+import numpy as np
+import bitboard
+from agent_2048 import MonteCarloAgent
+from batch_rollout import all_moves, batch_rollouts, move_boards, spawn_tiles, transpose
+from bitboard import DIRS, BitboardState, to_board
+
+class TestBatchRollout(unittest.TestCase):
+    def setUp(self):
+        rand_gen = random.Random(0)
+        self.boards = []
+        for _ in range(200):
+            tiles = [[rand_gen.choice([0, 0, 1, 2, 3, 4, 5]) for _ in range(4)] for _ in range(4)]
+            self.boards.append(to_board(tiles))
+
+    def test_move_boards(self):
+        boards = np.array(self.boards, dtype=np.uint64)
+        assert [int(board) for board in transpose(boards)] == [bitboard.transpose(board) for board in self.boards]
+        for dir in DIRS:
+            new_boards, rewards = move_boards(boards, dir)
+            for board, new_board, reward in zip(self.boards, new_boards, rewards):
+                assert (int(new_board), int(reward)) == bitboard.move_tiles(board, dir)
+
+        _, _, valid = all_moves(boards)
+        for board, board_valid in zip(self.boards, valid):
+            assert set([dir for dir, is_valid in zip(DIRS, board_valid) if is_valid]) == bitboard.moves_available(board)
+
+    def test_spawn_tiles(self):
+        rng = np.random.default_rng(0)
+        board = to_board([[1, 0, 2, 0], [3, 3, 3, 3], [0, 1, 1, 1], [1, 1, 1, 1]])
+        full_board = to_board([[1, 2, 1, 2]] * 4)
+        boards = np.array([board] * 3000 + [full_board], dtype=np.uint64)
+        new_boards = spawn_tiles(boards, rng)
+        assert int(new_boards[-1]) == full_board
+        cell_counts = {}
+        for new_board in new_boards[:-1]:
+            spawned = int(new_board) ^ board
+            cell_idx = (spawned.bit_length() - 1) // 4
+            assert (spawned >> (4 * cell_idx)) in (1, 2)
+            cell_counts[cell_idx] = cell_counts.get(cell_idx, 0) + 1
+        assert sorted(cell_counts) == bitboard.empty_cells(board)
+        assert all([800 < count < 1200 for count in cell_counts.values()])
+
+    def test_batch_rollouts(self):
+        rng = np.random.default_rng(1)
+        boards = spawn_tiles(spawn_tiles(np.zeros(50, dtype=np.uint64), rng), rng)
+        scores, num_moves = batch_rollouts(boards, rng)
+        assert np.all(num_moves > 0)
+        assert np.all(scores >= 4 * (num_moves // 10))
+
+        scores, num_moves = batch_rollouts(boards, rng, max_moves=5)
+        assert np.all(num_moves == 5)
+
+        game_over_board = to_board([[1, 2, 1, 2], [2, 1, 2, 1], [1, 2, 1, 2], [2, 1, 2, 1]])
+        scores, num_moves = batch_rollouts(np.array([game_over_board], dtype=np.uint64), rng)
+        assert scores[0] == 0 and num_moves[0] == 0
+
+    def test_monte_carlo_agent(self):
+        agent = MonteCarloAgent(num_rollouts=50, seed=0)
+        state = BitboardState.from_tiles([[1, 2, 3, 4], [0, 0, 0, 5], [0, 1, 0, 0], [0, 0, 0, 0]])
+        assert agent.choose_action(state) in state.moves_available()
+        # a seeded agent is reproducible
+        state = BitboardState.from_tiles([[1, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11], [12, 13, 14, 2]])
+        moves = [agent.choose_action(state) for _ in range(3)]
+        agent.new_game(0)
+        assert [agent.choose_action(state) for _ in range(3)] == moves
+
+        # only one move is valid, so no rollouts are needed
+        state = BitboardState.from_tiles([[1, 2, 3, 0], [2, 3, 4, 0], [3, 4, 5, 0], [4, 5, 6, 0]])
+        assert state.moves_available() == {"Right"}
+        assert agent.choose_action(state) == "Right"
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import random
+import unittest
+import bitboard
+from bitboard import BitboardState, to_board, to_tiles, transpose, unpack_tiles
+from game_engine import GameState
+
+class TestBitboard(unittest.TestCase):
+    def test_pack_tiles(self):
+        tiles = [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11], [12, 13, 14, 15]]
+        board = to_board(tiles)
+        assert to_tiles(board) == tiles
+        assert unpack_tiles(board) == tiles
+        assert to_tiles(transpose(board)) == [list(col) for col in zip(*tiles)]
+
+    def test_tile_too_large(self):
+        # a 65536 tile is a valid game_engine tile, but doesn't fit in a nibble
+        with self.assertRaises(ValueError):
+            to_board([[16, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]])
+
+    def test_move_tiles(self):
+        state = BitboardState.from_tiles([[1, 1, 1, 1], [1, 1, 2, 0], [0, 0, 0, 3], [2, 0, 2, 2]])
+        assert state.move_tiles("Left")
+        assert state.tiles == [[2, 2, 0, 0], [2, 2, 0, 0], [3, 0, 0, 0], [3, 2, 0, 0]]
+        assert state.score == 4 + 4 + 4 + 8
+        state = BitboardState.from_tiles([[1, 2, 0, 0], [3, 0, 0, 0], [0, 0, 0, 0], [2, 1, 2, 1]])
+        assert not state.move_tiles("Left")
+        assert state.score == 0
+
+        state = BitboardState.from_tiles([[15, 0, 0, 0], [15, 0, 0, 0], [1, 0, 0, 0], [1, 0, 0, 0]])
+        assert state.moves_available() == {"Up", "Down", "Right"}
+        state.move_tiles("Down")
+        # the largest tiles can't merge
+        assert state.tiles == [[0, 0, 0, 0], [15, 0, 0, 0], [15, 0, 0, 0], [2, 0, 0, 0]]
+
+    def test_same_games_as_game_engine(self):
+        for seed in range(20):
+            state = GameState(tiles=[[0] * 4 for _ in range(4)])
+            bit_state = BitboardState()
+            state_rand_gen = random.Random(seed)
+            bit_rand_gen = random.Random(seed)
+            move_rand_gen = random.Random(seed)
+            for _ in range(2):
+                state.spawn_tile(state_rand_gen)
+                bit_state.spawn_tile(bit_rand_gen)
+            while True:
+                assert bit_state.tiles == state.tiles
+                assert bit_state.score == state.score
+                dirs = state.moves_available()
+                assert bit_state.moves_available() == dirs
+                if not dirs:
+                    break
+                dir = move_rand_gen.choice(sorted(dirs))
+
+                successors = state.successor_states(dir)
+                bit_successors = bit_state.successor_states(dir)
+                assert len(bit_successors) == len(successors)
+                for (prob, successor, reward), (bit_prob, bit_successor, bit_reward) in zip(successors, bit_successors):
+                    assert abs(bit_prob - prob) < 1e-12
+                    assert bit_successor.tiles == successor.tiles
+                    assert bit_reward == reward
+
+                assert bit_state.move_tiles(dir) == state.move_tiles(dir)
+                state.spawn_tile(state_rand_gen)
+                bit_state.spawn_tile(bit_rand_gen)
+
+    def test_game_over(self):
+        board = to_board([[1, 2, 1, 2], [2, 1, 2, 1], [1, 2, 1, 2], [2, 1, 2, 1]])
+        assert bitboard.is_game_over(board)
+        assert bitboard.moves_available(board) == set()
+        board = to_board([[1, 2, 1, 2], [2, 1, 2, 1], [1, 2, 1, 2], [2, 1, 2, 2]])
+        assert not bitboard.is_game_over(board)
+        assert bitboard.moves_available(board) == {"Up", "Down", "Left", "Right"}
+        # two 32768 tiles can't merge
+        assert bitboard.is_game_over(to_board([[15, 15, 1, 2], [2, 1, 2, 1], [1, 2, 1, 2], [2, 1, 2, 1]]))
+
+    def test_moves_available_matches_moves(self):
+        rand_gen = random.Random(0)
+        for _ in range(1000):
+            board = to_board([[rand_gen.choice([0, 1, 2, 3]) for j in range(4)] for i in range(4)])
+            dirs = set([dir for dir in bitboard.DIRS if bitboard.move_tiles(board, dir)[0] != board])
+            assert bitboard.moves_available(board) == dirs
+            assert bitboard.is_game_over(board) == (not dirs)
+
+    def test_invalid_direction(self):
+        with self.assertRaises(ValueError):
+            bitboard.move_tiles(0, "Sideways")
+
+
+if __name__ == '__main__':
+    unittest.main()
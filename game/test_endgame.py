@@ -0,0 +1,131 @@
+import itertools
+import os
+import random
+import tempfile
+import unittest
+from deck import Card
+from endgame import EndgameTablebase, canonical_key, generate_tablebase, solve
+from gamestate import GameState
+from search import EXACT_DEPTH, TranspositionTable, search_value
+
+class TestEndgame(unittest.TestCase):
+    def endgame_state(self, card_piles, lucky_card=Card("7", "h")):
+        state = GameState()
+        state.start_new_game(lucky_card=lucky_card, card_piles=card_piles)
+        state.discards_remaining = 1
+        return state
+
+    def test_canonical_key(self):
+        state = self.endgame_state([
+            [[Card("K", "h"), Card("2", "c")], [], [Card("K", "s")]],
+            [[Card("3", "c")], [Card("A", "s"), Card("Q", "d")], []],
+            [[], [], [Card("K", "c")]]
+        ])
+        # the same position with the piles in the top row swapped, and with
+        # spades and clubs swapped
+        other_state = self.endgame_state([
+            [[Card("K", "c")], [], [Card("K", "h"), Card("2", "s")]],
+            [[Card("3", "s")], [Card("A", "c"), Card("Q", "d")], []],
+            [[], [], [Card("K", "s")]]
+        ])
+        assert canonical_key(state) == canonical_key(other_state)
+
+        # the lucky suit can't be relabeled
+        other_state = self.endgame_state([
+            [[Card("K", "d"), Card("2", "c")], [], [Card("K", "s")]],
+            [[Card("3", "c")], [Card("A", "s"), Card("Q", "h")], []],
+            [[], [], [Card("K", "c")]]
+        ])
+        assert canonical_key(state) != canonical_key(other_state)
+
+        other_state = state.copy()
+        other_state.discards_remaining = 0
+        assert canonical_key(state) != canonical_key(other_state)
+
+        # the unseen cards can be in any of the piles
+        state = self.endgame_state([
+            [[Card("K", "h"), Card("2", "c")], [], [Card("K", "s")]],
+            [[Card("3", "c")], [Card("A", "s"), Card("Q", "d")], []],
+            [[], [], [Card("K", "c")]]
+        ])
+        other_state = self.endgame_state([
+            [[Card("K", "h"), Card("Q", "d")], [], [Card("K", "s")]],
+            [[Card("3", "c")], [Card("A", "s"), Card("2", "c")], []],
+            [[], [], [Card("K", "c")]]
+        ])
+        assert canonical_key(state) == canonical_key(other_state)
+
+        # but which cards are unseen does matter
+        other_state = self.endgame_state([
+            [[Card("K", "h"), Card("2", "c")], [], [Card("K", "s")]],
+            [[Card("3", "c")], [Card("A", "s"), Card("Q", "s")], []],
+            [[], [], [Card("K", "c")]]
+        ])
+        assert canonical_key(state) != canonical_key(other_state)
+
+    def endgame_from_deck(self, pile_sizes):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+        for r in range(3):
+            for c in range(3):
+                state.card_num_piles[r][c] = state.card_num_piles[r][c][:pile_sizes[r][c]]
+        # the cards that were taken off the piles have been seen
+        hidden_card_nums = set([card_num for row in state.card_num_piles for pile in row for card_num in pile[1:]])
+        state.dead_card_nums = set(range(52)) - hidden_card_nums
+        return state
+
+    def test_solve_without_hidden_cards(self):
+        # with nothing left to reveal, the expected value is the value of a full search
+        state = self.endgame_from_deck([[1, 1, 1], [1, 1, 1], [1, 1, 1]])
+        values = {}
+        value = solve(state, values)
+        assert value == search_value(state, state.num_cards())[0]
+        assert values[canonical_key(state)] == value
+
+    def test_solve(self):
+        state = self.endgame_from_deck([[2, 1, 1], [1, 2, 1], [1, 1, 1]])
+        values = {}
+        value = solve(state, values)
+        assert values[canonical_key(state)] == value
+
+        # the value doesn't depend on where the unseen cards are, and is at
+        # most the average value when the unseen cards are known
+        hidden_cards = [state.card_num_piles[0][0][1], state.card_num_piles[1][1][1]]
+        perfect_values = []
+        for card_nums in itertools.permutations(hidden_cards):
+            other_state = state.copy()
+            other_state.card_num_piles[0][0][1] = card_nums[0]
+            other_state.card_num_piles[1][1][1] = card_nums[1]
+            assert canonical_key(other_state) == canonical_key(state)
+            assert solve(other_state, {}) == value
+            perfect_values.append(search_value(other_state, other_state.num_cards())[0])
+        assert solve(state.determinize(random.Random(0)), {}) == value
+        assert value <= sum(perfect_values) / len(perfect_values) + 1e-9
+
+        # a search finds the expected value in the tablebase instead of
+        # searching, and stores it in the table as exact
+        tablebase = EndgameTablebase.from_dict(values, max_cards=state.num_cards())
+        assert tablebase.lookup(state) == value
+        table = TranspositionTable()
+        assert search_value(state, 1, table=table, tablebase=tablebase) == (value, None)
+        assert table.probe(state.search_key()) == (EXACT_DEPTH, value, None)
+        assert search_value(state, 3, table=table) == (value, None)
+
+    def test_tablebase(self):
+        tablebase = generate_tablebase(20, max_cards=12, seed=123)
+        assert len(tablebase) > 0
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "tablebase.npz")
+            tablebase.save(path)
+            loaded_tablebase = EndgameTablebase.load(path)
+        assert len(loaded_tablebase) == len(tablebase)
+        assert loaded_tablebase.max_cards == 12
+
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+        assert loaded_tablebase.lookup(state) is None
+
+
+if __name__ == '__main__':
+    unittest.main()
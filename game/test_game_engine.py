@@ -0,0 +1,132 @@
+import random
+import tempfile
+import unittest
+from agent_2048 import GreedyAgent2048
+from bitboard import DIRS, to_tiles
+from game_engine import BINARY_HEADER, BINARY_RECORD, NO_MOVE, Game, GameState
+
+class TestGameEngine(unittest.TestCase):
+    def setUp(self):
+        self.state = GameState(tiles=[[1, 1, 0, 0], [2, 0, 0, 0], [0, 0, 3, 0], [0, 0, 0, 1]])
+
+    def test_moves_available(self):
+        rand_gen = random.Random(0)
+        for _ in range(1000):
+            state = GameState(tiles=[[rand_gen.choice([0, 1, 2, 3]) for j in range(4)] for i in range(4)])
+            assert state.moves_available() == state.scan_moves_available()
+            assert state.is_game_over() == (not state.scan_moves_available())
+
+        # tiles that don't fit in a bitboard fall back to the scan
+        state = GameState(tiles=[[16, 16, 1, 2], [2, 1, 2, 1], [1, 2, 1, 2], [2, 1, 2, 1]])
+        assert state.moves_available() == {"Left", "Right"}
+        assert not state.is_game_over()
+
+    def test_move_tiles(self):
+        rand_gen = random.Random(0)
+        for _ in range(1000):
+            tiles = [[rand_gen.choice([0, 1, 2, 3, 14]) for j in range(4)] for i in range(4)]
+            state = GameState(tiles=tiles, score=10)
+            scan_state = state.copy()
+            for dir in DIRS:
+                assert state.move_tiles(dir) == scan_state.scan_move_tiles(dir)
+                assert state.tiles == scan_state.tiles
+                assert state.score == scan_state.score
+
+        # tiles that don't fit in a bitboard fall back to the scan
+        state = GameState(tiles=[[16, 16, 1, 2], [2, 1, 2, 1], [1, 2, 1, 2], [2, 1, 2, 1]])
+        assert state.move_tiles("Left")
+        assert state.tiles[0] == [17, 1, 2, 0]
+        assert state.score == 1 << 17
+
+    def test_spawn_outcomes(self):
+        after_state, reward = self.state.after_move("Left")
+        assert reward == 4
+        outcomes = list(after_state.spawn_outcomes())
+        assert len(outcomes) == 2 * after_state.num_empty_tiles()
+        assert abs(sum([prob for prob, _, _ in outcomes]) - 1.0) < 1e-12
+        assert outcomes[0] == (0.9 / 12, (0, 1), 1)
+        assert outcomes[1][1:] == ((0, 1), 2)
+        # the state isn't copied or changed
+        assert after_state.tiles[0] == [2, 0, 0, 0]
+        assert len(list(after_state.spawn_outcomes(prob_two_tile=1.0))) == after_state.num_empty_tiles()
+
+        # nothing can spawn on a full board
+        full_state = GameState(tiles=[[1, 2, 1, 2], [2, 1, 2, 1], [1, 2, 1, 2], [2, 1, 2, 1]])
+        assert list(full_state.spawn_outcomes()) == []
+        assert full_state.expected_spawn_value(lambda state: 1.0) == 0.0
+
+    def test_successor_states(self):
+        successors = self.state.successor_states("Left")
+        after_state, _ = self.state.after_move("Left")
+        assert len(successors) == 24
+        for (prob, successor, reward), (outcome_prob, loc, tile) in zip(successors, after_state.spawn_outcomes()):
+            assert prob == outcome_prob
+            assert successor == after_state.with_spawn(loc, tile)
+            assert successor.tiles[loc[0]][loc[1]] == tile
+            assert reward == 4
+
+    def test_expected_spawn_value(self):
+        after_state, _ = self.state.after_move("Left")
+        before_tiles = [row.copy() for row in after_state.tiles]
+        expected_value = after_state.expected_spawn_value(lambda state: state.num_tiles())
+        assert abs(expected_value - (after_state.num_tiles() + 1)) < 1e-9
+        assert after_state.tiles == before_tiles
+
+        expected_duplicated = after_state.expected_spawn_value(lambda state: state.duplicated_tile_values())
+        assert expected_duplicated == sum([
+            prob * successor.duplicated_tile_values() for prob, successor, _ in self.state.successor_states("Left")
+        ])
+
+    def play_saved_game(self, game_dir, file_format):
+        agent = GreedyAgent2048()
+        game = Game(verbose=False)
+        game.new_game(random_seed=5, save_game=True, game_dir=game_dir, file_format=file_format)
+        states = [game.state.copy()]
+        actions = []
+        while not game.state.game_over:
+            actions.append(agent.choose_action(game.state))
+            game.move(actions[-1])
+            states.append(game.state.copy())
+        game.close()
+        return (game.game_filename, states, actions)
+
+    def test_csv_game_file(self):
+        with tempfile.TemporaryDirectory() as game_dir:
+            game_filename, states, actions = self.play_saved_game(game_dir, "csv")
+            assert game_filename.endswith(".csv")
+            with open(game_filename, "r") as game_file:
+                lines = game_file.readlines()
+        assert len(lines) == len(states)
+        for line, state in zip(lines, states):
+            assert GameState.from_csv_line(line) == state
+        assert [line.split(",")[-1].strip() for line in lines[:-1]] == actions
+        assert states[-1].game_over
+
+    def test_binary_game_file(self):
+        with tempfile.TemporaryDirectory() as game_dir:
+            game_filename, states, actions = self.play_saved_game(game_dir, "binary")
+            assert game_filename.endswith(".bin")
+            with open(game_filename, "rb") as game_file:
+                data = game_file.read()
+        assert data.startswith(BINARY_HEADER)
+        records = list(BINARY_RECORD.iter_unpack(data[len(BINARY_HEADER):]))
+        assert len(records) == len(states)
+        for (board, score, dir_idx, game_over), state in zip(records, states):
+            assert to_tiles(board) == state.tiles
+            assert score == state.score
+            assert bool(game_over) == state.game_over
+        assert [DIRS[record[2]] for record in records[:-1]] == actions
+        assert records[-1][2] == NO_MOVE
+
+    def test_binary_game_file_tile_too_large(self):
+        with tempfile.TemporaryDirectory() as game_dir:
+            game = Game(verbose=False)
+            game.new_game(random_seed=5, save_game=True, game_dir=game_dir, file_format="binary")
+            state = GameState(tiles=[[16, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 1]])
+            with self.assertRaises(ValueError):
+                game.game_writer.write_state(state)
+            game.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+from agent_2048 import GreedyAgent2048
+from game_engine import Game
+from game_gui import AutoPlayer
+
+class TestAutoPlayer(unittest.TestCase):
+    def test_plays_to_game_over(self):
+        game = Game(verbose=False)
+        game.new_game(random_seed=3, save_game=False)
+        autoplayer = AutoPlayer(game, GreedyAgent2048())
+        autoplayer.start()
+        autoplayer.thread.join(timeout=30)
+        assert not autoplayer.thread.is_alive()
+
+        state = autoplayer.latest_state()
+        assert autoplayer.finished
+        assert state == game.state
+        assert state.game_over
+        # nothing more is posted after the game ends
+        assert autoplayer.latest_state() is None
+        autoplayer.stop()
+
+    def test_stop(self):
+        game = Game(verbose=False)
+        game.new_game(random_seed=3, save_game=False)
+        autoplayer = AutoPlayer(game, GreedyAgent2048())
+        autoplayer.stop_event.set()
+        autoplayer.start()
+        autoplayer.stop()
+        assert autoplayer.latest_state() is None
+        assert autoplayer.finished
+        assert not game.state.game_over
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from agent_2048 import GreedyAgent2048
+from bitboard import DIRS
+from game_engine import NO_MOVE, Game
+from game_loader import GameFile, load_game_arrays
+
+class TestGameLoader(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.game_filenames = {}
+        for seed, file_format in enumerate(["csv", "binary"]):
+            agent = GreedyAgent2048()
+            game = Game(verbose=False)
+            game.new_game(random_seed=seed, save_game=True, game_dir=self.tmp_dir.name, file_format=file_format)
+            states = [game.state.copy()]
+            actions = []
+            while not game.state.game_over:
+                actions.append(agent.choose_action(game.state))
+                game.move(actions[-1])
+                states.append(game.state.copy())
+            game.close()
+            self.game_filenames[file_format] = (game.game_filename, states, actions)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_random_access(self):
+        for game_filename, states, actions in self.game_filenames.values():
+            with GameFile(game_filename) as game_file:
+                assert len(game_file) == len(states)
+                for turn in [len(states) - 1, 0, len(states) // 2, 1]:
+                    state, action = game_file[turn]
+                    assert state == states[turn]
+                    assert action == (actions[turn] if turn < len(actions) else None)
+                assert game_file[-1][0].game_over
+                with self.assertRaises(IndexError):
+                    game_file[len(states)]
+
+    def test_load_game_arrays(self):
+        for game_filename, states, actions in self.game_filenames.values():
+            arrays = load_game_arrays(game_filename)
+            assert arrays["tiles"].shape == (len(states), 16)
+            for turn, state in enumerate(states):
+                assert arrays["tiles"][turn].tolist() == [tile for row in state.tiles for tile in row]
+                assert arrays["score"][turn] == state.score
+                assert arrays["game_over"][turn] == state.game_over
+            assert arrays["action"].tolist() == [DIRS.index(action) for action in actions] + [NO_MOVE]
+
+    def test_partial_record(self):
+        # a binary file cut off in the middle of its last record
+        game_filename, states, actions = self.game_filenames["binary"]
+        with open(game_filename, "rb") as game_file:
+            data = game_file.read()
+        partial_filename = os.path.join(self.tmp_dir.name, "partial.bin")
+        with open(partial_filename, "wb") as partial_file:
+            partial_file.write(data[:-3])
+
+        arrays = load_game_arrays(partial_filename)
+        assert arrays["tiles"].shape == (len(states) - 1, 16)
+        assert arrays["score"].tolist() == [state.score for state in states[:-1]]
+        with GameFile(partial_filename) as game_file:
+            assert len(game_file) == len(states) - 1
+
+    def test_empty_file(self):
+        empty_filename = os.path.join(self.tmp_dir.name, "empty.csv")
+        open(empty_filename, "wb").close()
+        with self.assertRaises(ValueError):
+            GameFile(empty_filename)
+        with self.assertRaises(ValueError):
+            load_game_arrays(empty_filename)
+
+
+if __name__ == '__main__':
+    unittest.main()
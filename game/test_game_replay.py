@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from agent import GreedyGameAgent, RandomGameAgent
+from game_recorder import play_game
+from game_replay import parse_board, parse_records, replay_directory, replay_file
+
+class TestGameReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.record_paths = []
+        for i, agent in enumerate([RandomGameAgent(), GreedyGameAgent(), RandomGameAgent()]):
+            record_path = os.path.join(self.tmp_dir.name, f"game{i}.txt")
+            play_game(record_path, agent)
+            self.record_paths.append(record_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_parse_board(self):
+        upcards, discards_remaining, lucky_suit = parse_board(
+            "Ad 5d 2d / 3h -- 7c / 8h 7d -- ; Discards = 1, Lucky suit = c\n"
+        )
+        assert upcards == [["Ad", "5d", "2d"], ["3h", None, "7c"], ["8h", "7d", None]]
+        assert discards_remaining == 1
+        assert lucky_suit == "c"
+
+    def test_replay_file(self):
+        for record_path in self.record_paths:
+            result = replay_file(record_path, with_turns=True)
+            assert result["errors"] == []
+            assert len(result["scores"]) == 1
+            assert result["num_turns"] == len(result["turns"]) > 0
+            assert sum([turn["reward"] for turn in result["turns"]]) == result["scores"][0]
+
+    def test_replay_concatenated_records(self):
+        lines = []
+        for record_path in self.record_paths:
+            with open(record_path, "r") as record_file:
+                lines.extend(record_file.read().splitlines())
+        games = list(parse_records(lines))
+        assert len(games) == 3
+        assert [game["final_score"] for game in games] == [
+            replay_file(record_path)["scores"][0] for record_path in self.record_paths
+        ]
+
+    def test_replay_detects_errors(self):
+        with open(self.record_paths[1], "r") as record_file:
+            lines = record_file.read().splitlines()
+        for idx, line in enumerate(lines):
+            if line.startswith("Turn 1:"):
+                # change the reward of the first turn
+                prefix, reward = line.rsplit(", ", 1)
+                lines[idx] = f"{prefix}, {float(reward) + 5}"
+        with open(self.record_paths[1], "w") as record_file:
+            record_file.write("\n".join(lines))
+
+        result = replay_file(self.record_paths[1])
+        assert any(["turn 1:" in error for error in result["errors"]])
+        assert any(["final score" in error for error in result["errors"]])
+
+    def test_replay_directory(self):
+        results = list(replay_directory(self.tmp_dir.name, max_workers=2))
+        assert len(results) == 3
+        assert all([result["errors"] == [] for result in results])
+
+    def test_replay_directory_with_truncated_file(self):
+        # cut the second file off in the middle of a board line
+        with open(self.record_paths[1], "r") as record_file:
+            text = record_file.read()
+        board_start = text.index("\n", text.index("Turn 1:")) + 1
+        with open(self.record_paths[1], "w") as record_file:
+            record_file.write(text[:board_start + 12])
+
+        results = list(replay_directory(self.tmp_dir.name, max_workers=2))
+        assert len(results) == 3
+        assert [result["failed"] for result in results] == [False, True, False]
+        assert len(results[1]["errors"]) == 1
+        assert results[0]["errors"] == [] and results[2]["errors"] == []
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,8 @@
+import random
 import unittest
 import numpy as np
-from deck import SUITS, RANKS, Card
-from gamestate import GameState
+from deck import SUITS, RANKS, Card, int_to_card, str_to_card
+from gamestate import GameState, SearchState, piles_to_mask
 
 class TestGameState(unittest.TestCase):
     def test_new_game_state(self):
@@ -586,5 +587,104 @@ class TestGameState(unittest.TestCase):
         assert len(state.actions()) == 3
         assert not state.is_game_over()
 
+    def test_from_board(self):
+        upcards = [
+            ["Ks", "2c", None],
+            ["Kd", "7h", "3c"],
+            ["4s", None, "Ac"]
+        ]
+        pile_sizes = [[5, 8, 0], [3, 6, 1], [2, 0, 1]]
+        dead_cards = ["Qs", "9d", "Th"]
+        state = GameState.from_board(
+            upcards=upcards, pile_sizes=pile_sizes, dead_cards=dead_cards,
+            lucky_suit="h", discards_remaining=1, rand_gen=random.Random(123)
+        )
+
+        assert (state.pile_sizes() == np.array(pile_sizes)).all()
+        for r in range(3):
+            for c in range(3):
+                if upcards[r][c] is None:
+                    assert state.is_pile_empty(r, c)
+                else:
+                    assert int_to_card(state.upcard_nums()[r][c]) == str_to_card(upcards[r][c])
+        assert state.lucky_suit == "h"
+        assert state.discards_remaining == 1
+        # dead cards are the given dead cards plus the upcards
+        assert len(state.dead_card_nums) == len(dead_cards) + 7
+
+        # hidden cards are all distinct and none of them are dead
+        hidden_card_nums = []
+        for r in range(3):
+            for c in range(3):
+                hidden_card_nums.extend(state.card_num_piles[r][c][1:])
+        assert len(hidden_card_nums) == 19
+        assert len(set(hidden_card_nums)) == 19
+        assert not set(hidden_card_nums).intersection(state.dead_card_nums)
+
+        # a pair of kings across rows is available
+        assert set([(0, 0), (1, 0)]) in [action[0] for action in state.actions()]
+
+    def test_state_key(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+
+        assert state.state_key() == state.copy().state_key()
+        assert 0 <= state.state_key() < 2 ** 64
+        new_state, reward = state.discard_from_pile(0, 0)
+        assert new_state.state_key() != state.state_key()
+        new_state.discards_remaining = state.discards_remaining
+        assert new_state.state_key() != state.state_key()
+
+        # the hidden cards aren't part of the key
+        assert state.determinize(random.Random(123)).state_key() == state.state_key()
+
+        # but the search key has the hidden cards too
+        assert state.search_key() == state.copy().search_key()
+        assert state.determinize(random.Random(123)).search_key() != state.search_key()
+
+    def test_determinize(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+
+        new_state = state.determinize(random.Random(123))
+        assert new_state.upcard_nums() == state.upcard_nums()
+        assert (new_state.pile_sizes() == state.pile_sizes()).all()
+        assert new_state.dead_card_nums == state.dead_card_nums
+        assert new_state.card_num_piles != state.card_num_piles
+
+        hidden_card_nums = []
+        for r in range(3):
+            for c in range(3):
+                hidden_card_nums.extend(new_state.card_num_piles[r][c][1:])
+        assert len(set(hidden_card_nums)) == len(hidden_card_nums)
+        assert not set(hidden_card_nums).intersection(state.dead_card_nums)
+
+    def test_do_undo_move(self):
+        rand_gen = random.Random(123)
+        for seed in range(5):
+            state = GameState()
+            state.start_new_game_from_deck(seed=seed)
+            while not state.is_game_over():
+                actions = state.actions()
+                moves = state.moves()
+                assert [(piles_to_mask(action[0]), action[2]) for action in actions] == moves
+
+                search_state = SearchState(state)
+                assert search_state.moves() == moves
+                for (piles, next_state, reward), (mask, move_reward) in zip(actions, moves):
+                    token = search_state.do_move(mask)
+                    assert search_state.to_game_state() == next_state
+                    assert search_state.moves() == next_state.moves()
+                    assert search_state.num_cards() == next_state.num_cards()
+                    assert search_state.state_key() == next_state.state_key()
+                    assert search_state.search_key() == next_state.search_key()
+                    search_state.undo_move(token)
+                    assert search_state.to_game_state() == state
+                    assert search_state.state_key() == state.state_key()
+                    assert search_state.search_key() == state.search_key()
+                    assert search_state.moves() == moves
+
+                state = rand_gen.choice(actions)[1]
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from move_server import MoveServer, recommend_action
+
+BOARD = {
+    "upcards": [["Ks", "6c", "9d"], ["Kd", "7h", "3c"], ["4s", "Jc", "Ac"]],
+    "pile_sizes": [[8, 8, 8], [7, 6, 5], [4, 3, 2]],
+    "dead_cards": ["Qh"],
+    "lucky_suit": "h",
+    "discards_remaining": 2,
+}
+
+class TestMoveServer(unittest.IsolatedAsyncioTestCase):
+    def test_recommend_action(self):
+        result = recommend_action("greedy", BOARD, seed=123)
+        # the best hand is the pair of kings
+        assert result["piles"] == [[0, 0], [1, 0]]
+        assert result["reward"] == 10
+
+    def test_recommend_action_deadline(self):
+        # the search stops at the deadline: with no time left, the search agent
+        # falls back to the greedy action
+        result = recommend_action("search", BOARD, seed=123, end_time=time.time())
+        assert result["piles"] == [[0, 0], [1, 0]]
+
+        start_time = time.perf_counter()
+        result = recommend_action("iterative", BOARD, seed=123, end_time=time.time() + 0.3)
+        assert result["piles"] is not None
+        assert time.perf_counter() - start_time < 1.0
+
+    async def test_concurrent_requests(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            socket_path = os.path.join(tmp_dir, "server.sock")
+            server = MoveServer(agent_type="greedy", max_workers=2)
+            await server.start_unix(socket_path)
+            try:
+                reader, writer = await asyncio.open_unix_connection(socket_path)
+                for request_id in range(4):
+                    request = {"id": request_id, "board": BOARD, "seed": request_id}
+                    writer.write((json.dumps(request) + "\n").encode())
+                writer.write((json.dumps({"id": 4, "agent": "unknown", "board": BOARD}) + "\n").encode())
+                await writer.drain()
+
+                responses = {}
+                for _ in range(5):
+                    response = json.loads(await reader.readline())
+                    responses[response["id"]] = response
+                for request_id in range(4):
+                    assert responses[request_id]["piles"] == [[0, 0], [1, 0]]
+                    assert responses[request_id]["latency_ms"] > 0
+                assert "error" in responses[4]
+
+                writer.write((json.dumps({"id": 5, "type": "metrics"}) + "\n").encode())
+                await writer.drain()
+                metrics = json.loads(await reader.readline())["metrics"]
+                assert metrics["requests"] == 5
+                assert metrics["errors"] == 1
+                assert metrics["p50_ms"] <= metrics["max_ms"]
+
+                writer.close()
+                await writer.wait_closed()
+            finally:
+                await server.close()
+
+    async def test_invalid_requests(self):
+        server = MoveServer(agent_type="greedy", max_workers=1)
+        try:
+            requests = [
+                ["not", "a", "dict"],
+                {"id": 1, "agent": ["greedy"], "board": BOARD},
+                {"id": 2},
+                {"id": 3, "board": "board"},
+                {"id": 4, "board": BOARD, "deadline": "soon"},
+                # fails in the worker with a TypeError
+                {"id": 5, "board": dict(BOARD, pile_sizes=8)},
+            ]
+            for request in requests:
+                response = await server.handle_request(request)
+                assert "error" in response
+                assert response["id"] == (request.get("id") if isinstance(request, dict) else None)
+            metrics = server.metrics.snapshot()
+            assert metrics["requests"] == len(requests)
+            assert metrics["errors"] == len(requests)
+        finally:
+            await server.close()
+
+    async def test_deadline_reaches_search(self):
+        server = MoveServer(agent_type="iterative", max_workers=1, deadline=0.5)
+        try:
+            response = await server.handle_request({"id": 1, "board": BOARD})
+            assert "error" not in response
+            assert server.metrics.snapshot()["timeouts"] == 0
+        finally:
+            await server.close()
+
+    async def test_deadline_exceeded(self):
+        server = MoveServer(agent_type="greedy", max_workers=1, deadline=0.0)
+        try:
+            response = await server.handle_request({"id": 1, "board": BOARD})
+            assert "error" in response
+            assert server.metrics.snapshot()["timeouts"] == 1
+        finally:
+            await server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
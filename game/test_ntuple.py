@@ -0,0 +1,63 @@
+import random
+import tempfile
+import unittest
+import numpy as np
+from agent_2048 import ExpectimaxAgent, NTupleAgent
+from bitboard import BitboardState, to_board, to_tiles
+from ntuple import NTupleNetwork, symmetries, train
+
+class TestNTuple(unittest.TestCase):
+    def test_symmetries(self):
+        tiles = [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 0]]
+        sym_tiles = [to_tiles(board) for board in symmetries(to_board(tiles))]
+        expected_tiles = []
+        rotated = tiles
+        for _ in range(4):
+            expected_tiles.append(rotated)
+            expected_tiles.append([row[::-1] for row in rotated])
+            rotated = [list(row) for row in zip(*rotated[::-1])]
+        assert sorted(sym_tiles) == sorted(expected_tiles)
+
+    def test_value_is_symmetric(self):
+        network = NTupleNetwork()
+        network.weights[:] = np.random.RandomState(0).rand(*network.weights.shape)
+        board = to_board([[1, 2, 3, 0], [0, 4, 0, 0], [5, 0, 0, 1], [0, 0, 2, 0]])
+        values = [network.value(sym_board) for sym_board in symmetries(board)]
+        assert max(values) - min(values) < 1e-3
+
+    def test_update(self):
+        network = NTupleNetwork()
+        board = to_board([[1, 2, 3, 0], [0, 4, 0, 0], [5, 0, 0, 1], [0, 0, 2, 0]])
+        network.update(board, 10.0)
+        # features that appear more than once (e.g. symmetric empty squares) get the update more than once
+        assert network.value(board) >= 10.0 - 1e-4
+        assert network.value(to_board([[1, 1, 1, 1]] * 4)) == 0
+
+    def test_train_and_play(self):
+        network = NTupleNetwork()
+        scores = train(network, 20, seed=0, report_interval=0)
+        assert len(scores) == 20
+        assert np.any(network.weights != 0)
+
+        with tempfile.TemporaryDirectory() as network_path:
+            network.save(network_path)
+            agent = NTupleAgent(network_path=network_path)
+            assert isinstance(agent.network.weights, np.memmap)
+            assert np.array_equal(agent.network.weights, network.weights)
+
+            state = BitboardState()
+            rand_gen = random.Random(1)
+            state.spawn_tile(rand_gen)
+            state.spawn_tile(rand_gen)
+            for _ in range(20):
+                move = agent.choose_action(state)
+                assert state.move_tiles(move)
+                state.spawn_tile(rand_gen)
+            del agent
+
+        expectimax_agent = ExpectimaxAgent(time_limit=None, evaluator=network.value)
+        assert expectimax_agent.choose_action(state) in state.moves_available()
+
+
+if __name__ == '__main__':
+    unittest.main()
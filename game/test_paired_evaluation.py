@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+import unittest
+from paired_evaluation import generate_deals, paired_comparison, play_corpus
+
+class TestPairedEvaluation(unittest.TestCase):
+    def test_generate_deals(self):
+        deals = generate_deals(100, seed=5)
+        assert len(set(deals)) == 100
+        assert deals == generate_deals(100, seed=5)
+        assert deals != generate_deals(100, seed=6)
+
+    def test_paired_comparison(self):
+        scores_a = np.array([500, 800, 1200, 300, 700], dtype=np.float64)
+        scores_b = np.array([560, 800, 1250, 280, 790], dtype=np.float64)
+        comparison = paired_comparison(scores_a, scores_b)
+        assert comparison["num_deals"] == 5
+        assert comparison["mean_diff"] == 36
+        assert (comparison["wins"], comparison["losses"], comparison["ties"]) == (3, 1, 1)
+        # the deals vary much more than the differences between the agents
+        assert comparison["variance_reduction"] > 10
+
+    def test_play_corpus(self):
+        deals = generate_deals(12, seed=1)
+        scores = play_corpus(["random", "greedy"], deals, max_workers=2, chunk_size=5)
+        assert set(scores) == {"random", "greedy"}
+        assert all([len(agent_scores) == len(deals) for agent_scores in scores.values()])
+
+        # an independent run, split into different chunks over a different
+        # number of workers, gets the same score on every deal
+        other_scores = play_corpus(["random", "greedy"], deals, max_workers=1, chunk_size=12)
+        for agent_type in scores:
+            assert np.array_equal(scores[agent_type], other_scores[agent_type])
+            comparison = paired_comparison(scores[agent_type], other_scores[agent_type])
+            assert comparison["ties"] == len(deals)
+
+    def test_play_corpus_across_processes(self):
+        # the scores don't depend on the hash seed of the process, so runs in
+        # different processes pair up
+        script = (
+            "import json, sys\n"
+            "from paired_evaluation import generate_deals, play_corpus\n"
+            "scores = play_corpus(['random', 'greedy'], generate_deals(8, seed=2), max_workers=1)\n"
+            "json.dump({agent_type: agent_scores.tolist() for agent_type, agent_scores in scores.items()}, sys.stdout)\n"
+        )
+        game_dir = os.path.dirname(os.path.abspath(__file__))
+        run_scores = []
+        for hash_seed in ["1", "2"]:
+            env = dict(os.environ, PYTHONHASHSEED=hash_seed)
+            result = subprocess.run(
+                [sys.executable, "-c", script], cwd=game_dir, env=env, capture_output=True, text=True, check=True
+            )
+            run_scores.append(json.loads(result.stdout))
+        assert run_scores[0] == run_scores[1]
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import pickle
+import time
+import unittest
+from agent import GreedyGameAgent, SearchGameAgent
+from gamestate import GameState, piles_to_mask
+from parallel_search import ParallelSearchGameAgent, RootParallelExecutor
+
+
+class SlowSearchGameAgent(SearchGameAgent):
+    # takes longer than any time budget in the tests to evaluate a
+    # determinization or a hand, but evaluates a discard at once (with a value
+    # of 0, below any hand's reward)
+    def move_values(self, state, deadline=None):
+        time.sleep(1)
+        return super().move_values(state)
+
+    def evaluate_action(self, action, deadline=None):
+        if len(action[0]) == 1:
+            return 0
+        time.sleep(2)
+        return super().evaluate_action(action)
+
+
+class FailingSearchGameAgent(SearchGameAgent):
+    def move_values(self, state, deadline=None):
+        raise RuntimeError("search failed")
+
+
+class TestParallelSearch(unittest.TestCase):
+    def test_evaluate_actions(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+
+        agent = SearchGameAgent(depth=2)
+        executor = RootParallelExecutor(agent, max_workers=2)
+        try:
+            action_values = executor.evaluate_actions(state)
+            assert len(action_values) == len(state.actions())
+            for action in state.actions():
+                assert action_values[piles_to_mask(action[0])] == agent.evaluate_action(action)
+
+            action_values = executor.evaluate_determinizations(state, 4, seed=123)
+            assert set(action_values) == set([piles_to_mask(action[0]) for action in state.actions()])
+        finally:
+            executor.shutdown()
+
+    def test_parallel_search_agent(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=54321)
+
+        agent = ParallelSearchGameAgent(depth=2, max_workers=2, num_determinizations=0, table_size=1 << 12)
+        try:
+            action = agent.choose_action(state)
+            assert action in state.actions()
+            assert agent.executor.agent.evaluate_action(action) == search_best_value(state, 2)
+            # the workers stored their results in the shared table
+            assert len(agent.table) > 0
+        finally:
+            agent.close()
+
+        agent = ParallelSearchGameAgent(depth=2, max_workers=2, num_determinizations=4, table_size=1 << 12)
+        try:
+            assert agent.choose_action(state) in state.actions()
+        finally:
+            agent.close()
+
+    def test_time_budget_fallback(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=54321)
+        greedy_reward = GreedyGameAgent().choose_action(state)[2]
+
+        # no determinization finishes within the budget, so every action gets
+        # its reward as its value
+        agent = ParallelSearchGameAgent(depth=2, max_workers=1, time_budget=0, table_size=1 << 12)
+        agent.executor.shutdown()
+        agent.executor = RootParallelExecutor(SlowSearchGameAgent(depth=2, table=agent.table), max_workers=1,
+                                              time_budget=0)
+        try:
+            assert agent.choose_action(state)[2] == greedy_reward
+        finally:
+            agent.close()
+
+        # the discards are evaluated (lower than the greedy hand), the hands
+        # aren't: the greedy hand is still chosen
+        agent = ParallelSearchGameAgent(depth=2, max_workers=1, num_determinizations=0, table_size=1 << 12)
+        agent.executor.shutdown()
+        agent.executor = RootParallelExecutor(SlowSearchGameAgent(depth=2, table=agent.table), max_workers=1,
+                                              time_budget=1)
+        try:
+            action = agent.choose_action(state)
+            assert len(action[0]) > 1
+            assert action[2] == greedy_reward
+        finally:
+            agent.close()
+
+
+    def test_deadline_stops_workers(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+
+        # a search this deep takes minutes, but the worker stops at the end of
+        # the time budget, so the pool is free right after it
+        start_time = time.perf_counter()
+        executor = RootParallelExecutor(SearchGameAgent(depth=8), max_workers=1, time_budget=0.5)
+        try:
+            assert executor.evaluate_actions(state) == {}
+        finally:
+            executor.shutdown()
+        assert time.perf_counter() - start_time < 10
+
+    def test_worker_exception(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+        executor = RootParallelExecutor(FailingSearchGameAgent(depth=2), max_workers=1)
+        try:
+            with self.assertRaises(RuntimeError):
+                executor.evaluate_determinizations(state, 2, seed=123)
+        finally:
+            executor.shutdown()
+
+    def test_agent_is_picklable(self):
+        # the agent is sent to the workers, which needs pickling with the
+        # spawn start method
+        agent = SearchGameAgent(depth=2)
+        assert pickle.loads(pickle.dumps(agent)).rand_gen.getstate() == agent.rand_gen.getstate()
+
+
+def search_best_value(state, depth):
+    agent = SearchGameAgent(depth=depth)
+    return max([agent.evaluate_action(action) for action in state.actions()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import gzip
+import os
+import tempfile
+import unittest
+from agent import GreedyGameAgent
+from game_recorder import record_game
+from game_replay import parse_records, replay_file
+from record_sink import BatchedRecordSink, DirectoryRecordSink, open_records
+
+class TestRecordSink(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        agent = GreedyGameAgent()
+        self.records = [record_game(agent, seed=seed) for seed in range(5)]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_directory_sink(self):
+        record_filename = lambda game_idx: os.path.join(self.tmp_dir.name, f"game_{game_idx}.txt")
+        with DirectoryRecordSink(record_filename, batch_bytes=1) as sink:
+            for i, record in enumerate(self.records):
+                sink.write(i, record[0])
+        for i, record in enumerate(self.records):
+            with open(record_filename(i), "r") as record_file:
+                assert record_file.read() == record[0]
+
+    def test_batched_sink(self):
+        for compress in [False, True]:
+            path = os.path.join(self.tmp_dir.name, "records.txt.gz" if compress else "records.txt")
+            with BatchedRecordSink(path, compress=compress) as sink:
+                for i, record in enumerate(self.records):
+                    sink.write(i, record[0])
+            with open_records(path) as record_file:
+                games = list(parse_records(record_file))
+            assert [game["final_score"] for game in games] == [record[1] for record in self.records]
+            result = replay_file(path)
+            assert result["errors"] == []
+            assert len(result["scores"]) == len(self.records)
+
+    def test_resume_from_checkpoint(self):
+        path = os.path.join(self.tmp_dir.name, "records.txt.gz")
+        with BatchedRecordSink(path, compress=True) as sink:
+            sink.write(0, self.records[0][0])
+            sink.write(1, self.records[1][0])
+            record_offset = sink.checkpoint()
+            # games after the checkpoint are lost when the run is resumed
+            sink.write(2, self.records[4][0])
+
+        with BatchedRecordSink(path, compress=True, record_offset=record_offset) as sink:
+            for i in range(2, 5):
+                sink.write(i, self.records[i][0])
+        with gzip.open(path, "rt") as record_file:
+            assert record_file.read() == "".join([record[0] + "\n" for record in self.records])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import random
+import unittest
+from gamestate import (
+    FIVE_STRAIGHT_REWARD, FLUSH_REWARD, FULL_HOUSE_REWARD, PAIR_REWARD, QUAD_REWARD, STRAIGHT_FLUSH_REWARD,
+    THREE_STRAIGHT_REWARD, TRIP_REWARD, GameState, SearchState, hand_moves, piles_to_mask
+)
+from agent import GreedyGameAgent
+from rollout import rollout
+
+
+def card_hand_moves(state):
+    # the hands found by the card-based GameState._get_*_hands methods
+    if len(set([r for r in range(3) for c in range(3) if not state.is_pile_empty(r, c)])) <= 1:
+        return []
+    hands = []
+    hands.extend([(hand_piles, PAIR_REWARD) for hand_piles in state._get_pair_hands()])
+    hands.extend([(hand_piles, TRIP_REWARD) for hand_piles in state._get_trip_hands()])
+    hands.extend([(hand_piles, QUAD_REWARD) for hand_piles in state._get_quad_hands()])
+    hands.extend([(hand_piles, FULL_HOUSE_REWARD) for hand_piles in state._get_full_house_hands()])
+    hands.extend([(hand_piles, THREE_STRAIGHT_REWARD) for hand_piles in state._get_sm_straight_hands()])
+    hands.extend([(hand_piles, FIVE_STRAIGHT_REWARD) for hand_piles in state._get_lg_straight_hands()])
+    hands.extend([(hand_piles, FLUSH_REWARD) for hand_piles in state._get_flush_hands()])
+    hands.extend([(hand_piles, STRAIGHT_FLUSH_REWARD) for hand_piles in state._get_straight_flush_hands()])
+    return [(piles_to_mask(hand_piles), state._get_hand_reward(hand_piles, base_reward))
+            for hand_piles, base_reward in hands]
+
+
+class TestRollout(unittest.TestCase):
+    def test_hand_moves(self):
+        # the hands found with the pile mask tables are the same as the hands
+        # found from the cards, and the same as the hands in GameState.moves()
+        rand_gen = random.Random(123)
+        for seed in range(20):
+            state = GameState()
+            state.start_new_game_from_deck(seed=seed)
+            while not state.is_game_over():
+                search_state = SearchState(state)
+                masks = (search_state.rank_masks, search_state.suit_masks, search_state.single_mask,
+                         search_state.lucky_suit_idx, search_state.mask_bonus)
+
+                table_hand_moves = hand_moves(*masks, False)
+                expected_hand_moves = card_hand_moves(state)
+                assert sorted(table_hand_moves) == sorted(expected_hand_moves)
+                assert table_hand_moves == [move for move in state.moves() if bin(move[0]).count("1") > 1]
+
+                best_moves = hand_moves(*masks, True)
+                if expected_hand_moves:
+                    assert best_moves[0][1] == max([move[1] for move in expected_hand_moves])
+                else:
+                    assert best_moves == []
+
+                state = rand_gen.choice(state.actions())[1]
+
+    def test_rollout(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+        original_state = state.copy()
+
+        score = rollout(state)
+        assert score > 0
+        assert score == rollout(state)
+        assert rollout(state, policy="random", rand_gen=random.Random(1)) == rollout(
+            state, policy="random", rand_gen=random.Random(1)
+        )
+        assert state == original_state
+
+    def test_rollout_matches_greedy_agent(self):
+        agent = GreedyGameAgent()
+        for seed in range(10):
+            state = GameState()
+            state.start_new_game_from_deck(seed=seed)
+            expected_score = rollout(state)
+            score = 0
+            while not state.is_game_over():
+                _, state, reward = agent.choose_action(state)
+                score += reward
+            assert score == expected_score
+
+    def test_rollout_last_move(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+        for r in range(3):
+            for c in range(3):
+                state.card_num_piles[r][c] = []
+        state.card_num_piles[2][2] = [0]
+        # the only move is to discard the last card
+        assert rollout(state) == state.pile_clear_bonus[2][2]
+        state.discards_remaining = 0
+        assert rollout(state) == 0
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import gzip
+import json
+import os
+import tempfile
+import unittest
+from click.testing import CliRunner
+from game_recorder import main
+from run_manifest import RunManifest
+
+class TestRunManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.runner = CliRunner()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_games(self, record_directory, args):
+        result = self.runner.invoke(main, ["-d", record_directory] + args)
+        assert result.exit_code == 0, result.output
+        return RunManifest.load(record_directory)
+
+    def read_records(self, record_directory):
+        records = {}
+        for f in sorted(os.listdir(record_directory)):
+            if f.endswith(".txt"):
+                with open(os.path.join(record_directory, f), "r") as record_file:
+                    records[f] = record_file.read()
+        return records
+
+    def test_resume_run(self):
+        full_run_dir = os.path.join(self.tmp_dir.name, "full")
+        full_manifest = self.run_games(full_run_dir, ["-n", "5", "-a", "random", "--seed", "123"])
+        assert full_manifest.games_completed == 5
+        assert full_manifest.summary()["games_completed"] == 5
+
+        # stop a run with the same seed after 3 games, then resume it
+        resumed_run_dir = os.path.join(self.tmp_dir.name, "resumed")
+        manifest = self.run_games(
+            resumed_run_dir, ["-n", "3", "-a", "random", "--seed", "123", "--checkpoint-interval", "2"]
+        )
+        assert manifest.games_completed == 3
+        assert manifest.config["checkpoint_interval"] == 2
+        manifest.num_games = 5
+        manifest.save()
+        resumed_manifest = self.run_games(resumed_run_dir, ["--resume"])
+
+        assert resumed_manifest.games_completed == 5
+        assert resumed_manifest.aggregates == full_manifest.aggregates
+        assert self.read_records(resumed_run_dir) == self.read_records(full_run_dir)
+
+    def test_resume_batched_run(self):
+        full_run_dir = os.path.join(self.tmp_dir.name, "full")
+        self.run_games(full_run_dir, ["-n", "5", "-a", "random", "--seed", "7", "--record-file", "records.txt.gz"])
+
+        resumed_run_dir = os.path.join(self.tmp_dir.name, "resumed")
+        manifest = self.run_games(
+            resumed_run_dir, ["-n", "3", "-a", "random", "--seed", "7", "--record-file", "records.txt.gz"]
+        )
+        assert manifest.record_offset == os.path.getsize(os.path.join(resumed_run_dir, "records.txt.gz"))
+        manifest.num_games = 5
+        manifest.save()
+        self.run_games(resumed_run_dir, ["--resume"])
+
+        records = []
+        for run_dir in [full_run_dir, resumed_run_dir]:
+            with gzip.open(os.path.join(run_dir, "records.txt.gz"), "rt") as record_file:
+                records.append(record_file.read())
+        assert records[0] == records[1]
+        assert records[0].count("Game over") == 5
+
+    def test_existing_run(self):
+        run_dir = os.path.join(self.tmp_dir.name, "run")
+        self.run_games(run_dir, ["-n", "1", "-a", "greedy"])
+        result = self.runner.invoke(main, ["-d", run_dir, "-n", "1", "-a", "greedy"])
+        assert result.exit_code != 0
+
+    def test_checkpoint_interval(self):
+        run_dir = os.path.join(self.tmp_dir.name, "run")
+        result = self.runner.invoke(main, ["-d", run_dir, "-n", "1", "-a", "greedy", "--checkpoint-interval", "0"])
+        assert result.exit_code != 0
+        assert not RunManifest.exists(run_dir)
+
+        # a manifest saved with an interval of 0 resumes with the given interval
+        manifest = self.run_games(run_dir, ["-n", "1", "-a", "greedy"])
+        manifest.config["checkpoint_interval"] = 0
+        manifest.num_games = 2
+        manifest.save()
+        manifest = self.run_games(run_dir, ["--resume"])
+        assert manifest.games_completed == 2
+
+    def test_checkpoint(self):
+        manifest = RunManifest(self.tmp_dir.name, {"agent_type": "greedy"}, 10, 5)
+        manifest.record_game(100, False)
+        manifest.record_game(300, True)
+        manifest.save()
+
+        with open(RunManifest.path(self.tmp_dir.name), "r") as manifest_file:
+            summary = json.load(manifest_file)["summary"]
+        assert summary["avg_score"] == 200
+        # the sample standard deviation, like the progress reporter's
+        assert abs(summary["score_stddev"] - 20000 ** 0.5) < 1e-9
+        assert summary["clear_rate"] == 0.5
+        loaded_manifest = RunManifest.load(self.tmp_dir.name)
+        assert loaded_manifest.games_completed == 2
+        assert loaded_manifest.seed_for_game(3) == 8
+
+
+if __name__ == '__main__':
+    unittest.main()
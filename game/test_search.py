@@ -0,0 +1,106 @@
+import time
+import unittest
+import random
+from agent import IterativeDeepeningGameAgent, SearchGameAgent
+from gamestate import GameState, mask_to_piles
+from search import SearchTimeout, TranspositionTable, iterative_deepening, search_value
+
+class TestSearch(unittest.TestCase):
+    def test_depth_one_is_greedy(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+
+        value, best_mask = search_value(state, 1)
+        max_reward = max([reward for piles, next_state, reward in state.actions()])
+        assert value == max_reward
+        best_rewards = [reward for piles, next_state, reward in state.actions() if piles == mask_to_piles(best_mask)]
+        assert best_rewards == [max_reward]
+
+    def test_search_with_table(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=54321)
+
+        table = TranspositionTable()
+        value, best_mask = search_value(state, 3, table)
+        assert (value, best_mask) == search_value(state, 3)
+        assert len(table) > 0
+        assert table.probe(state.search_key()) == (3, value, best_mask)
+
+        # a deeper search never finds a lower value
+        assert search_value(state, 2, table)[0] == value
+        assert search_value(state, 4)[0] >= value
+
+    def test_table_keeps_determinizations_apart(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=54321)
+
+        # a shared table doesn't give one determinization the value of
+        # another: each one gets the value of its own search
+        table = TranspositionTable()
+        rand_gen = random.Random(7)
+        for _ in range(4):
+            determinized_state = state.determinize(rand_gen)
+            assert search_value(determinized_state, 4, table) == search_value(determinized_state, 4)
+
+    def test_table_keeps_deeper_results(self):
+        table = TranspositionTable()
+        table.store(123, 3, 50, 7)
+        table.store(123, 2, 20, 5)
+        assert table.probe(123) == (3, 50, 7)
+        table.store(123, 4, 60, 6)
+        assert table.probe(123) == (4, 60, 6)
+        assert table.probe(456) is None
+
+
+    def test_search_deadline(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+        with self.assertRaises(SearchTimeout):
+            search_value(state, 3, deadline=time.perf_counter())
+
+    def test_iterative_deepening(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+
+        # without a deadline, the result is the same as a search at max depth
+        value, best_mask, depth = iterative_deepening(state, None, max_depth=3)
+        assert depth == 3
+        assert (value, best_mask) == search_value(state, 3)
+
+        # with an expired deadline, the result is the greedy action
+        value, best_mask, depth = iterative_deepening(state, time.perf_counter(), max_depth=3)
+        assert depth == 1
+        assert (value, best_mask) == search_value(state, 1)
+
+    def test_search_agent_ignores_hidden_cards(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+        other_state = state.determinize(random.Random(1))
+
+        # states in the same information set get the same action values
+        agent = SearchGameAgent(depth=2, seed=7)
+        other_agent = SearchGameAgent(depth=2, seed=7)
+        action_values = agent.action_values(state)
+        assert action_values == other_agent.action_values(other_state)
+        assert set(action_values) == set([mask for mask, reward in state.moves()])
+        assert agent.choose_action(state) in state.actions()
+
+    def test_iterative_deepening_agent(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=54321)
+
+        agent = IterativeDeepeningGameAgent(time_limit=0.2)
+        start_time = time.perf_counter()
+        action = agent.choose_action(state)
+        assert time.perf_counter() - start_time < 0.2 + 0.1
+        assert action in state.actions()
+        assert agent.last_depth >= 1
+
+        # the search doesn't depend on the hidden cards
+        agent = IterativeDeepeningGameAgent(time_limit=60, max_depth=3, seed=7)
+        other_agent = IterativeDeepeningGameAgent(time_limit=60, max_depth=3, seed=7)
+        other_state = state.determinize(random.Random(1))
+        assert agent.choose_action(state)[0] == other_agent.choose_action(other_state)[0]
+
+if __name__ == '__main__':
+    unittest.main()
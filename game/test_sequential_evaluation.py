@@ -0,0 +1,79 @@
+import random
+import unittest
+from sequential_evaluation import (
+    DIFFERENT, EQUIVALENT, INCONCLUSIVE, SequentialPairedTest, compare_agents, obrien_fleming_spending
+)
+
+class TestSequentialEvaluation(unittest.TestCase):
+    def test_alpha_spending(self):
+        spent = [obrien_fleming_spending(0.05, k / 10) for k in range(11)]
+        assert spent[0] == 0
+        assert all([spent[k] < spent[k + 1] for k in range(10)])
+        assert abs(spent[10] - 0.05) < 1e-12
+        # very little is spent at the early looks
+        assert spent[1] < 0.001
+
+    def test_stops_when_different(self):
+        rand_gen = random.Random(0)
+        test = SequentialPairedTest(max_games=10000)
+        decision = None
+        while decision is None:
+            scores_a = [rand_gen.gauss(700, 250) for _ in range(100)]
+            scores_b = [score + rand_gen.gauss(100, 50) for score in scores_a]
+            decision = test.update(scores_a, scores_b)
+        assert decision == DIFFERENT
+        assert len(test.diffs) < 1000
+
+    def test_stops_when_equivalent(self):
+        rand_gen = random.Random(0)
+        test = SequentialPairedTest(max_games=10000, threshold=20)
+        decision = None
+        while decision is None:
+            scores_a = [rand_gen.gauss(700, 250) for _ in range(100)]
+            scores_b = [score + rand_gen.gauss(0, 50) for score in scores_a]
+            decision = test.update(scores_a, scores_b)
+        assert decision == EQUIVALENT
+        assert len(test.diffs) < 10000
+
+    def test_inconclusive(self):
+        rand_gen = random.Random(0)
+        test = SequentialPairedTest(max_games=200)
+        decisions = []
+        for _ in range(2):
+            scores_a = [rand_gen.gauss(700, 250) for _ in range(100)]
+            scores_b = [score + rand_gen.gauss(0, 50) for score in scores_a]
+            decisions.append(test.update(scores_a, scores_b))
+        assert decisions == [None, INCONCLUSIVE]
+        assert abs(test.alpha_spent - 0.05) < 1e-12
+
+    def test_constant_differences(self):
+        # a constant nonzero difference is significant, a constant zero one
+        # is equivalent (with a threshold) or inconclusive (without one)
+        test = SequentialPairedTest(max_games=1000)
+        assert test.update([700, 800, 900], [710, 810, 910]) == DIFFERENT
+
+        test = SequentialPairedTest(max_games=1000, threshold=5)
+        assert test.update([700, 800, 900], [700, 800, 900]) == EQUIVALENT
+
+        test = SequentialPairedTest(max_games=4)
+        assert test.update([700, 800], [700, 800]) is None
+        assert test.update([900, 600], [900, 600]) == INCONCLUSIVE
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            SequentialPairedTest(max_games=1)
+        with self.assertRaises(ValueError):
+            compare_agents("random", "greedy", batch_size=100, max_games=1)
+        with self.assertRaises(ValueError):
+            compare_agents("random", "greedy", batch_size=0, max_games=100)
+
+    def test_compare_agents(self):
+        summary = compare_agents("random", "greedy", batch_size=50, max_games=1000, base_seed=3)
+        assert summary["decision"] == DIFFERENT
+        assert summary["num_games"] % 50 == 0
+        assert summary["mean_score_b"] > summary["mean_score_a"]
+        assert abs(summary["mean_diff"] - (summary["mean_score_b"] - summary["mean_score_a"])) < 1e-6
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from gamestate import GameState
+from search import search_value
+from shared_table import SharedTranspositionTable, pack_entry, unpack_entry
+
+
+def search_seed(seed, table):
+    state = GameState()
+    state.start_new_game_from_deck(seed=seed)
+    return (state.search_key(), search_value(state, 2, table))
+
+
+class TestSharedTable(unittest.TestCase):
+    def test_pack_entry(self):
+        assert unpack_entry(*pack_entry(3, 140.0, 0b100010001)) == (3, 140.0, 0b100010001)
+        assert unpack_entry(*pack_entry(0, 0, None)) == (0, 0.0, None)
+        assert unpack_entry(*pack_entry(12, 1234.5, 0)) == (12, 1234.5, 0)
+        # averaged values aren't rounded
+        assert unpack_entry(*pack_entry(255, 1000 / 3, None)) == (255, 1000 / 3, None)
+
+    def test_probe_store(self):
+        with SharedTranspositionTable(num_entries=16) as table:
+            key = 2 ** 64 - 3
+            assert table.probe(key) is None
+            table.store(key, 0, 0.0, None)
+            assert table.probe(key) == (0, 0.0, None)
+            table.store(key, 2, 50.0, 3)
+            assert table.probe(key) == (2, 50.0, 3)
+            # a different key in the same slot is a miss
+            assert table.probe(key - 16) is None
+
+            # replace-by-depth
+            table.store(key - 16, 1, 10.0, 5)
+            assert table.probe(key) == (2, 50.0, 3)
+            table.store(key - 16, 4, 10.0, 5)
+            assert table.probe(key) is None
+            assert table.probe(key - 16) == (4, 10.0, 5)
+            assert len(table) == 1
+
+    def test_shared_across_processes(self):
+        with SharedTranspositionTable(num_entries=1 << 16) as table:
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                results = list(executor.map(search_seed, [1, 2, 3], [table] * 3))
+            assert len(table) > 0
+            # the results stored by the workers are visible to this process
+            for key, (value, best_mask) in results:
+                assert table.probe(key) == (2, value, best_mask)
+
+
+if __name__ == '__main__':
+    unittest.main()
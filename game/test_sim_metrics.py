@@ -0,0 +1,86 @@
+import io
+import json
+import os
+import statistics
+import tempfile
+import unittest
+from sim_metrics import ProgressReporter, RunningStats, wilson_interval
+
+class TestSimMetrics(unittest.TestCase):
+    def test_running_stats(self):
+        values = [712, 805.5, 1020, 640, 980, 1500]
+        stats = RunningStats()
+        for value in values:
+            stats.add(value)
+        assert stats.count == len(values)
+        assert abs(stats.mean - statistics.mean(values)) < 1e-9
+        assert abs(stats.stddev() - statistics.stdev(values)) < 1e-9
+        assert stats.ci95() > 0
+
+        stats = RunningStats()
+        stats.add(712)
+        assert stats.ci95() is None
+
+    def test_running_stats_merge(self):
+        values = [712, 805.5, 1020, 640, 980, 1500]
+        stats = RunningStats()
+        for value in values[:2]:
+            stats.add(value)
+        other = RunningStats()
+        for value in values[2:]:
+            other.add(value)
+        stats.merge(other)
+        stats.merge(RunningStats())
+        assert stats.count == len(values)
+        assert abs(stats.mean - statistics.mean(values)) < 1e-9
+        assert abs(stats.stddev() - statistics.stdev(values)) < 1e-9
+        assert stats.min == 640
+        assert stats.max == 1500
+
+        stats = RunningStats()
+        stats.merge(other)
+        assert stats.min == 640
+        assert stats.max == 1500
+
+    def test_wilson_interval(self):
+        low, high = wilson_interval(0, 100)
+        assert low == 0.0
+        assert 0 < high < 0.05
+        low, high = wilson_interval(50, 100)
+        assert low < 0.5 < high
+        assert abs((0.5 - low) - (high - 0.5)) < 1e-9
+
+    def test_progress_reporter(self):
+        stream = io.StringIO()
+        # a large interval, so only the final report is printed
+        reporter = ProgressReporter(3, interval=3600, stream=stream)
+        reporter.record_game(800, False, 14)
+        reporter.record_game(1000, True, 20)
+        reporter.record_game(600, False, 11)
+        assert stream.getvalue() == ""
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            metrics_path = os.path.join(tmp_dir, "run_metrics.json")
+            metrics = reporter.finish(metrics_path)
+            with open(metrics_path, "r") as metrics_file:
+                assert json.load(metrics_file) == metrics
+        assert len(stream.getvalue().splitlines()) == 1
+        assert metrics["games"] == 3
+        assert metrics["moves"] == 45
+        assert metrics["mean_score"] == 800
+        assert abs(metrics["clear_rate"] - 1 / 3) < 1e-9
+        assert metrics["clear_rate_ci95"][0] < 1 / 3 < metrics["clear_rate_ci95"][1]
+
+    def test_progress_reporter_one_game(self):
+        stream = io.StringIO()
+        reporter = ProgressReporter(1, interval=3600, stream=stream)
+        reporter.record_game(800, False, 14)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            metrics_path = os.path.join(tmp_dir, "run_metrics.json")
+            metrics = reporter.finish(metrics_path)
+            with open(metrics_path, "r") as metrics_file:
+                assert json.load(metrics_file) == metrics
+        assert metrics["mean_score_ci95"] is None
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import random
+import unittest
+from agent_2048 import GreedyAgent2048, RandomAgent2048
+from game_engine import Game, GameState
+from simulate_2048 import agent_seed, play_2048_game, run_games, summarize
+
+class TestSimulate2048(unittest.TestCase):
+    def test_same_game_as_game_engine(self):
+        agent = GreedyAgent2048()
+        result = play_2048_game(agent, seed=7)
+
+        game = Game(verbose=False)
+        game.new_game(random_seed=7, save_game=False)
+        num_moves = 0
+        while not game.state.game_over:
+            game.move(agent.choose_action(game.state))
+            num_moves += 1
+        assert result["score"] == game.state.score
+        assert result["max_tile"] == game.state.max_tile_value()
+        assert result["num_moves"] == num_moves
+
+    def test_game_with_state(self):
+        state = GameState(tiles=[[1, 1, 0, 0], [0] * 4, [0] * 4, [0] * 4])
+        game = Game(game_state=state, verbose=False)
+        assert game.state is state
+
+    def test_random_agent_is_seeded(self):
+        agent = RandomAgent2048()
+        assert play_2048_game(agent, seed=3) == play_2048_game(agent, seed=3)
+
+        # the agent's random numbers aren't the ones that spawn the tiles
+        agent.new_game(agent_seed(3))
+        rand_gen = random.Random(3)
+        assert [agent.rand_gen.random() for _ in range(10)] != [rand_gen.random() for _ in range(10)]
+
+    def test_run_games(self):
+        results = run_games("random", 6, base_seed=10, max_workers=2, chunk_size=2)
+        assert [result["seed"] for result in results] == list(range(10, 16))
+        assert results == run_games("random", 6, base_seed=10, max_workers=1)
+
+        summary = summarize(results)
+        assert summary["num_games"] == 6
+        assert summary["min_score"] <= summary["avg_score"] <= summary["max_score"]
+        assert abs(sum(summary["max_tile_rates"].values()) - 1.0) < 1e-9
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import os
+import pickle
+import tempfile
+import unittest
+from gamestate import GameState
+from search import search_value
+from solution_cache import SolutionCache
+
+class TestSolutionCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp_dir.name, "cache.sqlite")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_persists_across_runs(self):
+        state = GameState()
+        state.start_new_game_from_deck(seed=12345)
+
+        with SolutionCache(self.cache_path) as cache:
+            value, best_mask = search_value(state, 2, cache)
+            num_entries = len(cache)
+            assert num_entries > 0
+
+        with SolutionCache(self.cache_path) as cache:
+            assert len(cache) == num_entries
+            assert cache.probe(state.search_key()) == (2, value, best_mask)
+            assert search_value(state, 2, cache) == (value, best_mask)
+
+    def test_keeps_deeper_results(self):
+        with SolutionCache(self.cache_path) as cache:
+            cache.store(2 ** 64 - 1, 3, 50.0, 7)
+        with SolutionCache(self.cache_path) as cache:
+            cache.store(2 ** 64 - 1, 2, 20.0, 5)
+        with SolutionCache(self.cache_path) as cache:
+            assert cache.probe(2 ** 64 - 1) == (3, 50.0, 7)
+
+    def test_eviction(self):
+        with SolutionCache(self.cache_path, max_entries=10, flush_interval=5) as cache:
+            for key in range(25):
+                cache.store(key, 1, float(key), None)
+            cache.flush()
+            assert len(cache) == 10
+            # the most recently stored entries are kept
+            assert cache.probe(24) == (1, 24.0, None)
+            assert cache.probe(0) is None
+
+    def test_pickle(self):
+        cache = SolutionCache(self.cache_path)
+        cache.store(1, 1, 10.0, 3)
+        unpickled_cache = pickle.loads(pickle.dumps(cache))
+        assert unpickled_cache.probe(1) == (1, 10.0, 3)
+        cache.close()
+        unpickled_cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
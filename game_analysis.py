@@ -1,9 +1,178 @@
+from concurrent.futures import ProcessPoolExecutor
 from os import listdir
-from os.path import isfile, join
+from os.path import getsize, isfile, join
+import gzip
+import json
 import os
+import re
 import click
 import matplotlib.pyplot as plt
-import numpy as np
+from game.sim_metrics import RunningStats
+
+GAME_OVER_PATTERN = re.compile(rb"Game over, final score = (-?[\d.]+), table cleared = (True|False)")
+
+# width of the score histogram bins (so histograms from different workers line up)
+SCORE_BIN_WIDTH = 20
+
+# uncompressed record files are split into chunks of this size, so a run
+# written to one big file is still analyzed in parallel
+CHUNK_BYTES = 64 << 20
+
+# a single-game record file is read backwards from its end in blocks of this
+# size, until its last line (the game over line) is found
+TAIL_BYTES = 4096
+
+# the run manifest of a record directory (see game/run_manifest.py), which
+# names the record file if all the games of the run were written to one file
+MANIFEST_FILENAME = "run_manifest.json"
+
+
+class ScoreStats(RunningStats):
+    """
+    Streaming statistics of a set of scores (see game/sim_metrics.py, so the
+    standard deviation is the sample one, like in the run metrics), with a
+    fixed-bin histogram.
+    """
+    def __init__(self):
+        super().__init__()
+        # bin index (score // SCORE_BIN_WIDTH) -> number of scores
+        self.histogram = {}
+
+    def add(self, score):
+        super().add(score)
+        bin_idx = int(score // SCORE_BIN_WIDTH)
+        self.histogram[bin_idx] = self.histogram.get(bin_idx, 0) + 1
+
+    def merge(self, other):
+        super().merge(other)
+        for bin_idx, bin_count in other.histogram.items():
+            self.histogram[bin_idx] = self.histogram.get(bin_idx, 0) + bin_count
+
+
+class RunStats:
+    """
+    Streaming statistics of the games of a run: all the scores, and the scores
+    of the cleared and uncleared games separately.
+    """
+    def __init__(self):
+        self.all = ScoreStats()
+        self.cleared = ScoreStats()
+        self.uncleared = ScoreStats()
+
+    def add(self, score, board_cleared):
+        self.all.add(score)
+        if board_cleared:
+            self.cleared.add(score)
+        else:
+            self.uncleared.add(score)
+
+    def merge(self, other):
+        self.all.merge(other.all)
+        self.cleared.merge(other.cleared)
+        self.uncleared.merge(other.uncleared)
+
+
+def analyze_lines(lines):
+    run_stats = RunStats()
+    for line in lines:
+        match = GAME_OVER_PATTERN.search(line)
+        if match is not None:
+            run_stats.add(float(match.group(1)), match.group(2) == b"True")
+    return run_stats
+
+
+def _chunk_lines(f, start, end):
+    # each line belongs to the chunk that its first byte is in
+    if start > 0:
+        f.seek(start - 1)
+        f.readline()
+    while f.tell() < end:
+        line = f.readline()
+        if not line:
+            return
+        yield line
+
+
+def _last_line(f):
+    # reads backwards from the end of the file, so only the tail is read
+    pos = f.seek(0, os.SEEK_END)
+    tail = b""
+    while pos > 0:
+        block_size = min(TAIL_BYTES, pos)
+        pos -= block_size
+        f.seek(pos)
+        tail = f.read(block_size) + tail
+        if b"\n" in tail.rstrip(b"\n"):
+            break
+    return tail.rstrip(b"\n").rsplit(b"\n", 1)[-1]
+
+
+def analyze_chunk(chunk):
+    """
+    Returns: RunStats of the games that end in a chunk (path, start, end) of a
+    record file. A chunk of a compressed file is always the whole file, and a
+    single-game record file has one chunk (path, None, None), of which only
+    the last line is read.
+    """
+    path, start, end = chunk
+    if start is None:
+        with open(path, "rb") as f:
+            return analyze_lines([_last_line(f)])
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            return analyze_lines(f)
+    with open(path, "rb") as f:
+        return analyze_lines(_chunk_lines(f, start, end))
+
+
+def run_record_file(record_directory):
+    """
+    Returns: the name of the file that all the games of the run in the
+    directory were written to, or None if each game has its own file
+    """
+    manifest_path = join(record_directory, MANIFEST_FILENAME)
+    if not isfile(manifest_path):
+        return None
+    with open(manifest_path, "r") as manifest_file:
+        return json.load(manifest_file)["config"].get("record_file")
+
+
+def record_chunks(record_directory):
+    # a record file has one game, or all the games of a run (see game/record_sink.py)
+    run_file = run_record_file(record_directory)
+    chunks = []
+    for f in sorted(listdir(record_directory)):
+        path = join(record_directory, f)
+        if not isfile(path):
+            continue
+        if f.endswith(".txt.gz"):
+            chunks.append((path, 0, None))
+        elif f.endswith(".txt") and f != run_file:
+            # the game over line of a single game is its last line
+            chunks.append((path, None, None))
+        elif f.endswith(".txt"):
+            size = getsize(path)
+            for start in range(0, max(size, 1), CHUNK_BYTES):
+                chunks.append((path, start, min(start + CHUNK_BYTES, size)))
+    return chunks
+
+
+def analyze_directory(record_directory, max_workers=None):
+    """
+    Analyzes every record file in the directory in a process pool, merging the
+    statistics of each chunk as it finishes.
+
+    Returns: run_stats - the RunStats of all the games
+    """
+    chunks = record_chunks(record_directory)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    chunksize = max(1, len(chunks) // (4 * max_workers))
+    run_stats = RunStats()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for chunk_stats in executor.map(analyze_chunk, chunks, chunksize=chunksize):
+            run_stats.merge(chunk_stats)
+    return run_stats
 
 
 @click.command()
@@ -11,65 +180,37 @@ import numpy as np
     "--record-directory", "-d", type=str, required=True,
     help="Directory name where the game records have been saved"
 )
-def main(record_directory):
-    game_records_dir = record_directory
-    game_files = [f for f in listdir(game_records_dir) if isfile(join(game_records_dir, f))]
-
-    game_scores = []
-    game_clears = []
-
-    for game_file in game_files:
-        with open(join(game_records_dir, game_file), "rb") as f:
-            # print(game_file)
-            f.seek(-2, os.SEEK_END)
-            while f.read(1) != b'\n':
-                f.seek(-2, os.SEEK_CUR)
-            last_line = f.readline().decode()
-            # print(last_line)
-
-            tokens = last_line.split(", ")
-            for token in tokens:
-                if token.startswith("final score"):
-                    final_score = float(token.split(" = ")[1])
-                    game_scores.append(final_score)
-                elif token.startswith("table cleared"):
-                    board_cleared = token.split(" = ")[1] == "True"
-                    if board_cleared:
-                        game_clears.append(1)
-                    else:
-                        game_clears.append(0)
-
-    game_scores = np.array(game_scores)
-    game_clears = np.array(game_clears)
-
-    plt.hist(game_scores, bins="auto")
-    plt.xlabel("Final Game Score")
-    plt.ylabel("# Games")
-    plt.title(f"Final Score Distribution (n={len(game_scores)})")
-    plt.show()
-
-    max_score = np.max(game_scores)
-    print(f"Max Score = {max_score}")
-
-    min_score = np.min(game_scores)
-    print(f"Min Score = {min_score}")
-
-    avg_score = np.mean(game_scores)
-    print(f"Average Score = {avg_score}")
-
-    score_stddev = np.std(game_scores)
-    print(f"Score Standard Deviation = {score_stddev}")
-
-    clear_rate = np.mean(game_clears)
-    print(f"Game Clear Rate = {clear_rate}")
-
-    if np.any(np.where(game_clears == 1)):
-        cleared_scores = np.take(game_scores, np.where(game_clears == 1))
-        print(f"Avg Score for Cleared Games = {np.mean(cleared_scores)}")
-
-    if np.any(np.where(game_clears == 0)):
-        uncleared_scores = np.take(game_scores, np.where(game_clears == 0))
-        print(f"Avg Score for Uncleared Games = {np.mean(uncleared_scores)}")
+@click.option("--workers", "-w", type=int, default=None, help="Number of worker processes")
+@click.option("--plot/--no-plot", default=True, help="Show the final score distribution")
+def main(record_directory, workers, plot):
+    run_stats = analyze_directory(record_directory, max_workers=workers)
+    game_scores = run_stats.all
+    if game_scores.count == 0:
+        print("No games found")
+        return
+
+    if plot:
+        bin_idxs = range(min(game_scores.histogram), max(game_scores.histogram) + 2)
+        plt.stairs(
+            [game_scores.histogram.get(bin_idx, 0) for bin_idx in bin_idxs[:-1]],
+            [bin_idx * SCORE_BIN_WIDTH for bin_idx in bin_idxs], fill=True
+        )
+        plt.xlabel("Final Game Score")
+        plt.ylabel("# Games")
+        plt.title(f"Final Score Distribution (n={game_scores.count})")
+        plt.show()
+
+    print(f"Max Score = {game_scores.max}")
+    print(f"Min Score = {game_scores.min}")
+    print(f"Average Score = {game_scores.mean}")
+    print(f"Score Standard Deviation = {game_scores.stddev()}")
+    print(f"Game Clear Rate = {run_stats.cleared.count / game_scores.count}")
+
+    if run_stats.cleared.count > 0:
+        print(f"Avg Score for Cleared Games = {run_stats.cleared.mean}")
+
+    if run_stats.uncleared.count > 0:
+        print(f"Avg Score for Uncleared Games = {run_stats.uncleared.mean}")
 
 
 if __name__ == "__main__":